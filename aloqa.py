@@ -1,15 +1,45 @@
 import os
+import re
 import json
+import logging
 from datetime import datetime
 from dotenv import load_dotenv
-from aiogram import Bot, Dispatcher, types, F
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, Message, CallbackQuery
+from aiogram import Dispatcher, types, F
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, Message, CallbackQuery, FSInputFile
 from aiogram.filters import Command, StateFilter
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.telegram import TelegramAPIServer, PRODUCTION
 import asyncio
+import shutil
+import signal
+import tempfile
 from aiohttp import web
+from update_queue import UpdateQueue
+from storage import RequestStore, PANEL_STATUS_ORDER
+from lifecycle import ArchiveManager
+from metrics import Metrics, UpdateMetricsMiddleware, HandlerMetricsMiddleware, ApiMetricsMiddleware
+from logs import setup_logging, LogContextMiddleware, bind
+from recorder import UpdateRecorder
+from throttle import ThrottleMiddleware
+from http_session import BotAPISession
+from polling import Poller
+from snapshot import load_snapshot
+from journal import EventJournal, SnapshotManager
+from roster import Roster
+from models import Request, Status, Message as ChatMessage
+from outbound import Outbox
+from fsm_storage import PersistentStorage, ShardedKV, SQLiteKV, RedisKV
+from dedup import UpdateDeduplicator
+from config_store import ConfigWriter, ConfigWatcher
+from callbacks import (
+    CallbackRouter, pack, FACULTY, TYUTOR, CANCEL, GO_BACK, CANCEL_REQUEST, VIEW, ACCEPT, REJECT,
+    REASON, RESPOND, STUDENT_REPLY, CONTINUE, FINISH, PANEL_PAGE, HISTORY
+)
+from keyboards import (
+    KeyboardCache, ADMIN_MENU_KEYBOARD, CONTACT_KEYBOARD, EDIT_TYUTOR_KEYBOARD, CANCEL_KEYBOARD
+)
 
 # Konfiguratsiya yuklash
 load_dotenv()
@@ -17,13 +47,74 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = int(os.getenv("ADMIN_ID"))
 PORT = int(os.getenv("PORT", 3000))
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Set this in Render: https://your-app.onrender.com
+UPDATE_MODE = os.getenv("UPDATE_MODE", "queue")  # queue - navbat orqali, inline - darhol qayta ishlash
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 4))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 1000))
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", 30))  # WEBHOOK_URL bo'lmasa: getUpdates long polling, sekund
+POLL_LIMIT = int(os.getenv("POLL_LIMIT", 100))  # bitta getUpdates da ko'pi bilan
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", 30))  # to'xtatishda navbatlar bo'shashini jami shuncha kutamiz
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", "tyutor.snapshot")  # to'xtatishda holat shu faylga, bo'sh - o'chiq
+JOURNAL_FILE = os.getenv("JOURNAL_FILE", "events.jsonl")  # o'zgarishlar jurnali (qulashdan tiklash), bo'sh - o'chiq
+JOURNAL_SNAPSHOT_EVENTS = int(os.getenv("JOURNAL_SNAPSHOT_EVENTS", 50000))  # shuncha hodisadan keyin snapshot
+JOURNAL_SNAPSHOT_INTERVAL = float(os.getenv("JOURNAL_SNAPSHOT_INTERVAL", 600))  # yoki shuncha sekundda bir
+DB_FILE = os.getenv("DB_FILE", "tyutor.db")
+PANEL_PAGE_SIZE = int(os.getenv("PANEL_PAGE_SIZE", 10))
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 10))
+HISTORY_TAIL = int(os.getenv("HISTORY_TAIL", 5))  # xotirada har murojaat uchun oxirgi xabarlar soni
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", 30))  # Telegram: ~30 xabar/sekund
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", 1))  # bitta chatga xabar/sekund
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", 8))
+FSM_SHARDS = int(os.getenv("FSM_SHARDS", 4))
+FSM_TTL = int(os.getenv("FSM_TTL", 86400))  # tashlab ketilgan holatlar shuncha sekunddan keyin o'chadi
+FSM_REDIS_URL = os.getenv("FSM_REDIS_URL", "")  # bo'lsa, FSM holatlari Redis'da saqlanadi
+DEDUP_SIZE = int(os.getenv("DEDUP_SIZE", 10000))
+DEDUP_WINDOW = int(os.getenv("DEDUP_WINDOW", 3600))
+DEDUP_FILE = os.getenv("DEDUP_FILE", "")  # bo'lsa, update_id lar qayta ishga tushganda ham saqlanadi
+CONFIG_POLL_INTERVAL = float(os.getenv("CONFIG_POLL_INTERVAL", 2))  # 0 - config.json kuzatilmaydi
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", 30))  # yopilgan murojaatlar shuncha kundan keyin arxivga
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", 3600))  # 0 - arxivlash o'chirilgan
+ARCHIVE_EXPORT_PART_MB = float(os.getenv("ARCHIVE_EXPORT_PART_MB", 45))  # Telegram: bot yuklaydigan fayl 50 MB gacha
+ARCHIVE_EXPORT_MAX_PARTS = int(os.getenv("ARCHIVE_EXPORT_MAX_PARTS", 5))  # bitta eksportdagi fayllar soni
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json yoki text
+LOG_DEBUG_SAMPLE = int(os.getenv("LOG_DEBUG_SAMPLE", 100))  # DEBUG yozuvlaridan har N-chisi
+LOG_ROSTER = os.getenv("LOG_ROSTER", "0") == "1"  # ishga tushganda har bir tyutorni logga yozish
+THROTTLE_MESSAGE_RATE = float(os.getenv("THROTTLE_MESSAGE_RATE", 1))  # bitta foydalanuvchidan xabar/sekund, 0 - cheklanmaydi
+THROTTLE_MESSAGE_BURST = int(os.getenv("THROTTLE_MESSAGE_BURST", 5))
+THROTTLE_CALLBACK_RATE = float(os.getenv("THROTTLE_CALLBACK_RATE", 3))  # tugma bosish/sekund
+THROTTLE_CALLBACK_BURST = int(os.getenv("THROTTLE_CALLBACK_BURST", 10))
+THROTTLE_CHAT_RATE = float(os.getenv("THROTTLE_CHAT_RATE", 5))  # bitta chatdan barcha update'lar/sekund
+THROTTLE_CHAT_BURST = int(os.getenv("THROTTLE_CHAT_BURST", 20))
+THROTTLE_COALESCE = float(os.getenv("THROTTLE_COALESCE", 2))  # shuncha sekund ichida takrorlangan bir xil xabar tashlanadi
+THROTTLE_IDLE = int(os.getenv("THROTTLE_IDLE", 600))  # jim turgan foydalanuvchi shuncha sekunddan keyin unutiladi
+RECORD_UPDATES_FILE = os.getenv("RECORD_UPDATES_FILE", "")  # bo'lsa, kelgan update'lar shu .jsonl.gz ga yoziladi
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")  # bo'lsa, Bot API shu manzilga (masalan, mock server)
+BOT_API_POOL_LIMIT = int(os.getenv("BOT_API_POOL_LIMIT", 100))  # Bot API ga jami ochiq ulanishlar
+BOT_API_POOL_PER_HOST = int(os.getenv("BOT_API_POOL_PER_HOST", 0))  # 0 - cheklanmaydi
+BOT_API_KEEPALIVE = float(os.getenv("BOT_API_KEEPALIVE", 30))  # bo'sh ulanish shuncha sekund saqlanadi, 0 - keep-alive o'chiq
+BOT_API_DNS_TTL = int(os.getenv("BOT_API_DNS_TTL", 300))
+BOT_API_CONNECT_TIMEOUT = float(os.getenv("BOT_API_CONNECT_TIMEOUT", 5))
+BOT_API_READ_TIMEOUT = float(os.getenv("BOT_API_READ_TIMEOUT", 30))
+BOT_API_TIMEOUT = float(os.getenv("BOT_API_TIMEOUT", 60))  # butun so'rov uchun
+CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", 1))  # cluster.py o'rnatadi: jami worker jarayonlar
+CLUSTER_WORKER_INDEX = int(os.getenv("CLUSTER_WORKER_INDEX", 0))  # shu jarayonning raqami
 
-# Malumotlarni saqlash
-students_data = {}
-requests_data = {}
-Tyutors_data = {}
+setup_logging(LOG_LEVEL, LOG_FORMAT, debug_sample=LOG_DEBUG_SAMPLE)
+log = logging.getLogger("aloqa")
+
+# Malumotlarni saqlash (SQLite ombori)
+# Jurnal snapshot bilan birga ishlaydi (u jurnalni qisqartiradi); klasterda baza umumiy - ikkalasi ham o'chiq
+journal = EventJournal(JOURNAL_FILE) if JOURNAL_FILE and SNAPSHOT_FILE and CLUSTER_WORKERS == 1 else None
+store = RequestStore(DB_FILE, tail_size=HISTORY_TAIL, node=CLUSTER_WORKER_INDEX, nodes=CLUSTER_WORKERS,
+                     journal=journal)
+# Oxirgi snapshot: to'g'ri to'xtatishdan yoki (jurnal bilan) davriy - qulashdan keyin ham
+saved_state = load_snapshot(SNAPSHOT_FILE, remove=journal is None) if CLUSTER_WORKERS == 1 else None
+store.open(snapshot=saved_state and saved_state.get("store"))
+snapshots = SnapshotManager(store, SNAPSHOT_FILE, journal, interval=JOURNAL_SNAPSHOT_INTERVAL,
+                            max_events=JOURNAL_SNAPSHOT_EVENTS)
 
 CONFIG_FILE = "config.json"
+config_writer = ConfigWriter(CONFIG_FILE)
 
 def load_faculties():
     """Load faculties from config.json"""
@@ -35,33 +126,47 @@ def load_faculties():
             FACULTIES = {}
         
         total_Tyutors = sum(len(Tyutors) for Tyutors in FACULTIES.values())
-        print(f" ✅ Fakultetlar yuklandi: {list(FACULTIES.keys())}")
-        print(f" ✅ Jami Tyutorlar: {total_Tyutors}")
+        log.info("Fakultetlar yuklandi: %d fakultet, %d Tyutor", len(FACULTIES), total_Tyutors)
         
-        for faculty, Tyutors in FACULTIES.items():
-            for Tyutor in Tyutors:
-                print(f"   - {Tyutor['name']} (ID: {Tyutor['chat_id']}) - {faculty}")
+        if LOG_ROSTER:
+            for faculty, Tyutors in FACULTIES.items():
+                for Tyutor in Tyutors:
+                    log.info("   - %s (ID: %s) - %s", Tyutor['name'], Tyutor['chat_id'], faculty)
         
         return FACULTIES if FACULTIES else {}
     except json.JSONDecodeError as e:
-        print(f" ❌ ERROR: JSON parsing xatosi: {e}")
+        log.error("JSON parsing xatosi: %s", e)
+        recovered = config_writer.recover()
+        if recovered is not None:
+            log.warning("Config jurnaldan tiklandi (versiya %d)", config_writer.version)
+            return recovered
         return {}
     except Exception as e:
-        print(f" ❌ ERROR: {e}")
+        log.exception("Config yuklanmadi: %s", e)
         return {}
 
-def save_faculties(faculties):
-    """Save faculties to config.json"""
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(faculties, f, ensure_ascii=False, indent=2)
-        print(f" ✅ Config saqlandi: {CONFIG_FILE}")
-        return True
-    except Exception as e:
-        print(f" ❌ ERROR: Config saqlanmadi: {e}")
-        return False
+def save_faculties(faculties, change=None):
+    """config.json ga saqlashni rejalashtirish (fon rejimida, atomik)"""
+    config_writer.schedule(faculties, change)
+
+roster = Roster(load_faculties())
 
-FACULTIES = load_faculties()
+def reload_roster(faculties):
+    """config.json tashqaridan o'zgartirilganda ro'yxatni almashtirish"""
+    # Eski ro'yxat bilan rejalashtirilgan yozuv tashqi o'zgarishni ustidan yozib yubormasin
+    dropped = config_writer.discard()
+    if dropped:
+        log.warning("Config tashqaridan o'zgartirildi - saqlanmagan %d o'zgarish bekor qilindi", dropped)
+    roster.replace(faculties)
+    log.info("Config qayta yuklandi: %d fakultet, %d Tyutor (versiya %d)", len(faculties), roster.total_tutors(), roster.version)
+
+keyboard_cache = KeyboardCache(roster)
+config_watcher = ConfigWatcher(CONFIG_FILE, reload_roster, interval=CONFIG_POLL_INTERVAL, writer=config_writer)
+# Klasterda arxivlashni faqat birinchi worker bajaradi
+archive_manager = ArchiveManager(
+    store, max_age=int(ARCHIVE_AFTER_DAYS * 86400),
+    interval=ARCHIVE_INTERVAL if CLUSTER_WORKER_INDEX == 0 else 0
+)
 
 # Rad etish sabablarini yuklash
 try:
@@ -70,7 +175,7 @@ try:
 except:
     REJECTION_REASONS = ["Vaqt ichida javob bera olmayapman", "Boshqa sabablar"]
 
-print(f" Bot ishga tushmoqda... Admin ID: {ADMIN_ID}")
+log.info("Bot ishga tushmoqda... Admin ID: %s", ADMIN_ID)
 
 # Talaba states
 class StudentStates(StatesGroup):
@@ -95,66 +200,113 @@ class AdminStates(StatesGroup):
     editing_Tyutor_name = State()
     editing_Tyutor_chat_id = State()
 
-bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
+api_session = BotAPISession(
+    api=TelegramAPIServer.from_base(TELEGRAM_API_URL) if TELEGRAM_API_URL else PRODUCTION,
+    limit=BOT_API_POOL_LIMIT,
+    limit_per_host=BOT_API_POOL_PER_HOST,
+    keepalive=BOT_API_KEEPALIVE,
+    dns_ttl=BOT_API_DNS_TTL,
+    connect_timeout=BOT_API_CONNECT_TIMEOUT,
+    read_timeout=BOT_API_READ_TIMEOUT,
+    timeout=BOT_API_TIMEOUT,
+)
+bot = api_session.bot(BOT_TOKEN)
+# Telegram chegarasi bot uchun umumiy - klasterda workerlar o'rtasida bo'linadi
+outbox = Outbox(bot, global_rate=OUTBOX_GLOBAL_RATE / CLUSTER_WORKERS, chat_rate=OUTBOX_CHAT_RATE, workers=OUTBOX_WORKERS)
+if FSM_REDIS_URL:
+    from redis.asyncio import Redis  # ixtiyoriy: pip install redis
+    fsm_backend = RedisKV(Redis.from_url(FSM_REDIS_URL))
+else:
+    fsm_backend = ShardedKV(SQLiteKV(f"fsm_{i}.db") for i in range(FSM_SHARDS))
+storage = PersistentStorage(fsm_backend, ttl=FSM_TTL)
 dp = Dispatcher(storage=storage)
 
+async def stale_callback(query: CallbackQuery, state: FSMContext):
+    """Eski formatdagi yoki noma'lum tugma bosildi"""
+    await query.answer("⚠️ Bu tugma eskirgan, /start ni bosing.", show_alert=True)
+
+callback_router = CallbackRouter(on_unknown=stale_callback)
+dp.callback_query.register(callback_router.dispatch)
+
+async def process_update(update: types.Update):
+    """Bitta update'ni dispatcher orqali qayta ishlash"""
+    if store.shared:
+        # Boshqa workerlar o'zgartirgan murojaatlarni olamiz, o'zimiznikini darhol yozamiz
+        await store.sync()
+        await dp.feed_update(bot, update)
+        await store.flush()
+    else:
+        await dp.feed_update(bot, update)
+
+update_queue = UpdateQueue(process_update, workers=UPDATE_WORKERS, maxsize=UPDATE_QUEUE_SIZE)
+# Klasterda takrorlarni tekshirish va yozib olish front jarayonda (cluster.py)
+dedup = UpdateDeduplicator(maxsize=DEDUP_SIZE, window=DEDUP_WINDOW, path=DEDUP_FILE if CLUSTER_WORKERS == 1 else None)
+recorder = UpdateRecorder(RECORD_UPDATES_FILE) if RECORD_UPDATES_FILE and CLUSTER_WORKERS == 1 else None
+
+# ===== METRIKALAR =====
+
+metrics = Metrics()
+
+def handler_name(handler_object, event):
+    """Metrikalar uchun handler nomi (callback'lar uchun router ichidagi handler)"""
+    callback = handler_object.callback if handler_object else None
+    if callback == callback_router.dispatch:
+        routed = callback_router.resolve(event.data)
+        return routed.__name__ if routed else "stale_callback"
+    return getattr(callback, "__name__", "unknown")
+
+throttle = ThrottleMiddleware(
+    {"message": (THROTTLE_MESSAGE_RATE, THROTTLE_MESSAGE_BURST),
+     "callback_query": (THROTTLE_CALLBACK_RATE, THROTTLE_CALLBACK_BURST)},
+    chat_limit=(THROTTLE_CHAT_RATE, THROTTLE_CHAT_BURST),
+    coalesce_window=THROTTLE_COALESCE,
+    idle_ttl=THROTTLE_IDLE,
+    exempt={ADMIN_ID},
+    metrics=metrics,
+)
+
+dp.update.outer_middleware(LogContextMiddleware())
+# Tashlangan update'lar handler metrikalariga tushmasligi uchun undan oldin
+dp.update.outer_middleware(throttle)
+dp.update.outer_middleware(UpdateMetricsMiddleware(metrics))
+handler_metrics = HandlerMetricsMiddleware(metrics, name_of=handler_name)
+handler_log_context = LogContextMiddleware(name_of=handler_name)
+for observer in (dp.message, dp.callback_query):
+    observer.middleware(handler_log_context)
+    observer.middleware(handler_metrics)
+bot.session.middleware(ApiMetricsMiddleware(metrics))
+metrics.gauge("update_queue_depth", update_queue.depth, "Navbatdagi update'lar")
+metrics.gauge("outbox_queue_depth", outbox.depth, "Yuborilishini kutayotgan xabarlar")
+metrics.gauge("outbox_dead_letters", lambda: len(outbox.dead_letters), "Yuborilmagan xabarlar")
+metrics.gauge("requests_hot", lambda: len(store.requests), "Xotiradagi murojaatlar")
+metrics.counter("api_connections_opened_total", lambda: api_session.connections_opened, "Bot API ga ochilgan ulanishlar")
+metrics.counter("api_connections_reused_total", lambda: api_session.connections_reused, "Qayta ishlatilgan (keep-alive) ulanishlar")
+
 # ===== TALABA HANDLERLARI =====
 
 @dp.message(Command("start"))
 async def start(message: Message, state: FSMContext):
     """Bot boshlanishi"""
     user_id = message.from_user.id
-    print(f" DEBUG: /start - user_id = {user_id}, first_name = {message.from_user.first_name}")
+    log.debug("/start: %s", message.from_user.first_name)
     
     if user_id == ADMIN_ID:
-        print(f" Admin kiritildi!")
+        log.info("Admin kiritildi")
         await admin_menu(message, state)
         return
     
-    is_Tyutor = False
-    Tyutor_faculty = None
-    Tyutor_obj = None
-    
-    for faculty, Tyutors in FACULTIES.items():
-        for Tyutor in Tyutors:
-            Tyutor_chat_id = Tyutor.get('chat_id')
-            print(f" Tekshirilmoqda: user_id={user_id} vs Tyutor_chat_id={Tyutor_chat_id}")
-            
-            if Tyutor_chat_id == user_id:
-                is_Tyutor = True
-                Tyutor_faculty = faculty
-                Tyutor_obj = Tyutor
-                Tyutors_data[user_id] = Tyutor['name']
-                print(f" ✅ Tyutor TOPILDI: {Tyutor['name']} ({user_id}) - {faculty}")
-                break
-        
-        if is_Tyutor:
-            break
-    
-    if is_Tyutor:
+    found = roster.find(user_id)
+    if found:
+        Tyutor, faculty = found
+        log.info("Tyutor topildi: %s - %s", Tyutor['name'], faculty)
         await show_Tyutor_panel(message, state)
         return
     
-    if not is_Tyutor:
-        print(f" ⚠️ Tyutor topilmadi user_id={user_id} uchun")
-        print(f" Mavjud Tyutorlar ID lari: {[t['chat_id'] for faculty, Tyutors in FACULTIES.items() for t in Tyutors]}")
-    
     # Oddiy talaba
-    if user_id not in students_data:
-        students_data[user_id] = {
-            "name": None,
-            "phone": None,
-            "requests": []
-        }
+    if store.get_student(user_id) is None:
+        store.update_student(user_id)
     
-    keyboards = []
-    for faculty in FACULTIES.keys():
-        keyboards.append([InlineKeyboardButton(text=faculty, callback_data=f"faculty_{faculty}")])
-    
-    keyboards.append([InlineKeyboardButton(text="❌ Bekor qilish", callback_data="cancel")])
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboards)
+    keyboard = keyboard_cache.faculty_picker()
     await message.answer(
         f"👋 Salom, {message.from_user.first_name}!\n\n"
         "Murojaat qilmoqchi bo'lgan fakultetingizni tanlang:",
@@ -162,83 +314,127 @@ async def start(message: Message, state: FSMContext):
     )
     await state.set_state(StudentStates.selecting_faculty)
 
-async def show_Tyutor_panel(message: Message, state: FSMContext):
-    """Tyutor uchun panel"""
-    Tyutor_id = message.from_user.id
-    
-    Tyutor_requests = [
-        (req_id, req) for req_id, req in requests_data.items() 
-        if req.get('Tyutor_id') == Tyutor_id
-    ]
-    
-    if not Tyutor_requests:
-        await message.answer("📭 Sizga murojat kelmagan.")
-        return
+STATUS_EMOJI = {
+    Status.PENDING: "⏳",
+    Status.ACCEPTED: "✅",
+    Status.REJECTED: "❌",
+    Status.CANCELLED: "⛔",
+    Status.FINISHED: "✔️",
+}
+
+def build_Tyutor_panel(Tyutor_id, status=None, page=0):
+    """Tyutor panelining bitta sahifasi (matn va tugmalar)"""
+    total = store.count_tutor_requests(Tyutor_id, status)
+    pages = max(1, (total + PANEL_PAGE_SIZE - 1) // PANEL_PAGE_SIZE)
+    page = min(max(page, 0), pages - 1)
+    Tyutor_requests = store.tutor_requests(
+        Tyutor_id, status, offset=page * PANEL_PAGE_SIZE, limit=PANEL_PAGE_SIZE
+    )
     
-    text = "📋 SIZNING MUROJATLARINGIZ\n\n"
+    text = "📋 SIZNING MUROJATLARINGIZ\n"
+    if status:
+        text += f"Filtr: {STATUS_EMOJI.get(status, '')} {status}\n"
+    text += f"Sahifa {page + 1}/{pages} (jami {total})\n\n"
     keyboards = []
     
-    for req_id, req in Tyutor_requests:
-        status_emoji = "⏳" if req['status'] == "pending" else \
-                      "✅" if req['status'] == "accepted" else \
-                      "❌" if req['status'] == "rejected" else "✔️"
+    for req in Tyutor_requests:
+        status_emoji = STATUS_EMOJI.get(req.status, "✔️")
         
-        text += f"{status_emoji} {req['student_name']} - {req['status']}\n"
+        text += f"{status_emoji} {req.student_name} - {req.status}\n"
         keyboards.append([
             InlineKeyboardButton(
-                text=f"👀 {req['student_name']}", 
-                callback_data=f"Tyutor_view_{req_id}"
+                text=f"👀 {req.student_name}", 
+                callback_data=pack(VIEW, req.id)
             )
         ])
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboards)
+    if not Tyutor_requests:
+        text += "Bu bo'limda murojat yo'q.\n"
+    
+    # Status raqami: 0 - hammasi, aks holda PANEL_STATUS_ORDER dagi o'rni + 1
+    status_idx = PANEL_STATUS_ORDER.index(status) + 1 if status else 0
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="⬅️ Oldingi", callback_data=pack(PANEL_PAGE, status_idx, page - 1)))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton(text="Keyingi ➡️", callback_data=pack(PANEL_PAGE, status_idx, page + 1)))
+    if nav:
+        keyboards.append(nav)
+    
+    filters = [InlineKeyboardButton(text="📋 Barchasi", callback_data=pack(PANEL_PAGE, 0, 0))]
+    for i, st in enumerate(PANEL_STATUS_ORDER):
+        count = store.count_tutor_requests(Tyutor_id, st)
+        filters.append(InlineKeyboardButton(
+            text=f"{STATUS_EMOJI[st]} {count}", callback_data=pack(PANEL_PAGE, i + 1, 0)
+        ))
+    # Barcha statuslar: 3 tadan ikki qatorda
+    keyboards.append(filters[:3])
+    keyboards.append(filters[3:])
+    
+    return text, InlineKeyboardMarkup(inline_keyboard=keyboards)
+
+async def show_Tyutor_panel(message: Message, state: FSMContext):
+    """Tyutor uchun panel"""
+    Tyutor_id = message.from_user.id
+    
+    if not store.count_tutor_requests(Tyutor_id):
+        await message.answer("📭 Sizga murojat kelmagan.")
+        return
+    
+    text, keyboard = build_Tyutor_panel(Tyutor_id)
     await message.answer(text, reply_markup=keyboard)
 
-@dp.callback_query(F.data == "cancel")
+@callback_router.route(PANEL_PAGE)
+async def Tyutor_panel_page(query: CallbackQuery, state: FSMContext, status_idx, page):
+    """Tyutor paneli: sahifa va filtr"""
+    status = PANEL_STATUS_ORDER[status_idx - 1] if 0 < status_idx <= len(PANEL_STATUS_ORDER) else None
+    
+    text, keyboard = build_Tyutor_panel(query.from_user.id, status, page)
+    try:
+        await query.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Joriy filtr yoki sahifa qayta bosildi - matn o'zgarmagan
+        if "message is not modified" not in str(e):
+            raise
+    finally:
+        await query.answer()
+
+@callback_router.route(CANCEL)
 async def cancel_student_request(query: CallbackQuery, state: FSMContext):
     """Bekor qilish"""
     await query.message.delete()
     await query.message.answer("❌ Bekor qilindi. /start buyrug'ini yuboring.")
     await state.clear()
 
-@dp.callback_query(StateFilter(StudentStates.selecting_faculty))
-async def faculty_selected(query: CallbackQuery, state: FSMContext):
+@callback_router.route(FACULTY)
+async def faculty_selected(query: CallbackQuery, state: FSMContext, key):
     """Fakultet tanlandi"""
-    faculty_name = query.data.split("_", 1)[1]
+    faculty_name = roster.faculty_by_key(key)
+    if faculty_name is None:
+        await query.answer("⚠️ Bu fakultet endi mavjud emas, /start ni bosing.", show_alert=True)
+        return
     
     await state.update_data(selected_faculty=faculty_name)
     
-    Tyutors = FACULTIES.get(faculty_name, [])
-    
-    keyboards = []
-    for Tyutor in Tyutors:
-        keyboards.append([
-            InlineKeyboardButton(
-                text=f"👨‍🏫 {Tyutor['name']}", 
-                callback_data=f"Tyutor_{Tyutor['chat_id']}"
-            )
-        ])
-    
-    keyboards.append([InlineKeyboardButton(text="🔙 Orqaga", callback_data="go_back")])
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboards)
+    keyboard = keyboard_cache.tutor_picker(faculty_name)
     await query.message.edit_text(
         f"📚 {faculty_name} - Tyutorlarni tanlang:",
         reply_markup=keyboard
     )
     await state.set_state(StudentStates.selecting_Tyutor)
 
-@dp.callback_query(F.data == "go_back")
+@callback_router.route(GO_BACK)
 async def go_back(query: CallbackQuery, state: FSMContext):
     """Orqaga qaytish"""
     await state.clear()
     await start(query.message, state)
 
-@dp.callback_query(StateFilter(StudentStates.selecting_Tyutor))
-async def Tyutor_selected(query: CallbackQuery, state: FSMContext):
+@callback_router.route(TYUTOR)
+async def Tyutor_selected(query: CallbackQuery, state: FSMContext, Tyutor_id):
     """Tyutor tanlandi"""
-    Tyutor_id = int(query.data.split("_")[1])
-    
+    if not roster.is_tutor(Tyutor_id):
+        await stale_callback(query, state)
+        return
     await state.update_data(selected_Tyutor=Tyutor_id)
     
     await query.message.edit_text(
@@ -249,15 +445,9 @@ async def Tyutor_selected(query: CallbackQuery, state: FSMContext):
 @dp.message(StateFilter(StudentStates.entering_name))
 async def get_name(message: Message, state: FSMContext):
     """Ismi olinadi"""
-    students_data[message.from_user.id]["name"] = message.text
-    
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[[
-            KeyboardButton(text="📱 Telefon raqamni yuborish", request_contact=True)
-        ]]],
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
+    store.update_student(message.from_user.id, name=message.text)
+    
+    keyboard = CONTACT_KEYBOARD
     
     await message.answer(
         "📱 Telefon raqamingizni tugmasi orqali yuboruq:",
@@ -268,7 +458,7 @@ async def get_name(message: Message, state: FSMContext):
 @dp.message(StateFilter(StudentStates.entering_phone), F.contact)
 async def get_contact(message: Message, state: FSMContext):
     """Kontakt qabul qilish"""
-    students_data[message.from_user.id]["phone"] = message.contact.phone_number
+    store.update_student(message.from_user.id, phone=message.contact.phone_number)
     
     await message.answer(
         "✍️ Endi murojatingizni yozing.\nAniq va to'liq ma'lumot bering:",
@@ -279,7 +469,7 @@ async def get_contact(message: Message, state: FSMContext):
 @dp.message(StateFilter(StudentStates.entering_phone))
 async def get_phone_text(message: Message, state: FSMContext):
     """Qo'lda telefon kiritish"""
-    students_data[message.from_user.id]["phone"] = message.text
+    store.update_student(message.from_user.id, phone=message.text)
     
     await message.answer(
         "✍️ Endi murojatingizni yozing:\nAniq va to'liq ma'lumot bering:",
@@ -293,28 +483,28 @@ async def save_request(message: Message, state: FSMContext):
     user_id = message.from_user.id
     data = await state.get_data()
     
-    request_id = f"req_{user_id}_{int(datetime.now().timestamp() * 1000)}"
+    request_id = store.new_request_id()
     
     Tyutor_id = data.get("selected_Tyutor")
     faculty = data.get("selected_faculty")
+    student = store.get_student(user_id) or store.update_student(user_id)
     
-    requests_data[request_id] = {
-        "student_id": user_id,
-        "student_name": students_data[user_id]["name"],
-        "student_phone": students_data[user_id]["phone"],
-        "Tyutor_id": Tyutor_id,
-        "faculty": faculty,
-        "text": message.text,
-        "status": "pending",
-        "messages": [],
-        "created_at": datetime.now().isoformat()
-    }
+    store.add_request(Request(
+        id=request_id,
+        student_id=user_id,
+        student_name=student.name,
+        student_phone=student.phone,
+        Tyutor_id=Tyutor_id,
+        faculty=faculty,
+        text=message.text,
+    ))
     
-    print(f" Murojaat yaratildi: {request_id} -> Tyutor_id: {Tyutor_id}")
+    bind(request_id=request_id)
+    log.info("Murojaat yaratildi -> Tyutor_id: %s", Tyutor_id)
     
-    cancel_keyboard = InlineKeyboardMarkup(inline_keyboard=[[[
-        InlineKeyboardButton(text="❌ Bekor qilish", callback_data=f"cancel_request_{request_id}")
-    ]]])
+    cancel_keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="❌ Bekor qilish", callback_data=pack(CANCEL_REQUEST, request_id))
+    ]])
     
     await message.answer(
         "✅ Murojatingiz qabul qilindi!\n"
@@ -323,129 +513,152 @@ async def save_request(message: Message, state: FSMContext):
     )
     
     Tyutor_chat_id = Tyutor_id
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[[[
-        InlineKeyboardButton(text="✅ Qabul qilish", callback_data=f"accept_{request_id}"),
-        InlineKeyboardButton(text="❌ Rad etish", callback_data=f"reject_{request_id}")
-    ]]])
-    
-    try:
-        await bot.send_message(
-            Tyutor_chat_id,
-            f"📬 YANGI MUROJAAT\n\n"
-            f"👤 Talaba: {students_data[user_id]['name']}\n"
-            f"📚 Fakultet: {faculty}\n"
-            f"📱 Telefon: {students_data[user_id]['phone']}\n\n"
-            f"💬 Murojaat:\n{message.text}\n\n"
-            f"ID: {request_id}",
-            reply_markup=keyboard
-        )
-        print(f" Murojaat Tyutorga yuborildi: {Tyutor_chat_id}")
-    except Exception as e:
-        print(f" ERROR: Tyutor {Tyutor_chat_id} ga yuborilmadi: {e}")
-        await message.answer(f"⚠️ Xato: Tyutor {Tyutor_chat_id} ga habar yuborilmadi!")
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="✅ Qabul qilish", callback_data=pack(ACCEPT, request_id)),
+        InlineKeyboardButton(text="❌ Rad etish", callback_data=pack(REJECT, request_id))
+    ]])
+    
+    delivery = outbox.send_message(
+        Tyutor_chat_id,
+        f"📬 YANGI MUROJAAT\n\n"
+        f"👤 Talaba: {student.name}\n"
+        f"📚 Fakultet: {faculty}\n"
+        f"📱 Telefon: {student.phone}\n\n"
+        f"💬 Murojaat:\n{message.text}\n\n"
+        f"ID: {request_id}",
+        reply_markup=keyboard
+    )
+    # Tyutorga yetkazilmasa, talabaga xabar beramiz
+    outbox.notify_on_failure(
+        delivery, user_id, f"⚠️ Xato: Tyutor {Tyutor_chat_id} ga habar yuborilmadi!"
+    )
+    log.debug("Murojaat Tyutorga navbatga qo'yildi: %s", Tyutor_chat_id)
     
     await state.clear()
 
-@dp.callback_query(F.data.startswith("cancel_request_"))
-async def cancel_request_callback(query: CallbackQuery):
+@callback_router.route(CANCEL_REQUEST)
+async def cancel_request_callback(query: CallbackQuery, state: FSMContext, request_id):
     """Murojatni bekor qilish"""
-    request_id = query.data.split("_", 2)[2]
-    
-    if request_id in requests_data:
-        req = requests_data[request_id]
-        if req['status'] == 'pending':
-            requests_data[request_id]['status'] = 'cancelled'
-            try:
-                await bot.send_message(
-                    req['Tyutor_id'],
-                    f"⛔ Murojat bekor qilindi!\nTalaba: {req['student_name']}"
-                )
-            except:
-                pass
+    req = store.get_request(request_id)
+    if req is not None:
+        if req.status == Status.PENDING:
+            store.set_status(request_id, Status.CANCELLED)
+            outbox.send_message(
+                req.Tyutor_id,
+                f"⛔ Murojat bekor qilindi!\nTalaba: {req.student_name}"
+            )
             await query.answer("✅ Murojat bekor qilindi!")
         else:
             await query.answer("⚠️ Bu murojatni bekor qila olmaysiz!", show_alert=True)
 
 # ===== Tyutor HANDLERLARI =====
 
-@dp.callback_query(F.data.startswith("Tyutor_view_"))
-async def Tyutor_view_request(query: CallbackQuery, state: FSMContext):
+@callback_router.route(VIEW)
+async def Tyutor_view_request(query: CallbackQuery, state: FSMContext, request_id):
     """Tyutor murojatni ko'radi"""
-    request_id = query.data.split("_", 2)[2]
-    
-    if request_id not in requests_data:
+    req = await store.lookup(request_id)
+    if req is None:
         await query.answer("❌ Murojaat topilmadi!", show_alert=True)
         return
     
-    req = requests_data[request_id]
-    
     text = (
         f"📬 MUROJAAT\n\n"
-        f"👤 Talaba: {req['student_name']}\n"
-        f"📱 Telefon: {req['student_phone']}\n"
-        f"📚 Fakultet: {req['faculty']}\n"
-        f"Status: {req['status']}\n\n"
-        f"💬 Murojaat:\n{req['text']}"
+        f"👤 Talaba: {req.student_name}\n"
+        f"📱 Telefon: {req.student_phone}\n"
+        f"📚 Fakultet: {req.faculty}\n"
+        f"Status: {req.status}\n\n"
+        f"💬 Murojaat:\n{req.text}"
     )
     
-    if req['status'] == 'rejected':
+    if req.status == Status.REJECTED:
         await query.message.edit_text(text + "\n\n❌ Bu murojat rad etildi!")
         return
     
-    if req['status'] == 'cancelled':
+    if req.status == Status.CANCELLED:
         await query.message.edit_text(text + "\n\n⛔ Bu murojat bekor qilindi!")
         return
     
     keyboards = []
-    if req['status'] == 'pending':
-        keyboards.append([[[
-            InlineKeyboardButton(text="✅ Qabul qilish", callback_data=f"accept_{request_id}"),
-            InlineKeyboardButton(text="❌ Rad etish", callback_data=f"reject_{request_id}")
-        ]]])
-    elif req['status'] == 'accepted':
-        keyboards.append([[[
-            InlineKeyboardButton(text="💬 Javob berish", callback_data=f"respond_{request_id}"),
-            InlineKeyboardButton(text="✔️ Yakunlash", callback_data=f"finish_{request_id}")
-        ]]])
+    message_count = req.message_count
+    if message_count:
+        keyboards.append([
+            InlineKeyboardButton(text=f"📜 Suxbat tarixi ({message_count})", callback_data=pack(HISTORY, request_id, 0))
+        ])
+    if req.status == Status.PENDING:
+        keyboards.append([
+            InlineKeyboardButton(text="✅ Qabul qilish", callback_data=pack(ACCEPT, request_id)),
+            InlineKeyboardButton(text="❌ Rad etish", callback_data=pack(REJECT, request_id))
+        ])
+    elif req.status == Status.ACCEPTED:
+        keyboards.append([
+            InlineKeyboardButton(text="💬 Javob berish", callback_data=pack(RESPOND, request_id)),
+            InlineKeyboardButton(text="✔️ Yakunlash", callback_data=pack(FINISH, request_id))
+        ])
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=keyboards)
     await query.message.edit_text(text, reply_markup=keyboard)
 
-@dp.callback_query(F.data.startswith("accept_"))
-async def accept_request(query: CallbackQuery, state: FSMContext):
-    """Murojaat qabul qilish"""
-    request_id = query.data.split("_", 1)[1]
-    
-    if request_id not in requests_data:
+@callback_router.route(HISTORY)
+async def show_history(query: CallbackQuery, state: FSMContext, request_id, page):
+    """Suxbat tarixi (sahifalab, yangilari birinchi sahifada)"""
+    req = await store.lookup(request_id)
+    if req is None:
         await query.answer("❌ Murojaat topilmadi!", show_alert=True)
         return
     
-    requests_data[request_id]["status"] = "accepted"
+    total = req.message_count
+    pages = max(1, (total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE)
+    page = min(max(page, 0), pages - 1)
+    messages = await store.history(request_id, offset=page * HISTORY_PAGE_SIZE, limit=HISTORY_PAGE_SIZE)
+    
+    text = f"📜 SUXBAT TARIXI: {req.student_name}\nSahifa {page + 1}/{pages} (jami {total})\n\n"
+    # Sahifa ichida eski xabar yuqorida
+    for msg in reversed(messages):
+        sender = "👨‍🏫 Tyutor" if msg.sender == "Tyutor" else "👤 Talaba"
+        time = datetime.fromtimestamp(msg.time).strftime("%Y-%m-%d %H:%M")
+        body = msg.text or ""
+        if len(body) > 300:
+            body = body[:300] + "…"
+        text += f"{sender} ({time}):\n{body}\n\n"
+    
+    nav = []
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton(text="⬅️ Eskiroq", callback_data=pack(HISTORY, request_id, page + 1)))
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="Yangiroq ➡️", callback_data=pack(HISTORY, request_id, page - 1)))
+    keyboards = [nav] if nav else []
+    keyboards.append([InlineKeyboardButton(text="🔙 Murojaatga qaytish", callback_data=pack(VIEW, request_id))])
+    
+    await query.message.edit_text(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboards))
+    await query.answer()
+
+@callback_router.route(ACCEPT)
+async def accept_request(query: CallbackQuery, state: FSMContext, request_id):
+    """Murojaat qabul qilish"""
+    req = store.set_status(request_id, Status.ACCEPTED)
+    if req is None:
+        await query.answer("❌ Murojaat topilmadi!", show_alert=True)
+        return
     
-    req = requests_data[request_id]
-    try:
-        await bot.send_message(
-            req["student_id"],
-            f"✅ Tyutor murojatingizni qabul qildi!\n\n"
-            f"👨‍🏫 Tyutor: {Tyutors_data.get(req['Tyutor_id'], 'Noma\'lum')}\n"
-            "Javob kutilmoqda..."
-        )
-    except:
-        pass
+    Tyutor_name = roster.tutor_name(req.Tyutor_id, "Noma'lum")
+    outbox.send_message(
+        req.student_id,
+        f"✅ Tyutor murojatingizni qabul qildi!\n\n"
+        f"👨‍🏫 Tyutor: {Tyutor_name}\n"
+        "Javob kutilmoqda..."
+    )
     
     await query.answer("✅ Murojat qabul qilindi!")
     await state.update_data(current_request=request_id)
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[[[
-        InlineKeyboardButton(text="💬 Javob berish", callback_data=f"respond_{request_id}")
-    ]]])
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="💬 Javob berish", callback_data=pack(RESPOND, request_id))
+    ]])
     await query.message.edit_reply_markup(reply_markup=keyboard)
 
-@dp.callback_query(F.data.startswith("respond_"))
-async def respond_request(query: CallbackQuery, state: FSMContext):
+@callback_router.route(RESPOND)
+async def respond_request(query: CallbackQuery, state: FSMContext, request_id):
     """Javob berishni boshlash"""
-    request_id = query.data.split("_", 1)[1]
-    
     await state.update_data(current_request=request_id)
     await query.message.answer("📝 Javobingizni yozing:")
     await state.set_state(TyutorStates.responding)
@@ -456,56 +669,46 @@ async def send_response(message: Message, state: FSMContext):
     data = await state.get_data()
     request_id = data.get("current_request")
     
-    if request_id not in requests_data:
+    req = store.get_request(request_id)
+    if req is None:
         await message.answer("❌ Murojaat topilmadi!")
         return
     
-    req = requests_data[request_id]
-    
-    if req['status'] == 'rejected':
+    if req.status == Status.REJECTED:
         await message.answer("❌ Rad etilgan murojatga javob bera olmaysiz!")
         await state.clear()
         return
     
-    if req['status'] == 'cancelled':
+    if req.status == Status.CANCELLED:
         await message.answer("⛔ Bekor qilingan murojatga javob bera olmaysiz!")
         await state.clear()
         return
     
-    req["messages"].append({
-        "sender": "Tyutor",
-        "text": message.text,
-        "time": datetime.now().isoformat(),
-        "request_id": request_id
-    })
+    store.add_message(request_id, ChatMessage("Tyutor", message.text))
     
-    talaba_keyboard = InlineKeyboardMarkup(inline_keyboard=[[[
-        InlineKeyboardButton(text="💬 Javob berish", callback_data=f"student_reply_{request_id}")
-    ]]])
+    talaba_keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="💬 Javob berish", callback_data=pack(STUDENT_REPLY, request_id))
+    ]])
     
-    try:
-        await bot.send_message(
-            req["student_id"],
-            f"📩 Tyutordan javob:\n\n{message.text}",
-            reply_markup=talaba_keyboard
-        )
-    except:
-        pass
+    outbox.send_message(
+        req.student_id,
+        f"📩 Tyutordan javob:\n\n{message.text}",
+        reply_markup=talaba_keyboard
+    )
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[[[
-        InlineKeyboardButton(text="🔄 Davom etish", callback_data=f"continue_{request_id}"),
-        InlineKeyboardButton(text="✔️ Yakunlash", callback_data=f"finish_{request_id}")
-    ]]])
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="🔄 Davom etish", callback_data=pack(CONTINUE, request_id)),
+        InlineKeyboardButton(text="✔️ Yakunlash", callback_data=pack(FINISH, request_id))
+    ]])
     
     await message.answer("✅ Javobingiz talabaga yuborildi!", reply_markup=keyboard)
     await state.clear()
 
-@dp.callback_query(F.data.startswith("student_reply_"))
-async def student_reply(query: CallbackQuery, state: FSMContext):
+@callback_router.route(STUDENT_REPLY)
+async def student_reply(query: CallbackQuery, state: FSMContext, request_id):
     """Talaba javob beradi"""
-    request_id = query.data.split("_", 2)[2]
-    
-    if request_id in requests_data and requests_data[request_id]['status'] == 'rejected':
+    req = store.get_request(request_id)
+    if req is not None and req.status == Status.REJECTED:
         await query.answer("❌ Rad etilgan murojatga javob bera olmaysiz!", show_alert=True)
         return
     
@@ -519,47 +722,36 @@ async def student_send_reply(message: Message, state: FSMContext):
     data = await state.get_data()
     request_id = data.get("current_request")
     
-    if request_id not in requests_data:
+    req = store.get_request(request_id)
+    if req is None:
         await message.answer("❌ Xato!")
         return
     
-    req = requests_data[request_id]
-    
-    if req['status'] == 'rejected':
+    if req.status == Status.REJECTED:
         await message.answer("❌ Rad etilgan murojatga javob bera olmaysiz!")
         await state.clear()
         return
     
-    req["messages"].append({
-        "sender": "student",
-        "text": message.text,
-        "time": datetime.now().isoformat(),
-        "request_id": request_id
-    })
+    store.add_message(request_id, ChatMessage("student", message.text))
     
-    Tyutor_keyboard = InlineKeyboardMarkup(inline_keyboard=[[[
-        InlineKeyboardButton(text="🔄 Davom etish", callback_data=f"continue_{request_id}"),
-        InlineKeyboardButton(text="✔️ Yakunlash", callback_data=f"finish_{request_id}")
-    ]]])
+    Tyutor_keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="🔄 Davom etish", callback_data=pack(CONTINUE, request_id)),
+        InlineKeyboardButton(text="✔️ Yakunlash", callback_data=pack(FINISH, request_id))
+    ]])
     
-    try:
-        await bot.send_message(
-            req["Tyutor_id"],
-            f"📨 {req['student_name']} dan javob:\n\n{message.text}",
-            reply_markup=Tyutor_keyboard
-        )
-    except:
-        pass
+    outbox.send_message(
+        req.Tyutor_id,
+        f"📨 {req.student_name} dan javob:\n\n{message.text}",
+        reply_markup=Tyutor_keyboard
+    )
     
     await message.answer("✅ Javobingiz Tyutorga yuborildi.")
     await state.clear()
 
-@dp.callback_query(F.data.startswith("reject_"))
-async def reject_request(query: CallbackQuery, state: FSMContext):
+@callback_router.route(REJECT)
+async def reject_request(query: CallbackQuery, state: FSMContext, request_id):
     """Murojaat rad etish"""
-    request_id = query.data.split("_", 1)[1]
-    
-    keyboards = [[InlineKeyboardButton(text=reason, callback_data=f"reason_{request_id}_{i}")] 
+    keyboards = [[InlineKeyboardButton(text=reason, callback_data=pack(REASON, request_id, i))] 
                  for i, reason in enumerate(REJECTION_REASONS)]
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=keyboards)
@@ -569,29 +761,24 @@ async def reject_request(query: CallbackQuery, state: FSMContext):
         reply_markup=keyboard
     )
 
-@dp.callback_query(F.data.startswith("reason_"))
-async def send_rejection(query: CallbackQuery):
+@callback_router.route(REASON)
+async def send_rejection(query: CallbackQuery, state: FSMContext, request_id, reason_idx):
     """Rad etish sababini yuborish"""
-    parts = query.data.split("_")
-    request_id = "_".join(parts[1:-1])
-    reason_idx = int(parts[-1])
-    
-    if request_id not in requests_data:
-        await query.answer("❌ Murojaat topilmadi!", show_alert=True)
+    # Sabablar ro'yxati o'zgargan bo'lsa, eski tugmadagi raqam noto'g'ri bo'lishi mumkin
+    if not 0 <= reason_idx < len(REJECTION_REASONS):
+        await stale_callback(query, state)
         return
-    
     reason = REJECTION_REASONS[reason_idx]
-    req = requests_data[request_id]
-    req["status"] = "rejected"
+    req = store.set_status(request_id, Status.REJECTED, reason=reason)
+    if req is None:
+        await query.answer("❌ Murojaat topilmadi!", show_alert=True)
+        return
     
-    try:
-        await bot.send_message(
-            req["student_id"],
-            f"❌ Kechirasiz, murojatingiz rad etildi.\n"
-            f"Sabab: {reason}"
-        )
-    except:
-        pass
+    outbox.send_message(
+        req.student_id,
+        f"❌ Kechirasiz, murojatingiz rad etildi.\n"
+        f"Sabab: {reason}"
+    )
     
     await query.message.edit_text(
         query.message.text + f"\n\n✅ Murojat rad etildi.\nSabab: {reason}",
@@ -600,35 +787,26 @@ async def send_rejection(query: CallbackQuery):
     
     await query.answer("Murojaat rad etildi!")
 
-@dp.callback_query(F.data.startswith("continue_"))
-async def continue_conversation(query: CallbackQuery, state: FSMContext):
+@callback_router.route(CONTINUE)
+async def continue_conversation(query: CallbackQuery, state: FSMContext, request_id):
     """Suxbatni davom etish"""
-    request_id = query.data.split("_", 1)[1]
-    
     await state.update_data(current_request=request_id)
     await state.set_state(TyutorStates.responding)
     
     await query.message.answer("💬 Qo'shimcha javobingizni yozing:")
 
-@dp.callback_query(F.data.startswith("finish_"))
-async def finish_conversation(query: CallbackQuery):
+@callback_router.route(FINISH)
+async def finish_conversation(query: CallbackQuery, state: FSMContext, request_id):
     """Suxbatni yakunlash"""
-    request_id = query.data.split("_", 1)[1]
-    
-    if request_id not in requests_data:
+    req = store.set_status(request_id, Status.FINISHED)
+    if req is None:
         await query.answer("❌ Murojaat topilmadi!", show_alert=True)
         return
     
-    req = requests_data[request_id]
-    req["status"] = "finished"
-    
-    try:
-        await bot.send_message(
-            req["student_id"],
-            "✔️ Suxbat yakunlandi. Agar yana savol bo'lsa, qayta murojaat qiling."
-        )
-    except:
-        pass
+    outbox.send_message(
+        req.student_id,
+        "✔️ Suxbat yakunlandi. Agar yana savol bo'lsa, qayta murojaat qiling."
+    )
     
     await query.answer("✅ Suxbat yakunlandi!")
     await query.message.edit_reply_markup(reply_markup=None)
@@ -637,15 +815,7 @@ async def finish_conversation(query: CallbackQuery):
 
 async def admin_menu(message: Message, state: FSMContext):
     """Admin menyusi"""
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[[
-            KeyboardButton(text="📊 Statistika"),
-            KeyboardButton(text="👥 Tyutorlarni ko'rish"),
-            KeyboardButton(text="➕ Tyutor qo'shish"),
-            KeyboardButton(text="✏️ Tyutor tahrirlash"),
-        ]]],
-        resize_keyboard=True
-    )
+    keyboard = ADMIN_MENU_KEYBOARD
     
     await message.answer(
         "⚙️ ADMIN PANEL\n\n"
@@ -656,21 +826,11 @@ async def admin_menu(message: Message, state: FSMContext):
 @dp.message(F.text == "➕ Tyutor qo'shish")
 async def add_Tyutor_start(message: Message, state: FSMContext):
     """Tyutor qo'shish jarayonini boshlash"""
-    if not FACULTIES:
+    if not roster.faculties:
         await message.answer("❌ Hech qanday fakultet topilmadi!")
         return
     
-    keyboard_buttons = []
-    for faculty in FACULTIES.keys():
-        keyboard_buttons.append([KeyboardButton(text=faculty)])
-    
-    keyboard_buttons.append([KeyboardButton(text="🔙 Orqaga qaytish")])
-    
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=keyboard_buttons,
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
+    keyboard = keyboard_cache.admin_faculty_picker()
     
     await message.answer(
         "Tyutor qaysi fakultetda ishlaydi?",
@@ -688,7 +848,7 @@ async def add_Tyutor_faculty_selected(message: Message, state: FSMContext):
     
     faculty = message.text.strip()
     
-    if faculty not in FACULTIES:
+    if faculty not in roster.faculties:
         await message.answer(f"❌ Noto'g'ri fakultet!")
         return
     
@@ -722,12 +882,11 @@ async def add_Tyutor_chat_id(message: Message, state: FSMContext):
     faculty = data.get("faculty")
     Tyutor_name = data.get("Tyutor_name")
     
-    new_Tyutor = {"name": Tyutor_name, "chat_id": chat_id}
-    FACULTIES[faculty].append(new_Tyutor)
+    roster.add_tutor(faculty, Tyutor_name, chat_id)
     
-    save_faculties(FACULTIES)
+    save_faculties(roster.faculties, {"op": "add", "faculty": faculty, "name": Tyutor_name, "chat_id": chat_id})
     
-    print(f" ✅ Tyutor qo'shildi: {Tyutor_name} ({chat_id}) - {faculty}")
+    log.info("Tyutor qo'shildi: %s (%s) - %s", Tyutor_name, chat_id, faculty)
     
     await message.answer(
         f"✅ Tyutor qo'shildi!\n\n"
@@ -745,14 +904,7 @@ async def show_statistics(message: Message):
     """Statistika ko'rsatish"""
     stat_text = "📊 STATISTIKA\n\n"
     
-    stat_by_faculty = {}
-    for req_id, req in requests_data.items():
-        faculty = req["faculty"]
-        if faculty not in stat_by_faculty:
-            stat_by_faculty[faculty] = {"total": 0, "accepted": 0, "rejected": 0, "finished": 0, "pending": 0, "cancelled": 0}
-        
-        stat_by_faculty[faculty]["total"] += 1
-        stat_by_faculty[faculty][req["status"]] += 1
+    stat_by_faculty = store.faculty_stats()
     
     if not stat_by_faculty:
         stat_text += "Murojat yo'q"
@@ -760,19 +912,50 @@ async def show_statistics(message: Message):
         for faculty, stats in stat_by_faculty.items():
             stat_text += (
                 f"📚 {faculty}\n"
-                f"  Jami: {stats['total']} | ⏳ Kutilmoqda: {stats['pending']} | "
-                f"✅ Qabul: {stats['accepted']} | ❌ Rad: {stats['rejected']} | "
-                f"✔️ Tugallagan: {stats['finished']}\n\n"
+                f"  Jami: {stats['total']} | ⏳ Kutilmoqda: {stats.get('pending', 0)} | "
+                f"✅ Qabul: {stats.get('accepted', 0)} | ❌ Rad: {stats.get('rejected', 0)} | "
+                f"⛔ Bekor: {stats.get('cancelled', 0)} | ✔️ Tugallagan: {stats.get('finished', 0)}\n\n"
             )
     
     await message.answer(stat_text)
 
+@dp.message(F.text == "📦 Arxiv eksport")
+async def export_archive(message: Message):
+    """Arxivdagi murojaatlarni JSONL fayllar qilib yuborish (hajmi cheklangan qismlarda)"""
+    if message.from_user.id != ADMIN_ID:
+        return
+    
+    # Xotirada emas, vaqtinchalik fayllarda - katta arxiv ham RAM ni to'ldirmaydi
+    directory = tempfile.mkdtemp(prefix="tyutor_arxiv_")
+    try:
+        result = await store.export_archive(
+            directory, prefix=f"arxiv_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            part_size=int(ARCHIVE_EXPORT_PART_MB * 1024 * 1024), max_parts=ARCHIVE_EXPORT_MAX_PARTS
+        )
+        parts = result["parts"]
+        if not parts:
+            await message.answer("📭 Arxiv bo'sh.")
+            return
+        
+        for i, (path, count) in enumerate(parts, 1):
+            await message.answer_document(
+                FSInputFile(path),
+                caption=f"📦 Arxiv ({i}/{len(parts)}): {count} ta murojaat"
+            )
+        if result["exported"] < result["total"]:
+            await message.answer(
+                f"⚠️ Arxiv juda katta: {result['total']} tadan faqat birinchi {result['exported']} ta "
+                f"murojaat yuborildi ({len(parts)} ta fayl)."
+            )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
 @dp.message(F.text == "👥 Tyutorlarni ko'rish")
 async def view_Tyutors_admin(message: Message):
     """Tyutorlarni ko'rish"""
     text = "👥 TyutorLAR RO'YXATI\n\n"
     
-    for faculty, Tyutors in FACULTIES.items():
+    for faculty, Tyutors in roster.faculties.items():
         text += f"📚 {faculty}:\n"
         for Tyutor in Tyutors:
             text += f"  • {Tyutor['name']} (ID: {Tyutor['chat_id']})\n"
@@ -783,21 +966,11 @@ async def view_Tyutors_admin(message: Message):
 @dp.message(F.text == "✏️ Tyutor tahrirlash")
 async def edit_Tyutor_start(message: Message, state: FSMContext):
     """Tyutor tahrirlash jarayonini boshlash"""
-    if not FACULTIES:
+    if not roster.faculties:
         await message.answer("❌ Hech qanday fakultet topilmadi!")
         return
     
-    keyboard_buttons = []
-    for faculty in FACULTIES.keys():
-        keyboard_buttons.append([KeyboardButton(text=faculty)])
-    
-    keyboard_buttons.append([KeyboardButton(text="🔙 Orqaga qaytish")])
-    
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=keyboard_buttons,
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
+    keyboard = keyboard_cache.admin_faculty_picker()
     
     await message.answer(
         "Tyutori qaysi fakultetda?",
@@ -815,29 +988,20 @@ async def edit_Tyutor_faculty_selected(message: Message, state: FSMContext):
     
     faculty = message.text.strip()
     
-    if faculty not in FACULTIES:
+    if faculty not in roster.faculties:
         await message.answer(f"❌ Noto'g'ri fakultet!")
         return
     
     await state.update_data(edit_faculty=faculty)
     
-    Tyutors = FACULTIES[faculty]
+    Tyutors = roster.faculties[faculty]
     if not Tyutors:
         await message.answer(f"❌ {faculty} da Tyutor yo'q!")
         await state.clear()
         await admin_menu(message, state)
         return
     
-    keyboard_buttons = []
-    for Tyutor in Tyutors:
-        keyboard_buttons.append([KeyboardButton(text=f"{Tyutor['name']} ({Tyutor['chat_id']})")])
-    
-    keyboard_buttons.append([KeyboardButton(text="🔙 Orqaga qaytish")])
-    
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=keyboard_buttons,
-        resize_keyboard=True
-    )
+    keyboard = keyboard_cache.admin_tutor_picker(faculty)
     
     await message.answer(
         "Tahrirlash uchun Tyutorini tanlang:",
@@ -851,46 +1015,40 @@ async def edit_Tyutor_selected(message: Message, state: FSMContext):
     data = await state.get_data()
     faculty = data.get("edit_faculty")
     
-    if not faculty or faculty not in FACULTIES:
+    if not faculty or faculty not in roster.faculties:
         await message.answer("❌ Fakultet topilmadi!")
         return
     
-    Tyutors = FACULTIES[faculty]
     Tyutor_name = message.text.strip()
-    
-    if " (" in Tyutor_name:
-        Tyutor_name = Tyutor_name.split(" (")[0].strip()
-    
     Tyutor_to_edit = None
-    Tyutor_index = None
     
-    # Find the Tyutor by name
-    for idx, Tyutor in enumerate(Tyutors):
-        if Tyutor['name'].strip() == Tyutor_name:
-            Tyutor_to_edit = Tyutor.copy()
-            Tyutor_index = idx
-            break
+    # Tugma matni "Ism (chat_id)" ko'rinishida - ID bo'yicha indeksdan olamiz
+    id_match = re.search(r"\((-?\d+)\)$", Tyutor_name)
+    if id_match:
+        found = roster.find(int(id_match.group(1)))
+        if found and found[1] == faculty:
+            Tyutor_to_edit = found[0]
+        Tyutor_name = Tyutor_name[:id_match.start()].strip()
+    
+    # Qo'lda yozilgan ism bo'lsa, fakultet ichidan qidiramiz
+    if not Tyutor_to_edit:
+        for Tyutor in roster.faculties[faculty]:
+            if Tyutor['name'].strip() == Tyutor_name:
+                Tyutor_to_edit = Tyutor
+                break
     
     if not Tyutor_to_edit:
         await message.answer(f"❌ '{Tyutor_name}' nomli Tyutor topilmadi!")
         return
     
+    Tyutor_to_edit = Tyutor_to_edit.copy()
     await state.update_data(
         Tyutor_to_edit=Tyutor_to_edit, 
-        Tyutor_index=Tyutor_index,
         Tyutor_name_original=Tyutor_to_edit['name'],
         Tyutor_id_original=Tyutor_to_edit['chat_id']
     )
     
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[[
-            KeyboardButton(text="👤 Ismni o'zgaritirish"),
-            KeyboardButton(text="🆔 ID sini o'zgaritirish"),
-            KeyboardButton(text="❌ Bekor qilish")
-        ]]],
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
+    keyboard = EDIT_TYUTOR_KEYBOARD
     
     await message.answer(
         f"👨‍🏫 {Tyutor_to_edit['name']} (ID: {Tyutor_to_edit['chat_id']})\n\n"
@@ -904,7 +1062,7 @@ async def edit_Tyutor_name_prompt(message: Message, state: FSMContext):
     """Ismni o'zgaritirish uchun so'rash"""
     await message.answer(
         "📝 Yangi ismni kiriting:",
-        reply_markup=ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="❌ Bekor qilish")]], resize_keyboard=True)
+        reply_markup=CANCEL_KEYBOARD
     )
     await state.set_state(AdminStates.editing_Tyutor_name)
 
@@ -921,27 +1079,26 @@ async def edit_Tyutor_name_save(message: Message, state: FSMContext):
         return
     
     data = await state.get_data()
-    faculty = data.get("edit_faculty")
-    Tyutor_index = data.get("Tyutor_index")
+    old_id = data.get("Tyutor_id_original")
     old_name = data.get("Tyutor_name_original")
     new_name = message.text.strip()
     
-    if not faculty or Tyutor_index is None:
+    if old_id is None or not roster.is_tutor(old_id):
         await message.answer("❌ Xato: Ma'lumot topilmadi!")
         await state.clear()
         return
     
     try:
-        FACULTIES[faculty][Tyutor_index]['name'] = new_name
+        roster.rename_tutor(old_id, new_name)
         
-        save_faculties(FACULTIES)
+        save_faculties(roster.faculties, {"op": "rename", "chat_id": old_id, "old": old_name, "new": new_name})
         
         await message.answer(
             f"✅ Ismni o'zgaritirish: '{old_name}' → '{new_name}'\n\n"
             f"✨ O'zgarish avtomatik saqlandi!"
         )
         
-        print(f" ✅ Ismni o'zgaritirish: '{old_name}' -> '{new_name}'")
+        log.info("Ismni o'zgaritirish: '%s' -> '%s'", old_name, new_name)
     except Exception as e:
         await message.answer(f"❌ Xato: {str(e)}")
     
@@ -952,7 +1109,7 @@ async def edit_Tyutor_id_prompt(message: Message, state: FSMContext):
     """ID sini o'zgaritirish uchun so'rash"""
     await message.answer(
         "🆔 Yangi Telegram ID ni kiriting:",
-        reply_markup=ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="❌ Bekor qilish")]], resize_keyboard=True)
+        reply_markup=CANCEL_KEYBOARD
     )
     await state.set_state(AdminStates.editing_Tyutor_chat_id)
 
@@ -965,27 +1122,25 @@ async def edit_Tyutor_id_save(message: Message, state: FSMContext):
         return
     
     data = await state.get_data()
-    faculty = data.get("edit_faculty")
-    Tyutor_index = data.get("Tyutor_index")
     old_id = data.get("Tyutor_id_original")
     
-    if not faculty or Tyutor_index is None:
+    if old_id is None or not roster.is_tutor(old_id):
         await message.answer("❌ Xato: Ma'lumot topilmadi!")
         await state.clear()
         return
     
     try:
         new_id = int(message.text.strip())
-        FACULTIES[faculty][Tyutor_index]['chat_id'] = new_id
+        roster.change_tutor_id(old_id, new_id)
         
-        save_faculties(FACULTIES)
+        save_faculties(roster.faculties, {"op": "change_id", "old": old_id, "new": new_id})
         
         await message.answer(
             f"✅ ID o'zgaritildi: {old_id} → {new_id}\n\n"
             f"✨ O'zgarish avtomatik saqlandi!"
         )
         
-        print(f" ✅ ID o'zgaritirish: {old_id} -> {new_id}")
+        log.info("ID o'zgaritirish: %s -> %s", old_id, new_id)
     except ValueError:
         await message.answer("❌ Xato: ID raqam bo'lishi kerak!")
     except Exception as e:
@@ -1004,12 +1159,54 @@ async def cancel_operation(message: Message, state: FSMContext):
 
 async def health_check(request):
     """Health check endpoint for Render"""
-    return web.Response(text="OK")
+    return web.json_response(status=503 if shutting_down else 200, data={
+        "status": "STOPPING" if shutting_down else "OK",
+        "mode": UPDATE_MODE,
+        **update_queue.stats(),
+        "outbox": outbox.stats(),
+        "fsm": storage.stats(),
+        "dedup": dedup.stats(),
+        "throttle": throttle.stats(),
+        "api_pool": api_session.stats(),
+        "archive": archive_manager.stats(),
+        "snapshot": snapshots.stats(),
+        **({"polling": poller.stats()} if not WEBHOOK_URL else {}),
+        **({"worker": CLUSTER_WORKER_INDEX, "synced": store.synced} if store.shared else {})
+    })
+
+async def metrics_handler(request):
+    """Prometheus uchun metrikalar"""
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
 
 async def webhook_handler(request):
     """Handle incoming webhook updates"""
-    update = await request.json()
-    await dp.feed_update(bot, types.Update(**update))
+    # To'xtatilmoqda - Telegram update'ni keyinroq (yangi jarayonga) qayta yuboradi
+    if shutting_down:
+        return web.Response(status=503, text="Stopping")
+    raw = await request.json()
+    if recorder:
+        recorder.record(raw)
+    update = types.Update(**raw)
+    
+    # Telegram qayta yuborgan update - qabul qilamiz, lekin qayta ishlamaymiz
+    if dedup.is_duplicate(update.update_id):
+        return web.Response(text="OK")
+    dedup.remember(update.update_id)
+    
+    if UPDATE_MODE == "inline":
+        try:
+            await process_update(update)
+        except Exception:
+            dedup.forget(update.update_id)
+            raise
+        return web.Response(text="OK")
+    
+    # Navbat to'la bo'lsa Telegram update'ni keyinroq qayta yuboradi
+    if not update_queue.put_nowait(update):
+        dedup.forget(update.update_id)
+        log.warning("Update navbati to'la, update %s qaytarildi", update.update_id)
+        return web.Response(status=503, text="Busy")
+    
     return web.Response(text="OK")
 
 async def setup_webhook():
@@ -1017,54 +1214,204 @@ async def setup_webhook():
     if WEBHOOK_URL:
         webhook_path = f"{WEBHOOK_URL}/{BOT_TOKEN}"
         await bot.set_webhook(webhook_path)
-        print(f" ✅ Webhook configured: {webhook_path}")
+        log.info("Webhook configured: %s/<token>", WEBHOOK_URL)
     else:
-        print(" ⚠️ WEBHOOK_URL not set - using polling mode")
+        log.warning("WEBHOOK_URL not set - webhook o'rnatilmadi")
 
-# ===== MAIN =====
-
-async def main():
-    print(f"\n{'='*60}")
-    print(f" 🤖 BOT ISHGA TUSHMOQDA...")
-    print(f" Admin ID: {ADMIN_ID}")
-    print(f" Jami fakultetlar: {len(FACULTIES)}")
-    print(f" Port: {PORT}")
-    print(f"{'='*60}\n")
-    
-    if not WEBHOOK_URL:
-        print(" ❌ ERROR: WEBHOOK_URL environment variable is required!")
-        print(" ❌ Please set WEBHOOK_URL in Render dashboard")
-        print(" ❌ Example: https://your-app-name.onrender.com")
+async def poll_handler(update: types.Update):
+    """getUpdates orqali kelgan update - webhook bilan bir xil navbat va tartib"""
+    if recorder:
+        recorder.record(update.model_dump(mode="json", exclude_none=True))
+    if dedup.is_duplicate(update.update_id):
         return
+    dedup.remember(update.update_id)
     
-    # Webhook mode for production
-    await setup_webhook()
+    if UPDATE_MODE == "inline":
+        try:
+            await process_update(update)
+        except Exception as e:
+            log.exception("update %s qayta ishlanmadi: %s", update.update_id, e)
+        return
     
+    # Navbat to'la bo'lsa joy bo'shashini kutamiz - keyingi getUpdates shungacha chaqirilmaydi
+    await update_queue.put(update)
+
+poller = Poller(bot, poll_handler, timeout=POLL_TIMEOUT, limit=POLL_LIMIT)
+# To'xtatish boshlangach yangi update qabul qilinmaydi (503)
+shutting_down = False
+
+async def drain_updates(timeout):
+    """Navbatdagi update'lar qayta ishlanishini kutish. Hammasi ulgursa True"""
+    try:
+        await asyncio.wait_for(update_queue.join(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        log.warning("%d update %ss ichida qayta ishlanmadi", update_queue.depth(), timeout)
+        return False
+
+# ===== MAIN =====
+
+def create_app():
+    """HTTP ilova: health, metrics va webhook yo'llari"""
     app = web.Application()
     app.router.add_get('/', health_check)
     app.router.add_get('/health', health_check)
+    app.router.add_get('/metrics', metrics_handler)
     app.router.add_post(f'/{BOT_TOKEN}', webhook_handler)
+    return app
+
+async def start_services():
+    """Fon vazifalarini ishga tushirish (ombor, navbatlar, kuzatuvchilar)"""
+    global saved_state
+    dedup.load()
+    await store.start()
+    await storage.start()
+    if saved_state:
+        outbox.restore(saved_state.get("outbox", ()))
+        saved_state = None
+    if journal:
+        # Qayta qo'llangan dum va tiklangan xabarlar snapshotda qolmasin
+        await snapshots.run_once()
+        snapshots.start()
+    outbox.start()
+    config_watcher.start()
+    archive_manager.start()
+    if recorder:
+        recorder.start()
+    if UPDATE_MODE != "inline":
+        update_queue.start()
+
+async def shutdown(timeout):
+    """Yangi update qabul qilishni to'xtatib, navbatlarni timeout ichida bo'shatish"""
+    global shutting_down
+    shutting_down = True
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    if not WEBHOOK_URL:
+        await poller.stop()
+    drained = await drain_updates(timeout)
+    # Hammasi qayta ishlangan bo'lsagina tasdiqlaymiz, aks holda Telegram qayta yuboradi
+    if drained and not WEBHOOK_URL:
+        await poller.confirm()
+    unsent = await outbox.join(timeout=max(0.0, deadline - loop.time()))
+    log.info("Navbatlar bo'shatildi: update'lar %s, yuborilmagan xabarlar %d",
+             "hammasi" if drained else f"{update_queue.depth()} qoldi", unsent)
+
+async def stop_services():
+    """Navbatlarni bo'shatib, hammasini to'xtatish va saqlash"""
+    await update_queue.stop()
+    # Outbox shutdown() da DRAIN_TIMEOUT ichida bo'shatilgan - qolgani snapshotga
+    await outbox.stop()
+    unsent = outbox.pending()
+    await archive_manager.stop()
+    await snapshots.stop()
+    if recorder:
+        await recorder.close()
+    await store.close()
+    # Baza yopilgandan keyin: keyingi ishga tushish bazani qayta o'qimaydi
+    if SNAPSHOT_FILE and not store.shared:
+        try:
+            await snapshots.run_once(outbox=unsent)
+        except Exception as e:
+            log.error("Snapshot yozilmadi: %s", e)
+    if journal:
+        journal.close()
+    await storage.close()
+    await config_watcher.stop()
+    dedup.save()
+    await config_writer.close()
+    await bot.session.close()
+
+# ===== KLASTER WORKERI =====
+
+async def worker_updates_handler(request):
+    """cluster.py dan kelgan update'lar to'plami (chat tartibida). Har biri uchun qabul qilindimi"""
+    accepted = []
+    for raw in await request.json():
+        if shutting_down:
+            accepted.append(False)
+            continue
+        update = types.Update(**raw)
+        if UPDATE_MODE == "inline":
+            await process_update(update)
+            accepted.append(True)
+        else:
+            accepted.append(update_queue.put_nowait(update))
+    return web.json_response(accepted)
+
+def create_worker_app():
+    """Klaster workeri ilovasi: update'lar front jarayondan keladi"""
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/metrics', metrics_handler)
+    app.router.add_post('/updates', worker_updates_handler)
+    return app
+
+async def run_worker(socket_path):
+    """cluster.py ishga tushirgan worker jarayoni: unix socket orqali update qabul qiladi"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    if CLUSTER_WORKER_INDEX == 0:
+        await setup_webhook()
+    await start_services()
+    runner = web.AppRunner(create_worker_app(), access_log=None)
+    await runner.setup()
+    await web.UnixSite(runner, socket_path).start()
+    log.info("Worker %d/%d tayyor: %s", CLUSTER_WORKER_INDEX + 1, CLUSTER_WORKERS, socket_path)
+
+    try:
+        await stop.wait()
+    finally:
+        await shutdown(DRAIN_TIMEOUT)
+        await runner.cleanup()
+        await stop_services()
+
+async def main():
+    log.info("BOT ISHGA TUSHMOQDA... Admin ID: %s, fakultetlar: %d, port: %d", ADMIN_ID, len(roster.faculties), PORT)
+    
+    await start_services()
+    if WEBHOOK_URL:
+        # Webhook mode for production
+        await setup_webhook()
+    else:
+        # Lokal / o'zimizning serverda: webhook'siz, getUpdates orqali
+        log.info("WEBHOOK_URL berilmagan - polling rejimi")
+        await bot.delete_webhook()
+        poller.start()
+    app = create_app()
     
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', PORT)
     
-    print(f" ✅ HTTP server started on 0.0.0.0:{PORT}")
-    print(f" ✅ Webhook URL: {WEBHOOK_URL}/{BOT_TOKEN}")
+    log.info("HTTP server started on 0.0.0.0:%d", PORT)
     
     await site.start()
     
     # Keep the server running
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C KeyboardInterrupt sifatida keladi
     try:
-        await asyncio.Event().wait()
+        await stop.wait()
     except KeyboardInterrupt:
-        print(" Bot to'xtatildi (Ctrl+C)")
+        log.info("Bot to'xtatildi (Ctrl+C)")
     finally:
+        log.info("Bot to'xtatilmoqda...")
+        # HTTP server ochiq qoladi va 503 qaytaradi, navbatlar esa bo'shatiladi
+        await shutdown(DRAIN_TIMEOUT)
         await runner.cleanup()
-        await bot.session.close()
+        await stop_services()
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("\n Bot xususiy to'xtatildi.")
+        log.info("Bot xususiy to'xtatildi.")
@@ -0,0 +1,240 @@
+"""Klaster rejimi benchmarki (cluster.py): 1, 2, 4 ... worker jarayon.
+
+Soxta Bot API ni ko'taradi, front jarayonni shu jarayonda ishga tushiradi
+(workerlar alohida jarayonlar) va minglab talabalar murojaat yuborish
+ssenariysini webhook orqali o'tkazadi. Har bir talabaning update'lari
+javobni kutmasdan ketma-ket yuboriladi - natijada bazadagi murojaatlar
+tekshiriladi: chat ichidagi tartib buzilsa, ism/telefon/matn almashib
+qoladi. O'tkazuvchanlik oxirgi Bot API chaqiruvigacha o'lchanadi.
+
+Keyin tyutorlar murojaatlarni qabul qiladi, javob beradi va bir qismini
+yakunlaydi yoki rad etadi, talabalar esa shu paytda javob yozadi - talaba
+va tyutor odatda har xil workerda, shuning uchun bitta murojaat ikki
+jarayonda bir vaqtda o'zgaradi. Oxirida har bir murojaatning statusi va
+xabarlar soni kutilgani bilan solishtiriladi ("holat xato").
+
+Ishga tushirish (loyiha ildizidan, Linux):
+
+    python bench/bench_cluster.py [--workers 1,2,4] [--students 2000] [--concurrency 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_api import MockTelegramAPI
+from load_test import LoadTest, STUDENT_BASE, TUTOR_BASE
+
+TOKEN = "123456:CLUSTER"
+
+
+def prepare(args, api_url):
+    """Vaqtinchalik papka, config.json va workerlar uchun muhit o'zgaruvchilari"""
+    workdir = tempfile.mkdtemp(prefix="tyutor_cluster_")
+    faculties = {}
+    for i in range(args.tutors):
+        faculties.setdefault(f"Fakultet {i % 4 + 1}", []).append({"name": f"Tyutor {i}", "chat_id": TUTOR_BASE + i})
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(faculties, f, ensure_ascii=False)
+    os.chdir(workdir)
+    os.environ.update(
+        BOT_TOKEN=TOKEN,
+        ADMIN_ID="1",
+        WEBHOOK_URL="",
+        TELEGRAM_API_URL=api_url,
+        CONFIG_POLL_INTERVAL="0",
+        ARCHIVE_INTERVAL="0",
+        # Faqat CPU o'lchanadi - Telegram tezlik chegaralari o'chiriladi
+        OUTBOX_GLOBAL_RATE="100000",
+        OUTBOX_CHAT_RATE="1000",
+        THROTTLE_MESSAGE_RATE="0",
+        THROTTLE_CALLBACK_RATE="0",
+        THROTTLE_CHAT_RATE="0",
+        THROTTLE_COALESCE="0",
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+    )
+    return workdir, faculties
+
+
+def check(workdir, students):
+    """Har bir talabaning murojaati to'g'ri maydonlar bilan yaratilganini tekshirish"""
+    conn = sqlite3.connect(os.path.join(workdir, "tyutor.db"))
+    rows = {student_id: json.loads(data) for student_id, data in conn.execute("SELECT student_id, data FROM requests")}
+    ids = [row[0] for row in conn.execute("SELECT id FROM requests")]
+    conn.close()
+    wrong = 0
+    for student_id, _, _ in students:
+        data = rows.get(student_id)
+        if not data or data.get("student_name") != f"Talaba {student_id}" \
+                or data.get("student_phone") != "+998901234567" or data.get("text") != "Stipendiya bo'yicha savolim bor":
+            wrong += 1
+    return len(rows), wrong, len(ids) - len(set(ids))
+
+
+def expected_state(i):
+    """i-murojaat uchun tyutor ssenariysi va kutilgan (status, xabarlar soni)"""
+    if i % 3 == 0:
+        return "reject", ("rejected", 0)
+    if i % 3 == 1:
+        return "finish", ("finished", 2)
+    return "answer", ("accepted", 2)
+
+
+def request_ids(workdir):
+    conn = sqlite3.connect(os.path.join(workdir, "tyutor.db"))
+    rows = dict(conn.execute("SELECT student_id, id FROM requests"))
+    conn.close()
+    return rows
+
+
+def check_states(workdir, students, ids):
+    """Tyutor va talaba javoblaridan keyingi status va xabarlar soni"""
+    conn = sqlite3.connect(os.path.join(workdir, "tyutor.db"))
+    rows = {request_id: json.loads(data) for request_id, data in conn.execute("SELECT id, data FROM requests")}
+    conn.close()
+    wrong = 0
+    for i, (student_id, _, _) in enumerate(students):
+        data = rows.get(ids.get(student_id))
+        _, (status, messages) = expected_state(i)
+        if not data or data.get("status") != status or data.get("message_count") != messages:
+            wrong += 1
+    return wrong
+
+
+async def run_case(workers, args):
+    from aiohttp.test_utils import TestClient, TestServer
+    from callbacks import pack, FACULTY, TYUTOR, ACCEPT, RESPOND, FINISH, REJECT, REASON, STUDENT_REPLY
+    from roster import faculty_key
+
+    api = MockTelegramAPI(latency=args.latency, seed=1)
+    api_url = await api.start()
+    workdir, faculties = prepare(args, api_url)
+    tutors = [(faculty, tutor["chat_id"]) for faculty, items in faculties.items() for tutor in items]
+    students = [(STUDENT_BASE + i, *tutors[i % len(tutors)]) for i in range(args.students)]
+
+    import cluster
+    cluster.BOT_TOKEN = TOKEN
+    front = cluster.Front(workers, workdir, batch=args.batch)
+    await front.start()
+    client = TestClient(TestServer(front.create_app()))
+    await client.start_server()
+
+    builder = LoadTest(args)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    update_ids = iter(range(1, 10**9))
+    busy = 0
+
+    async def post(payload):
+        nonlocal busy
+        payload = {"update_id": next(update_ids), **payload}
+        while True:
+            async with client.post(f"/{TOKEN}", json=payload) as response:
+                if response.status != 503:
+                    return
+            busy += 1
+            await asyncio.sleep(0.05)
+
+    async def student_flow(student_id, faculty, tutor_id):
+        async with semaphore:
+            for payload in (
+                builder.message(student_id, "/start"),
+                builder.callback(student_id, pack(FACULTY, faculty_key(faculty))),
+                builder.callback(student_id, pack(TYUTOR, tutor_id)),
+                builder.message(student_id, f"Talaba {student_id}"),
+                builder.message(student_id, "+998901234567"),
+                builder.message(student_id, "Stipendiya bo'yicha savolim bor"),
+            ):
+                await post(payload)
+
+    async def tutor_flow(tutor_id, items):
+        # Tyutorning FSM holati bitta - murojaatlar ketma-ket
+        for request_id, action in items:
+            if action == "reject":
+                await post(builder.callback(tutor_id, pack(REJECT, request_id)))
+                await post(builder.callback(tutor_id, pack(REASON, request_id, 0)))
+                continue
+            await post(builder.callback(tutor_id, pack(ACCEPT, request_id)))
+            await post(builder.callback(tutor_id, pack(RESPOND, request_id)))
+            await post(builder.message(tutor_id, "Dekanatga murojaat qiling"))
+            if action == "finish":
+                await post(builder.callback(tutor_id, pack(FINISH, request_id)))
+
+    async def reply_flow(student_id, request_id):
+        async with semaphore:
+            await post(builder.callback(student_id, pack(STUDENT_REPLY, request_id)))
+            await post(builder.message(student_id, "Rahmat!"))
+
+    async def settle():
+        # Bot API chaqiruvlari to'xtaguncha kutamiz
+        total = -1
+        while total != api.stats()["total"]:
+            total = api.stats()["total"]
+            await asyncio.sleep(1.0)
+
+    started = time.monotonic()
+    await asyncio.gather(*(student_flow(*student) for student in students))
+    accepted = time.monotonic() - started
+    await settle()
+    elapsed = api.last_call_at - started
+
+    # Tyutor va talaba bir murojaatni har xil workerlarda bir vaqtda o'zgartiradi
+    ids = request_ids(workdir)
+    by_tutor = {}
+    replies = []
+    for i, (student_id, _, tutor_id) in enumerate(students):
+        if student_id not in ids:
+            continue
+        action, _ = expected_state(i)
+        by_tutor.setdefault(tutor_id, []).append((ids[student_id], action))
+        if action != "reject":
+            replies.append(reply_flow(student_id, ids[student_id]))
+    tutor_started = time.monotonic()
+    await asyncio.gather(*(tutor_flow(t, items) for t, items in by_tutor.items()), *replies)
+    await settle()
+    tutor_elapsed = api.last_call_at - tutor_started
+
+    await client.close()
+    await front.stop()
+    await api.stop()
+    created, wrong, duplicate_ids = check(workdir, students)
+    wrong_states = check_states(workdir, students, ids)
+    updates = len(students) * 6
+    print(f"{workers:>8}{updates:>9}{updates / elapsed:>10.0f}{accepted:>12.1f}{elapsed:>10.1f}"
+          f"{created:>12}{wrong:>10}{duplicate_ids:>10}{busy:>8}{tutor_elapsed:>12.1f}{wrong_states:>12}")
+    os.chdir(ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def run(args):
+    print(f"Talabalar: {args.students}, tyutorlar: {args.tutors}, parallel: {args.concurrency}, "
+          f"API kechikishi: {args.latency * 1000:.0f}ms, yadrolar: {os.cpu_count()}\n")
+    print(f"{'worker':>8}{'update':>9}{'upd/s':>10}{'qabul, s':>12}{'jami, s':>10}"
+          f"{'murojaat':>12}{'noto`g`ri':>10}{'takror ID':>10}{'503':>8}{'tyutor, s':>12}{'holat xato':>12}")
+    for workers in args.workers:
+        await run_case(workers, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Klaster rejimi benchmarki")
+    parser.add_argument("--workers", default="1,2,4", help="vergul bilan: worker jarayonlar soni")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--tutors", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01, help="soxta API kechikishi, sekund")
+    parser.add_argument("--batch", type=int, default=100, help="front -> worker bitta so'rovdagi update'lar")
+    args = parser.parse_args()
+    args.workers = [int(n) for n in args.workers.split(",")]
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Klaviatura keshi micro-benchmarki.
+
+Har bir update'da klaviaturani qaytadan qurish va keshdan olishni
+solishtiradi. Ishga tushirish (loyiha ildizidan):
+
+    python bench/bench_keyboards.py [config.json] [takrorlar]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyboards import KeyboardCache
+from roster import Roster
+
+
+def measure(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    config_path = sys.argv[1] if len(sys.argv) > 1 else "config.json"
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        roster = Roster(json.load(f))
+    faculty = next(iter(roster.faculties), None)
+
+    cache = KeyboardCache(roster)
+    cases = [
+        ("faculty_picker", cache.faculty_picker, cache._build_faculty_picker),
+        ("tutor_picker", lambda: cache.tutor_picker(faculty), lambda: cache._build_tutor_picker(faculty)),
+        ("admin_faculty_picker", cache.admin_faculty_picker, cache._build_admin_faculty_picker),
+        ("admin_tutor_picker", lambda: cache.admin_tutor_picker(faculty), lambda: cache._build_admin_tutor_picker(faculty)),
+    ]
+
+    print(f"Fakultetlar: {len(roster.faculties)}, Tyutorlar: {roster.total_tutors()}, takrorlar: {repeat}\n")
+    print(f"{'klaviatura':<24}{'qurish, us':>12}{'kesh, us':>12}{'tejash':>10}")
+    for name, cached, build in cases:
+        build_us = measure(build, repeat)
+        cached_us = measure(cached, repeat)
+        print(f"{name:<24}{build_us:>12.2f}{cached_us:>12.3f}{build_us / cached_us:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
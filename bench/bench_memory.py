@@ -0,0 +1,102 @@
+"""Murojaat yozuvlari xotira benchmarki.
+
+Eski ko'rinish (lug'at + ichidagi xabarlar ro'yxati) va yangi slotted
+dataclass'lar (models.py) uchun bitta murojaatga ketadigan baytlarni
+tracemalloc bilan o'lchaydi. Ishga tushirish (loyiha ildizidan):
+
+    python bench/bench_memory.py [murojaatlar] [xabarlar]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Request, Message, Status
+
+FACULTIES = ["Iqtisodiyot fakulteti", "Servis fakulteti", "Bank-moliya xizmatlari fakulteti",
+             "Kechki ta'lim fakulteti", "Qo'shma ta'lim"]
+NAMES = [f"Talaba {i}" for i in range(200)]
+TAIL_SIZE = 5
+
+
+def fresh(value):
+    # JSON yoki Telegram'dan kelgan satrlar har safar yangi obyekt bo'ladi
+    return "".join(list(value))
+
+
+def build_old(count, messages):
+    requests = {}
+    for i in range(count):
+        request_id = f"req_{900000000 + i}_{1700000000000 + i}"
+        created = datetime.now().isoformat()
+        requests[request_id] = {
+            "student_id": 900000000 + i,
+            "student_name": fresh(NAMES[i % len(NAMES)]),
+            "student_phone": f"+99890{i:07d}",
+            "Tyutor_id": 1077804817 + i % 11,
+            "faculty": fresh(FACULTIES[i % len(FACULTIES)]),
+            "text": f"Murojaat matni {i}",
+            "status": "pending",
+            "messages": [
+                {"sender": fresh("Tyutor"), "text": f"xabar {j}",
+                 "time": datetime.now().isoformat(), "request_id": request_id}
+                for j in range(messages)
+            ],
+            "created_at": created,
+        }
+    return requests
+
+
+def build_new(count, messages):
+    requests = {}
+    tails = {}
+    now = int(time.time())
+    for i in range(count):
+        requests[i + 1] = Request(
+            id=i + 1,
+            student_id=900000000 + i,
+            student_name=fresh(NAMES[i % len(NAMES)]),
+            student_phone=f"+99890{i:07d}",
+            Tyutor_id=1077804817 + i % 11,
+            faculty=fresh(FACULTIES[i % len(FACULTIES)]),
+            text=f"Murojaat matni {i}",
+            status=Status.PENDING,
+            created_at=now,
+            message_count=messages,
+        )
+        if messages:
+            # Xotirada faqat oxirgi TAIL_SIZE ta xabar, qolgani SQLite'da
+            tails[i + 1] = deque(
+                (Message(fresh("Tyutor"), f"xabar {j}", now) for j in range(messages)), maxlen=TAIL_SIZE
+            )
+    return requests, tails
+
+
+def measure(build, *args):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    data = build(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del data
+    return after - before
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    print(f"Murojaatlar: {count}, har birida xabarlar: {messages} (xotirada yangi usulda: {TAIL_SIZE})\n")
+    print(f"{'holat':<20}{'eski, B':>12}{'yangi, B':>12}{'tejash':>10}")
+    for label, msgs in (("xabarsiz", 0), (f"{messages} ta xabar", messages)):
+        old = measure(build_old, count, msgs) / count
+        new = measure(build_new, count, msgs) / count
+        print(f"{label:<20}{old:>12.0f}{new:>12.0f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Bot API ulanishlar hovuzi benchmarki (http_session.BotAPISession).
+
+Soxta Bot API (bench/mock_api.py) ga sendMessage so'rovlarini yuborib,
+har 1000 xabarga nechta TCP ulanish ochilganini (server tomonidan
+sanaladi), o'tkazuvchanlik va kechikishni bir nechta sozlamada
+solishtiradi: keep-alive'siz, aiogram'ning standart sessiyasi va
+BotAPISession. --bots bilan bir hovuzdan bir nechta token ishlatiladi.
+
+Ishga tushirish (loyiha ildizidan):
+
+    python bench/bench_pool.py [--messages 5000] [--concurrency 50] [--latency 0.02]
+                               [--limit 100] [--bots 1]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from mock_api import MockTelegramAPI
+from load_test import percentile
+from http_session import BotAPISession
+
+
+async def run_case(name, make_session, args):
+    api = MockTelegramAPI(latency=args.latency, jitter=args.jitter, seed=1)
+    url = await api.start()
+    session = make_session(TelegramAPIServer.from_base(url))
+    bots = [Bot(token=f"{100000 + i}:POOLTEST", session=session) for i in range(args.bots)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def send(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await bots[i % len(bots)].send_message(chat_id=1000 + i % 500, text=f"xabar {i}")
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(args.messages)))
+    elapsed = time.perf_counter() - started
+    await session.close()
+    await api.stop()
+
+    connections = len(api.connections)
+    print(f"{name:<22}{args.messages / elapsed:>10.0f}{percentile(latencies, 0.5) * 1000:>10.1f}"
+          f"{percentile(latencies, 0.99) * 1000:>10.1f}{connections:>12}"
+          f"{connections * 1000 / args.messages:>12.1f}")
+    if isinstance(session, BotAPISession):
+        print(f"{'':<22}{session.stats()}")
+
+
+async def run(args):
+    print(f"Xabarlar: {args.messages}, parallel: {args.concurrency}, tokenlar: {args.bots}, "
+          f"API kechikishi: {args.latency * 1000:.0f}ms\n")
+    print(f"{'sessiya':<22}{'msg/s':>10}{'p50, ms':>10}{'p99, ms':>10}{'ulanishlar':>12}{'1000 ga':>12}")
+    cases = [
+        ("keep-alive yo'q", lambda api: BotAPISession(api=api, limit=args.limit, keepalive=0)),
+        ("aiogram standart", lambda api: AiohttpSession(api=api)),
+        ("BotAPISession", lambda api: BotAPISession(api=api, limit=args.limit, keepalive=args.keepalive)),
+    ]
+    for name, make_session in cases:
+        await run_case(name, make_session, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot API ulanishlar hovuzi benchmarki")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="soxta API kechikishi, sekund")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--limit", type=int, default=100, help="hovuzdagi ulanishlar chegarasi")
+    parser.add_argument("--keepalive", type=float, default=30)
+    parser.add_argument("--bots", type=int, default=1, help="bitta hovuzni ishlatadigan tokenlar soni")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
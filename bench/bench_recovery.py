@@ -0,0 +1,190 @@
+"""Qulashdan keyin tiklanish benchmarki: snapshot + jurnal dumi (journal.py).
+
+Vaqtinchalik bazada --requests ta murojaatning to'liq hayoti o'ynaladi
+(talaba, yaratish, xabarlar, qabul / rad etish / yakun / bekor qilish,
+arxivlash) - ombor jurnal bilan ishlaydi, SnapshotManager esa har
+--snapshot-every hodisada snapshot oladi. Oxirida jarayon "qulaydi":
+ombor yopilmaydi, oxirgi o'zgarishlar bazaga yozilmagan bo'ladi.
+
+Keyin fayllar nusxasidan tiklanadi va vaqt o'lchanadi: jurnalsiz faqat
+bazadan (oxirgi o'zgarishlar yo'qoladi), bazadan + jurnalning qolgan
+qismidan (snapshot olinmagan bo'lsa - aks holda jurnal qisqartirilgan)
+va oxirgi snapshotdan + undan keyingi dumdan. Har birida holat qulashdan
+oldingisi bilan solishtiriladi, bazadagi xabarlar yo'qolmagani va
+takrorlanmagani ham tekshiriladi. Ishga tushirish (loyiha ildizidan):
+
+    python bench/bench_recovery.py [--requests 100000] [--messages 3] [--snapshot-every 50000]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import EventJournal, SnapshotManager
+from models import Request, Message, Status
+from snapshot import load_snapshot
+from storage import RequestStore
+
+FACULTIES = ["Iqtisodiyot fakulteti", "Servis fakulteti", "Bank-moliya xizmatlari fakulteti",
+             "Kechki ta'lim fakulteti", "Qo'shma ta'lim"]
+FLUSH_EVERY = 200  # RequestStore.batch_size kabi
+
+
+def digest(store):
+    """Xotiradagi holatning to'liq izi (ID, vaqtlar, talabalar, statistika bilan)"""
+    state = [
+        sorted((req.id, req.student_id, req.Tyutor_id, req.faculty, req.text, req.student_name, req.student_phone,
+                req.status.label, req.created_at, req.updated_at, req.message_count) for req in store.requests.values()),
+        sorted((user_id, s.name, s.phone) for user_id, s in store.students.items()),
+        sorted((str(status), n) for status, n in store.stats_by_status.items() if n),
+        sorted((faculty, str(status), n) for faculty, counts in store.stats_by_faculty.items()
+               for status, n in counts.items() if n),
+        sorted((tutor_id, str(status), n) for tutor_id, counts in store.stats_by_tutor.items()
+               for status, n in counts.items() if n),
+        store._last_id,
+    ]
+    return hashlib.sha256(json.dumps(state, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+async def simulate(workdir, args):
+    """Ish yuklamasi va "qulash". Qulashdan oldingi holat izi qaytadi"""
+    journal = EventJournal(os.path.join(workdir, "events.jsonl"))
+    store = RequestStore(os.path.join(workdir, "tyutor.db"), journal=journal)
+    store.open()
+    snapshots = SnapshotManager(store, os.path.join(workdir, "tyutor.snapshot"), journal,
+                                interval=0, max_events=args.snapshot_every)
+    operations = 0
+    messages = 0
+
+    async def step():
+        nonlocal operations
+        operations += 1
+        if operations % FLUSH_EVERY == 0:
+            await store.flush()
+        if args.snapshot_every and snapshots.due():
+            await snapshots.run_once()
+
+    started = time.perf_counter()
+    for i in range(args.requests):
+        student_id = 900000000 + i
+        store.update_student(student_id, name=f"Talaba {i}", phone=f"+99890{i:07d}")
+        request = store.add_request(Request(
+            id=store.new_request_id(), student_id=student_id, Tyutor_id=1077804817 + i % 11,
+            faculty=FACULTIES[i % len(FACULTIES)], text=f"Murojaat matni {i}",
+            student_name=f"Talaba {i}", student_phone=f"+99890{i:07d}",
+        ))
+        await step()
+        kind = i % 4
+        if kind == 0:
+            store.set_status(request.id, Status.REJECTED, reason="Boshqa sabablar")
+            await step()
+            continue
+        if kind == 1 and i % 8 == 1:
+            store.set_status(request.id, Status.CANCELLED)
+            await step()
+            continue
+        store.set_status(request.id, Status.ACCEPTED)
+        await step()
+        for j in range(args.messages):
+            store.add_message(request.id, Message("Tyutor" if j % 2 == 0 else "student", f"xabar {j}"))
+            messages += 1
+            await step()
+        if kind == 2:
+            store.set_status(request.id, Status.FINISHED)
+            await step()
+        if i % 10000 == 9999:
+            # Yopilganlarning bir qismi arxivga ketadi
+            await store.archive_closed(max_age=-1, limit=500)
+            await step()
+    # Oxirgi lahzadagi xabarlar: guruh to'lmagan, bazaga yetib bormaydi
+    for request_id in list(store.requests)[-(FLUSH_EVERY // 2):]:
+        store.add_message(request_id, Message("Tyutor", "oxirgi xabar"))
+        messages += 1
+    elapsed = time.perf_counter() - started
+    expected = digest(store)
+    stats = journal.stats()
+    unflushed = store.pending()
+    # Qulash: close() yo'q - oxirgi guruh bazaga yozilmagan, jurnal fayli ochiq qoladi
+    store._executor.shutdown(wait=True)
+    print(f"Murojaatlar: {args.requests}, hodisalar: {stats['seq']} ({elapsed:.1f} s, "
+          f"{stats['seq'] / elapsed:.0f} hodisa/s), snapshotlar: {snapshots.snapshots}, "
+          f"yozilmagan: {unflushed}, snapshotdan keyingi dum: {stats['since_snapshot']}")
+    return expected, messages
+
+
+def copy_files(src, name):
+    dst = f"{src}-{name}"
+    shutil.copytree(src, dst)
+    return dst
+
+
+def recover(workdir, use_journal, use_snapshot):
+    journal = EventJournal(os.path.join(workdir, "events.jsonl")) if use_journal else None
+    store = RequestStore(os.path.join(workdir, "tyutor.db"), journal=journal)
+    start = time.perf_counter()
+    state = load_snapshot(os.path.join(workdir, "tyutor.snapshot"), remove=False) if use_snapshot else None
+    store.open(snapshot=state and state["store"])
+    elapsed = time.perf_counter() - start
+    return store, elapsed
+
+
+async def finish(store):
+    await store.close()
+    if store.journal:
+        store.journal.close()
+
+
+def db_messages(workdir):
+    conn = sqlite3.connect(os.path.join(workdir, "tyutor.db"))
+    rows, distinct = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT request_id || '/' || sender || '/' || text) FROM messages"
+    ).fetchone()
+    conn.close()
+    return rows, distinct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qulashdan tiklanish: baza + jurnal va snapshot + dum")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=3, help="qabul qilingan murojaatdagi xabarlar")
+    parser.add_argument("--snapshot-every", type=int, default=50000,
+                        help="shuncha hodisada snapshot, JOURNAL_SNAPSHOT_EVENTS kabi (0 - yo'q)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="tyutor_recovery_")
+    base = os.path.join(workdir, "crash")
+    os.mkdir(base)
+    try:
+        expected, messages = asyncio.run(simulate(base, args))
+        print(f"\n{'usul':<20}{'vaqt, ms':>10}{'dum':>10}{'murojaat':>10}{'holat':>8}{'xabarlar DB':>14}")
+        cases = [("faqat baza", False, False)]
+        if os.path.exists(os.path.join(base, "tyutor.snapshot")):
+            cases.append(("snapshot + dum", True, True))
+        else:
+            cases.append(("baza + jurnal", True, False))
+        for name, use_journal, use_snapshot in cases:
+            copy = copy_files(base, name.replace(" ", ""))
+            store, elapsed = recover(copy, use_journal, use_snapshot)
+            same = digest(store) == expected
+            tail = store.replayed
+            count = len(store.requests)
+            asyncio.run(finish(store))
+            rows, distinct = db_messages(copy)
+            # Murojaat ichida xabar matnlari har xil: takror bo'lsa rows > distinct, yo'qolsa rows < messages
+            check = "ok" if rows == distinct == messages else f"{messages} kerak"
+            print(f"{name:<20}{elapsed * 1000:>10.0f}{tail:>10}{count:>10}{'ok' if same else 'FARQ':>8}"
+                  f"{rows:>8} {check}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
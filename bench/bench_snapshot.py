@@ -0,0 +1,102 @@
+"""Qayta ishga tushish benchmarki: ombor bazadan yoki snapshotdan yuklanadi.
+
+Vaqtinchalik bazaga N ta murojaat (har birida bir nechta xabar) yozadi,
+ombor yopilgach snapshot oladi (aloqa.stop_services kabi), keyin
+RequestStore.open() ni ikki usulda o'lchaydi: SQLite'dan to'liq o'qish
+va snapshotdan tiklash. Ishga tushirish (loyiha ildizidan):
+
+    python bench/bench_snapshot.py [--requests 100000] [--messages 3]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Request, Message, Status
+from snapshot import save_snapshot, load_snapshot
+from storage import RequestStore
+
+FACULTIES = ["Iqtisodiyot fakulteti", "Servis fakulteti", "Bank-moliya xizmatlari fakulteti",
+             "Kechki ta'lim fakulteti", "Qo'shma ta'lim"]
+STATUSES = [Status.PENDING, Status.ACCEPTED, Status.FINISHED, Status.REJECTED]
+
+
+async def populate(path, count, messages):
+    store = RequestStore(path)
+    store.open()
+    await store.start()
+    for i in range(count):
+        student_id = 900000000 + i
+        request = store.add_request(Request(
+            id=store.new_request_id(),
+            student_id=student_id,
+            Tyutor_id=1077804817 + i % 11,
+            faculty=FACULTIES[i % len(FACULTIES)],
+            text=f"Murojaat matni {i}",
+            student_name=f"Talaba {i}",
+            student_phone=f"+99890{i:07d}",
+            status=STATUSES[i % len(STATUSES)],
+        ))
+        store.update_student(student_id, name=f"Talaba {i}", phone=f"+99890{i:07d}")
+        for j in range(messages):
+            store.add_message(request.id, Message("Tyutor" if j % 2 else "Talaba", f"xabar {j}"))
+        if i % 1000 == 999:
+            await store.flush()
+    await store.close()
+    return store
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ombor: bazadan va snapshotdan yuklash")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=3, help="har bir murojaatdagi xabarlar")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="tyutor_snapshot_")
+    db = os.path.join(workdir, "tyutor.db")
+    snapshot_file = os.path.join(workdir, "tyutor.snapshot")
+    try:
+        store = asyncio.run(populate(db, args.requests, args.messages))
+        size, save_time = timed(lambda: save_snapshot(snapshot_file, {"store": store.snapshot()}))
+        print(f"Murojaatlar: {len(store.requests)}, talabalar: {len(store.students)}, "
+              f"baza: {os.path.getsize(db) / 1e6:.1f} MB, snapshot: {size / 1e6:.1f} MB "
+              f"({save_time * 1000:.0f} ms yozildi)\n")
+
+        def open_db():
+            fresh = RequestStore(db)
+            fresh.open()
+            return fresh
+
+        def open_snapshot():
+            state = load_snapshot(snapshot_file, remove=False)
+            fresh = RequestStore(db)
+            fresh.open(snapshot=state["store"])
+            return fresh
+
+        print(f"{'usul':<14}{'vaqt, ms':>10}{'murojaat':>10}")
+        results = {}
+        for name, load in (("bazadan", open_db), ("snapshotdan", open_snapshot)):
+            fresh, elapsed = timed(load)
+            results[name] = fresh
+            print(f"{name:<14}{elapsed * 1000:>10.0f}{len(fresh.requests):>10}")
+            fresh._conn.close()
+        same = results["bazadan"].stats_by_status == results["snapshotdan"].stats_by_status \
+            and results["bazadan"].requests.keys() == results["snapshotdan"].requests.keys()
+        print(f"\nHolat bir xil: {'ha' if same else 'YO`Q'}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
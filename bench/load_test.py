@@ -0,0 +1,282 @@
+"""Botning to'liq yuklama testi (webhook -> dispatcher -> Bot API).
+
+Soxta Bot API serverini (bench/mock_api.py) ko'taradi, botni unga
+ulaydi va webhook_handler'ga sintetik update'lar yuboradi: minglab
+talabalar StudentStates bo'yicha murojaat yuboradi, tyutorlar qabul
+qilib javob beradi, talabalar javob qaytaradi. Natijada o'tkazuvchanlik,
+p50/p99 kechikish va xotira o'sishi chiqariladi.
+
+Ishga tushirish (loyiha ildizidan):
+
+    python bench/load_test.py [--students 2000] [--tutors 20] [--concurrency 200]
+                              [--latency 0.05] [--rate-429 0.0] [--mode queue]
+                              [--record updates.jsonl.gz] [--transport webhook]
+
+--transport polling bilan update'lar webhook o'rniga soxta API ning
+getUpdates navbatidan olinadi (WEBHOOK_URL siz rejim).
+
+--record bilan yuborilgan update'lar yozib olinadi (config.json esa
+yoniga <fayl>.config.json sifatida saqlanadi), so'ng ularni
+bench/replay.py bilan qayta o'ynatish mumkin.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_api import MockTelegramAPI
+
+TOKEN = "123456:LOADTEST"
+STUDENT_BASE = 20_000_000
+TUTOR_BASE = 10_000_000
+
+
+def rss_mb():
+    """Joriy RSS (Linux), bo'lmasa maksimal RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.pending = {}  # update_id -> Future (qayta ishlanganda bajariladi)
+        self.e2e = []
+        self.http = []
+        self.busy = 0
+        self.updates = 0
+
+    # ===== MUHIT =====
+
+    def prepare(self):
+        """Vaqtinchalik papka, sintetik config.json va muhit o'zgaruvchilari"""
+        self.workdir = tempfile.mkdtemp(prefix="tyutor_load_")
+        faculties = {}
+        for i in range(self.args.tutors):
+            faculty = f"Fakultet {i % self.args.faculties + 1}"
+            faculties.setdefault(faculty, []).append({"name": f"Tyutor {i}", "chat_id": TUTOR_BASE + i})
+        with open(os.path.join(self.workdir, "config.json"), "w", encoding="utf-8") as f:
+            json.dump(faculties, f, ensure_ascii=False)
+        if self.args.record:
+            os.environ["RECORD_UPDATES_FILE"] = self.args.record
+            shutil.copy(os.path.join(self.workdir, "config.json"), self.args.record + ".config.json")
+        os.chdir(self.workdir)
+        os.environ.update(
+            BOT_TOKEN=TOKEN,
+            ADMIN_ID="1",
+            WEBHOOK_URL="http://localhost" if self.args.transport == "webhook" else "",
+            TELEGRAM_API_URL=self.api_url,
+            UPDATE_MODE=self.args.mode,
+            CONFIG_POLL_INTERVAL="0",
+            ARCHIVE_INTERVAL="0",
+            LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+        )
+        # Sintetik foydalanuvchilar odamdan tezroq yozadi - flood cheklovi sukut bo'yicha o'chiq
+        for name in ("THROTTLE_MESSAGE_RATE", "THROTTLE_CALLBACK_RATE", "THROTTLE_CHAT_RATE", "THROTTLE_COALESCE"):
+            os.environ.setdefault(name, "0")
+
+    def instrument(self, aloqa):
+        """Har bir update qayta ishlanganini kuzatish uchun handlerni o'rash"""
+        original = aloqa.process_update
+
+        async def tracked(update):
+            try:
+                await original(update)
+            finally:
+                future = self.pending.pop(update.update_id, None)
+                if future and not future.done():
+                    future.set_result(None)
+
+        aloqa.process_update = tracked
+        aloqa.update_queue.handler = tracked
+
+    # ===== UPDATE'LAR =====
+
+    def _user(self, user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"U{user_id}"}
+
+    def message(self, user_id, text):
+        message = {
+            "message_id": next(self.message_ids), "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"}, "from": self._user(user_id), "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        return {"message": message}
+
+    def callback(self, user_id, data):
+        return {"callback_query": {
+            "id": str(next(self.message_ids)), "from": self._user(user_id), "chat_instance": "load",
+            "data": data,
+            "message": {"message_id": next(self.message_ids), "date": int(time.time()),
+                        "chat": {"id": user_id, "type": "private"}, "text": "x"},
+        }}
+
+    async def send(self, payload):
+        """Update'ni webhook'ga yuborib, qayta ishlanishini kutish"""
+        update_id = next(self.update_ids)
+        payload = {"update_id": update_id, **payload}
+        future = asyncio.get_running_loop().create_future()
+        self.pending[update_id] = future
+        start = time.perf_counter()
+        if self.args.transport == "polling":
+            self.api.push(payload)
+            await future
+            self.e2e.append(time.perf_counter() - start)
+            self.updates += 1
+            return
+        while True:
+            async with self.client.post(f"/{TOKEN}", json=payload) as response:
+                status = response.status
+            if status != 503:
+                break
+            # Navbat to'la - Telegram ham keyinroq qayta yuboradi
+            self.busy += 1
+            await asyncio.sleep(0.05)
+        self.http.append(time.perf_counter() - start)
+        await future
+        self.e2e.append(time.perf_counter() - start)
+        self.updates += 1
+
+    # ===== SSENARIYLAR =====
+
+    async def student_flow(self, student_id, faculty, tutor_id):
+        from callbacks import pack, FACULTY, TYUTOR
+        from roster import faculty_key
+        await self.send(self.message(student_id, "/start"))
+        await self.send(self.callback(student_id, pack(FACULTY, faculty_key(faculty))))
+        await self.send(self.callback(student_id, pack(TYUTOR, tutor_id)))
+        await self.send(self.message(student_id, f"Talaba {student_id}"))
+        await self.send(self.message(student_id, "+998901234567"))
+        await self.send(self.message(student_id, "Stipendiya bo'yicha savolim bor"))
+
+    async def tutor_flow(self, tutor_id, request_ids):
+        from callbacks import pack, ACCEPT, RESPOND
+        # Bitta tyutorning FSM holati bitta - murojaatlarni ketma-ket ko'radi
+        for request_id in request_ids:
+            await self.send(self.callback(tutor_id, pack(ACCEPT, request_id)))
+            await self.send(self.callback(tutor_id, pack(RESPOND, request_id)))
+            await self.send(self.message(tutor_id, "Dekanatga murojaat qiling"))
+
+    async def reply_flow(self, student_id, request_id):
+        from callbacks import pack, STUDENT_REPLY
+        await self.send(self.callback(student_id, pack(STUDENT_REPLY, request_id)))
+        await self.send(self.message(student_id, "Rahmat!"))
+
+    async def run_phase(self, name, coros):
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def limited(coro):
+            async with semaphore:
+                await coro
+
+        self.e2e, self.http, self.updates = [], [], 0
+        start = time.perf_counter()
+        await asyncio.gather(*(limited(coro) for coro in coros))
+        elapsed = time.perf_counter() - start
+        print(f"{name:<18}{self.updates:>9}{self.updates / elapsed:>10.0f}"
+              f"{percentile(self.e2e, 0.5) * 1000:>10.1f}{percentile(self.e2e, 0.99) * 1000:>10.1f}"
+              f"{percentile(self.http, 0.99) * 1000:>10.1f}{rss_mb():>10.1f}")
+
+    # ===== ASOSIY =====
+
+    async def run(self):
+        from aiohttp.test_utils import TestClient, TestServer
+
+        api = MockTelegramAPI(latency=self.args.latency, jitter=self.args.jitter,
+                              rate_429=self.args.rate_429, retry_after=self.args.retry_after, seed=1)
+        self.api_url = await api.start()
+        self.api = api
+        self.prepare()
+        rss_before = rss_mb()
+
+        import aloqa
+        self.instrument(aloqa)
+        await aloqa.start_services()
+        self.client = TestClient(TestServer(aloqa.create_app()))
+        await self.client.start_server()
+        if self.args.transport == "polling":
+            aloqa.poller.start()
+        rss_boot = rss_mb()
+
+        tutors = [(faculty, tutor["chat_id"]) for faculty, items in aloqa.roster.faculties.items() for tutor in items]
+        students = [(STUDENT_BASE + i, *tutors[i % len(tutors)]) for i in range(self.args.students)]
+
+        print(f"Talabalar: {self.args.students}, tyutorlar: {len(tutors)}, parallel: {self.args.concurrency}, "
+              f"rejim: {self.args.mode}/{self.args.transport}, API kechikishi: {self.args.latency * 1000:.0f}ms, 429: {self.args.rate_429:.1%}\n")
+        print(f"{'bosqich':<18}{'update':>9}{'upd/s':>10}{'p50, ms':>10}{'p99, ms':>10}{'http p99':>10}{'RSS, MB':>10}")
+
+        started = time.perf_counter()
+        await self.run_phase("talaba murojaati", [self.student_flow(*student) for student in students])
+
+        by_student = {req.student_id: req.id for req in aloqa.store.requests.values()}
+        by_tutor = {}
+        # Handler xato bilan tugagan bo'lsa (masalan, 429) murojaat yaratilmagan bo'lishi mumkin
+        for student_id, faculty, tutor_id in students:
+            if student_id in by_student:
+                by_tutor.setdefault(tutor_id, []).append(by_student[student_id])
+        await self.run_phase("tyutor javobi", [self.tutor_flow(t, ids) for t, ids in by_tutor.items()])
+        await self.run_phase("talaba javobi", [self.reply_flow(s, r) for s, r in by_student.items()])
+        total_elapsed = time.perf_counter() - started
+
+        remaining = await aloqa.outbox.join(timeout=60)
+        rss_end = rss_mb()
+        print(f"\nJami: {total_elapsed:.1f}s, murojaatlar: {len(by_student)}/{len(students)}, "
+              f"handler xatolari: {aloqa.update_queue.errors}, 503 (navbat to'la): {self.busy}, "
+              f"outbox qoldig'i: {remaining}")
+        print(f"Outbox: {json.dumps(aloqa.outbox.stats())}")
+        print(f"Mock API: {json.dumps(api.stats()['calls'])}, 429: {api.errors_429}")
+        print(f"RSS: {rss_before:.1f} -> {rss_boot:.1f} (ishga tushgach) -> {rss_end:.1f} MB, "
+              f"talaba boshiga {(rss_end - rss_boot) * 1024 / max(1, self.args.students):.1f} KB")
+
+        await self.client.close()
+        if self.args.transport == "polling":
+            await aloqa.poller.stop()
+        await aloqa.stop_services()
+        await api.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tyutor bot yuklama testi")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--tutors", type=int, default=20)
+    parser.add_argument("--faculties", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=200, help="bir vaqtda faol foydalanuvchilar")
+    parser.add_argument("--latency", type=float, default=0.05, help="soxta API kechikishi, sekund")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--mode", choices=("queue", "inline"), default="queue")
+    parser.add_argument("--transport", choices=("webhook", "polling"), default="webhook")
+    parser.add_argument("--record", help="update'larni shu .jsonl.gz faylga yozib olish (bench/replay.py uchun)")
+    args = parser.parse_args()
+    if args.record:
+        args.record = os.path.abspath(args.record)
+    asyncio.run(LoadTest(args).run())
+
+
+if __name__ == "__main__":
+    main()
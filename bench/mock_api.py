@@ -0,0 +1,166 @@
+"""Mahalliy soxta Telegram Bot API serveri (yuklama testlari uchun).
+
+Har bir so'rovni yozib boradi, sozlanadigan kechikish qo'shadi va
+berilgan ulushda 429 (Too Many Requests) qaytaradi. push() bilan
+qo'shilgan update'lar getUpdates (long polling) orqali beriladi.
+Alohida ishga tushirish (loyiha ildizidan):
+
+    python bench/mock_api.py [--port 8081] [--latency 0.05] [--jitter 0.02] [--rate-429 0.01]
+
+So'ng botni TELEGRAM_API_URL=http://127.0.0.1:8081 bilan ishga tushiring.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter, deque
+from itertools import islice
+from aiohttp import web
+
+# Xabar qaytaradigan metodlar - qolganlari uchun result: true
+MESSAGE_METHODS = {"sendmessage", "editmessagetext", "senddocument", "editmessagereplymarkup"}
+
+
+class MockTelegramAPI:
+    """Bot API o'rnini bosuvchi aiohttp ilovasi"""
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_429=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.errors_429 = 0
+        self.chats = Counter()
+        self.connections = set()  # mijoz (host, port) - har bir TCP ulanish uchun bittadan
+        self.last_call_at = None  # oxirgi muvaffaqiyatli so'rov vaqti (time.monotonic)
+        self._updates = deque()  # getUpdates uchun, update_id bo'yicha tartibda
+        self._updates_added = asyncio.Event()
+        self._message_ids = itertools.count(1)
+        self._runner = None
+        self.url = None
+
+    def app(self):
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    async def _params(self, request):
+        if request.content_type == "multipart/form-data":
+            form = await request.post()
+            return {key: value for key, value in form.items() if isinstance(value, str)}
+        if request.content_type == "application/json":
+            return await request.json()
+        return dict(await request.post())
+
+    def push(self, update):
+        """getUpdates orqali beriladigan update qo'shish"""
+        self._updates.append(update)
+        self._updates_added.set()
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        # offset dan kichiklari tasdiqlangan - o'chiramiz
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        timeout = float(params.get("timeout") or 0)
+        if not self._updates and timeout > 0:
+            self._updates_added.clear()
+            try:
+                await asyncio.wait_for(self._updates_added.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(islice(self._updates, int(params.get("limit") or 100)))
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        self.connections.add(request.transport.get_extra_info("peername") if request.transport else None)
+        params = await self._params(request)
+
+        delay = self.latency + (self.random.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.rate_429 and self.random.random() < self.rate_429:
+            self.errors_429 += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+
+        self.calls[method] += 1
+        self.last_call_at = time.monotonic()
+        chat_id = params.get("chat_id")
+        if chat_id is not None:
+            self.chats[int(chat_id)] += 1
+
+        result = True
+        if method.lower() == "getupdates":
+            result = await self._get_updates(params)
+        elif method.lower() in MESSAGE_METHODS:
+            result = {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id or 0), "type": "private"},
+                "text": params.get("text") or "",
+            }
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self):
+        return {
+            "calls": dict(self.calls),
+            "total": sum(self.calls.values()),
+            "errors_429": self.errors_429,
+            "chats": len(self.chats),
+            "connections": len(self.connections),
+        }
+
+
+async def serve(args):
+    api = MockTelegramAPI(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                          retry_after=args.retry_after)
+    url = await api.start(args.host, args.port)
+    print(f"Mock Bot API: {url} (kechikish {args.latency}s ±{args.jitter}, 429: {args.rate_429:.1%})")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(json.dumps(api.stats(), ensure_ascii=False))
+    finally:
+        await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05, help="har so'rovga kechikish, sekund")
+    parser.add_argument("--jitter", type=float, default=0.0, help="kechikishning tasodifiy tebranishi, sekund")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="429 qaytariladigan so'rovlar ulushi (0..1)")
+    parser.add_argument("--retry-after", type=int, default=1)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Yozib olingan webhook trafigini qayta o'ynatish (regressiya benchmarki).
+
+Bot RECORD_UPDATES_FILE=updates.jsonl.gz bilan ishga tushirilganda kelgan
+update'lar vaqti bilan yozib boriladi (yoki: bench/load_test.py --record).
+Bu skript o'sha faylni toza bazali botga soxta Bot API (bench/mock_api.py)
+ustida qayta yuboradi - asl tezlikda (--speed 1), tezlashtirib (--speed 10)
+yoki iloji boricha tez (--speed 0). Oxirida o'tkazuvchanlik, kechikish va
+murojaatlar yakuniy holatining dayjesti chiqariladi: ikki versiyada bir
+xil log bir xil dayjest berishi kerak (--expect bilan tekshiriladi).
+
+Ishga tushirish (loyiha ildizidan):
+
+    python bench/replay.py updates.jsonl.gz [--speed 0] [--mode inline] [--latency 0.05]
+                           [--config config.json] [--state-out state.json] [--expect DAYJEST]
+
+config.json berilmasa, log yonidagi <log>.config.json, u ham bo'lmasa
+loyihaning config.json fayli ishlatiladi. Murojaat ID lari ishlov berish
+tartibiga bog'liq, shuning uchun aniq natija uchun --mode inline qulay.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_api import MockTelegramAPI
+from load_test import rss_mb, percentile
+from recorder import read_records
+
+TOKEN = "123456:REPLAY"
+
+
+def state_summary(store):
+    """Murojaatlar yakuniy holati: ID va vaqtlarsiz, tartiblangan"""
+    rows = sorted(
+        (req.student_id, req.Tyutor_id, req.faculty, str(req.status), req.text, req.message_count)
+        for req in store.requests.values()
+    )
+    digest = hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return {
+        "requests": len(rows),
+        "by_status": dict(sorted(Counter(row[3] for row in rows).items())),
+        "messages": sum(row[5] for row in rows),
+        "digest": digest,
+    }
+
+
+class Replay:
+    def __init__(self, args):
+        self.args = args
+        self.started = {}  # update_id -> yuborilgan vaqt
+        self.e2e = []
+        self.http = []
+        self.busy = 0
+
+    def prepare(self):
+        """Vaqtinchalik papka, config.json va muhit o'zgaruvchilari"""
+        config = self.args.config
+        if not config:
+            beside = self.args.log + ".config.json"
+            config = beside if os.path.exists(beside) else os.path.join(ROOT, "config.json")
+        self.workdir = tempfile.mkdtemp(prefix="tyutor_replay_")
+        shutil.copy(config, os.path.join(self.workdir, "config.json"))
+        os.chdir(self.workdir)
+        os.environ.pop("RECORD_UPDATES_FILE", None)
+        os.environ.update(
+            BOT_TOKEN=TOKEN,
+            ADMIN_ID=os.environ.get("ADMIN_ID", "1"),
+            WEBHOOK_URL="http://localhost",
+            TELEGRAM_API_URL=self.api_url,
+            UPDATE_MODE=self.args.mode,
+            CONFIG_POLL_INTERVAL="0",
+            ARCHIVE_INTERVAL="0",
+            LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+        )
+        # Sintetik foydalanuvchilar odamdan tezroq yozadi - flood cheklovi sukut bo'yicha o'chiq
+        for name in ("THROTTLE_MESSAGE_RATE", "THROTTLE_CALLBACK_RATE", "THROTTLE_CHAT_RATE", "THROTTLE_COALESCE"):
+            os.environ.setdefault(name, "0")
+        return config
+
+    def instrument(self, aloqa):
+        """Update yuborilgandan qayta ishlanib bo'lguncha vaqtni o'lchash"""
+        original = aloqa.process_update
+
+        async def tracked(update):
+            try:
+                await original(update)
+            finally:
+                start = self.started.pop(update.update_id, None)
+                if start is not None:
+                    self.e2e.append(time.perf_counter() - start)
+
+        aloqa.process_update = tracked
+        aloqa.update_queue.handler = tracked
+
+    async def post(self, raw):
+        start = time.perf_counter()
+        self.started[raw.get("update_id")] = start
+        while True:
+            async with self.client.post(f"/{TOKEN}", json=raw) as response:
+                status = response.status
+            if status != 503:
+                break
+            self.busy += 1
+            await asyncio.sleep(0.05)
+        self.http.append(time.perf_counter() - start)
+
+    async def run(self):
+        from aiohttp.test_utils import TestClient, TestServer
+
+        records = list(read_records(self.args.log))
+        if not records:
+            print(f"{self.args.log}: update'lar yo'q")
+            return 1
+
+        api = MockTelegramAPI(latency=self.args.latency, jitter=self.args.jitter,
+                              rate_429=self.args.rate_429, seed=1)
+        self.api_url = await api.start()
+        config = self.prepare()
+
+        import aloqa
+        self.instrument(aloqa)
+        await aloqa.start_services()
+        self.client = TestClient(TestServer(aloqa.create_app()))
+        await self.client.start_server()
+        rss_boot = rss_mb()
+
+        first = records[0][0]
+        span = records[-1][0] - first
+        print(f"Log: {self.args.log}, update'lar: {len(records)}, asl davomiylik: {span:.1f}s, "
+              f"tezlik: {'maksimal' if not self.args.speed else f'x{self.args.speed:g}'}, "
+              f"rejim: {self.args.mode}, config: {config}")
+
+        started = time.perf_counter()
+        for arrived, raw in records:
+            if self.args.speed:
+                delay = (arrived - first) / self.args.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await self.post(raw)
+        await aloqa.update_queue.join()
+        elapsed = time.perf_counter() - started
+        remaining = await aloqa.outbox.join(timeout=60)
+
+        print(f"\nJami: {elapsed:.2f}s, {len(records) / elapsed:.0f} upd/s, "
+              f"p50 {percentile(self.e2e, 0.5) * 1000:.1f} ms, p99 {percentile(self.e2e, 0.99) * 1000:.1f} ms, "
+              f"http p99 {percentile(self.http, 0.99) * 1000:.1f} ms")
+        print(f"Handler xatolari: {aloqa.update_queue.errors}, 503 (navbat to'la): {self.busy}, "
+              f"outbox qoldig'i: {remaining}, RSS: {rss_boot:.1f} -> {rss_mb():.1f} MB")
+        print(f"Mock API: {json.dumps(api.stats()['calls'])}, 429: {api.errors_429}")
+
+        summary = state_summary(aloqa.store)
+        print(f"Holat: {json.dumps(summary, ensure_ascii=False)}")
+
+        await self.client.close()
+        await aloqa.stop_services()
+        await api.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+        if self.args.state_out:
+            with open(self.args.state_out, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+        if self.args.expect and self.args.expect != summary["digest"]:
+            print(f"XATO: dayjest {summary['digest']} kutilgan {self.args.expect} ga teng emas")
+            return 1
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yozib olingan update'larni qayta o'ynatish")
+    parser.add_argument("log", help="RECORD_UPDATES_FILE bilan yozilgan .jsonl.gz fayl")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 - asl tezlik, 0 - iloji boricha tez")
+    parser.add_argument("--mode", choices=("queue", "inline"), default="queue")
+    parser.add_argument("--config", help="tyutorlar ro'yxati (config.json)")
+    parser.add_argument("--latency", type=float, default=0.05, help="soxta API kechikishi, sekund")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--state-out", help="yakuniy holatni JSON faylga yozish")
+    parser.add_argument("--expect", help="kutilgan holat dayjesti (mos kelmasa chiqish kodi 1)")
+    args = parser.parse_args()
+    args.log = os.path.abspath(args.log)
+    if args.config:
+        args.config = os.path.abspath(args.config)
+    if args.state_out:
+        args.state_out = os.path.abspath(args.state_out)
+    sys.exit(asyncio.run(Replay(args).run()))
+
+
+if __name__ == "__main__":
+    main()
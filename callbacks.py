@@ -0,0 +1,98 @@
+"""Ixcham, versiyalangan callback_data kodeki va yagona router.
+
+Format: <versiya><amal>[.<arg>.<arg>...], argumentlar 36-lik sanoq
+tizimidagi butun sonlar. Masalan: "1R.2n.1" - rad etish, murojaat 95,
+1-sabab. Telegram 64 baytdan uzun callback_data'ni qabul qilmaydi, bu
+format esa odatda 10 baytdan oshmaydi.
+"""
+
+VERSION = "1"
+SEPARATOR = "."
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+# ===== AMALLAR =====
+
+FACULTY = "f"          # fakultet kaliti
+TYUTOR = "t"           # tyutor chat_id
+CANCEL = "x"
+GO_BACK = "b"
+CANCEL_REQUEST = "c"   # murojaat id
+VIEW = "v"             # murojaat id
+ACCEPT = "a"           # murojaat id
+REJECT = "r"           # murojaat id
+REASON = "R"           # murojaat id, sabab raqami
+RESPOND = "p"          # murojaat id
+STUDENT_REPLY = "s"    # murojaat id
+CONTINUE = "n"         # murojaat id
+FINISH = "F"           # murojaat id
+PANEL_PAGE = "P"       # status raqami (0 - hammasi), sahifa
+HISTORY = "h"          # murojaat id, sahifa
+
+
+def _encode_int(value):
+    if value == 0:
+        return "0"
+    sign = "-" if value < 0 else ""
+    value = abs(value)
+    digits = []
+    while value:
+        value, rem = divmod(value, 36)
+        digits.append(_DIGITS[rem])
+    return sign + "".join(reversed(digits))
+
+
+def pack(op, *args):
+    """Amal va butun son argumentlarni callback_data satriga aylantirish"""
+    data = VERSION + op
+    if args:
+        data += SEPARATOR + SEPARATOR.join(_encode_int(int(arg)) for arg in args)
+    return data
+
+
+def unpack(data):
+    """(amal, (argumentlar...)) yoki eski/noto'g'ri format bo'lsa None"""
+    if not data or len(data) < 2 or data[0] != VERSION:
+        return None
+    op = data[1]
+    rest = data[2:]
+    if not rest:
+        return op, ()
+    if rest[0] != SEPARATOR:
+        return None
+    try:
+        return op, tuple(int(part, 36) for part in rest[1:].split(SEPARATOR))
+    except ValueError:
+        return None
+
+
+class CallbackRouter:
+    """Callback'larni amal kodi bo'yicha lug'at orqali (O(1)) yo'naltirish.
+
+    Handler imzosi: async def handler(query, state, *args)
+    """
+
+    def __init__(self, on_unknown=None):
+        self.routes = {}
+        self.on_unknown = on_unknown
+
+    def route(self, op):
+        def decorator(handler):
+            if op in self.routes:
+                raise ValueError(f"callback amali allaqachon band: {op!r}")
+            self.routes[op] = handler
+            return handler
+        return decorator
+
+    def resolve(self, data):
+        """callback_data ga mos handler yoki None"""
+        decoded = unpack(data)
+        return self.routes.get(decoded[0]) if decoded else None
+
+    async def dispatch(self, query, state):
+        decoded = unpack(query.data)
+        handler = self.routes.get(decoded[0]) if decoded else None
+        if handler is None:
+            if self.on_unknown:
+                await self.on_unknown(query, state)
+            return
+        await handler(query, state, *decoded[1])
@@ -0,0 +1,328 @@
+"""Ko'p jarayonli rejim: bitta front jarayon webhook qabul qiladi va
+update'larni chat_id xeshi bo'yicha N ta worker jarayonga yuboradi.
+
+Har bir worker aloqa.py ning to'liq nusxasi (dispatcher, navbat, outbox).
+Murojaatlar umumiy SQLite bazada (store.sync() orqali), FSM holatlari esa
+chat bo'yicha bo'lingan, chunki bitta chat doim bitta workerga tushadi.
+Tyutorlar ro'yxati config.json orqali umumiy. Front -> worker aloqasi unix
+socket orqali; har bir workerga update'lar bitta navbatdan kelgan tartibda
+yuboriladi, shuning uchun chat ichidagi tartib saqlanadi.
+
+Ishga tushirish (Linux):
+
+    CLUSTER_WORKERS=4 python cluster.py
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import signal
+import tempfile
+import zlib
+from aiohttp import web, ClientSession, ClientTimeout, ClientError, UnixConnector
+from dotenv import load_dotenv
+
+from dedup import UpdateDeduplicator
+from logs import setup_logging
+from recorder import UpdateRecorder
+
+log = logging.getLogger("cluster")
+
+load_dotenv()
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+PORT = int(os.getenv("PORT", 3000))
+CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", os.cpu_count() or 2))
+CLUSTER_SOCKET_DIR = os.getenv("CLUSTER_SOCKET_DIR", "")  # bo'sh bo'lsa vaqtinchalik papka
+CLUSTER_BATCH = int(os.getenv("CLUSTER_BATCH", 100))  # workerga bitta so'rovda ko'pi bilan shuncha update
+DEDUP_SIZE = int(os.getenv("DEDUP_SIZE", 10000))
+DEDUP_WINDOW = int(os.getenv("DEDUP_WINDOW", 3600))
+DEDUP_FILE = os.getenv("DEDUP_FILE", "")
+RECORD_UPDATES_FILE = os.getenv("RECORD_UPDATES_FILE", "")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+
+def raw_chat_id(raw):
+    """Xom update JSON qaysi chatga tegishli (update_queue.update_chat_id ning dict varianti)"""
+    for key in ("message", "edited_message", "my_chat_member"):
+        if key in raw:
+            return raw[key]["chat"]["id"]
+    query = raw.get("callback_query")
+    if query:
+        message = query.get("message")
+        return message["chat"]["id"] if message else query["from"]["id"]
+    return None
+
+
+def worker_for(raw, workers):
+    """Chat doim bitta workerga tushadi. Xesh - worker ichidagi (chat_id % n) bo'linish bilan to'qnashmasin"""
+    chat_id = raw_chat_id(raw)
+    key = chat_id if chat_id is not None else raw.get("update_id", 0)
+    return zlib.crc32(str(key).encode()) % workers
+
+
+def _worker_main(index, workers, socket_path):
+    os.environ.update(CLUSTER_WORKERS=str(workers), CLUSTER_WORKER_INDEX=str(index))
+    import aloqa
+    asyncio.run(aloqa.run_worker(socket_path))
+
+
+class WorkerLink:
+    """Bitta worker jarayon va unga update yuboruvchi navbat"""
+
+    def __init__(self, index, workers, socket_path, batch=100):
+        self.index = index
+        self.workers = workers
+        self.socket_path = socket_path
+        self.batch = batch
+        self.process = None
+        self.restarts = 0
+        self.forwarded = 0
+        self.rejected = 0
+        self._queue = asyncio.Queue()
+        self._session = None
+        self._task = None
+
+    def spawn(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        context = multiprocessing.get_context("spawn")
+        self.process = context.Process(
+            target=_worker_main, args=(self.index, self.workers, self.socket_path),
+            name=f"worker-{self.index}", daemon=False,
+        )
+        self.process.start()
+
+    async def wait_ready(self, timeout=60):
+        """Worker socket ochib, /health ga javob berguncha kutish"""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while asyncio.get_running_loop().time() < deadline:
+            if not self.process.is_alive():
+                raise RuntimeError(f"worker {self.index} ishga tushmadi (kod {self.process.exitcode})")
+            if os.path.exists(self.socket_path):
+                try:
+                    await self.request("GET", "/health")
+                    return
+                except (ClientError, OSError):
+                    pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError(f"worker {self.index} {timeout}s ichida tayyor bo'lmadi")
+
+    def start(self):
+        self._session = ClientSession(
+            connector=UnixConnector(path=self.socket_path), timeout=ClientTimeout(total=30)
+        )
+        self._task = asyncio.create_task(self._forward_loop())
+
+    async def request(self, method, path, **kwargs):
+        session = self._session or ClientSession(connector=UnixConnector(path=self.socket_path))
+        try:
+            async with session.request(method, f"http://worker{path}", **kwargs) as response:
+                response.raise_for_status()
+                if response.content_type == "application/json":
+                    return await response.json()
+                return await response.text()
+        finally:
+            if session is not self._session:
+                await session.close()
+
+    async def submit(self, raw):
+        """Update'ni workerga yuborish. Worker qabul qilsa True"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((raw, future))
+        return await future
+
+    async def _forward_loop(self):
+        # Bitta navbat va ketma-ket so'rovlar - chat ichidagi tartib shu yerda saqlanadi
+        while True:
+            items = [await self._queue.get()]
+            while len(items) < self.batch and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            try:
+                accepted = await self.request("POST", "/updates", json=[raw for raw, _ in items])
+            except Exception as e:
+                log.error("Worker %d ga yuborilmadi (%d update): %s", self.index, len(items), e)
+                accepted = [False] * len(items)
+            for (raw, future), ok in zip(items, accepted):
+                if not future.done():
+                    future.set_result(ok)
+                if ok:
+                    self.forwarded += 1
+                else:
+                    self.rejected += 1
+
+    async def stop(self, timeout=30):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._session:
+            await self._session.close()
+        if self.process and self.process.is_alive():
+            self.process.terminate()  # SIGTERM: worker xizmatlarini to'xtatib, saqlab chiqadi
+            await asyncio.get_running_loop().run_in_executor(None, self.process.join, timeout)
+            if self.process.is_alive():
+                log.warning("Worker %d o'z vaqtida to'xtamadi, o'ldirildi", self.index)
+                self.process.kill()
+
+    def stats(self):
+        return {
+            "worker": self.index,
+            "alive": bool(self.process and self.process.is_alive()),
+            "pid": self.process.pid if self.process else None,
+            "restarts": self.restarts,
+            "queued": self._queue.qsize(),
+            "forwarded": self.forwarded,
+            "rejected": self.rejected,
+        }
+
+
+_METRIC_LINE = re.compile(r"^([a-zA-Z_:][\w:]*)(?:\{(.*)\})? (.*)$")
+
+
+def merge_metrics(texts):
+    """Workerlar metrikalarini worker="i" yorlig'i bilan bitta matnga birlashtirish.
+
+    Prometheus formatida bitta metrikaning barcha qatorlari birga turishi
+    kerak, shuning uchun qatorlar # HELP/# TYPE bo'yicha guruhlanadi.
+    """
+    families = {}  # nom -> (sarlavhalar, qatorlar)
+    for index, text in enumerate(texts):
+        family = None
+        for line in text.splitlines():
+            if line.startswith("#"):
+                family = line.split()[2]
+                headers = families.setdefault(family, ([], []))[0]
+                if line not in headers:
+                    headers.append(line)
+                continue
+            match = _METRIC_LINE.match(line)
+            if not match or family is None:
+                continue
+            name, labels, value = match.groups()
+            labels = f'worker="{index}"' + (f",{labels}" if labels else "")
+            families[family][1].append(f"{name}{{{labels}}} {value}")
+    lines = [line for headers, samples in families.values() for line in headers + samples]
+    return "\n".join(lines) + "\n"
+
+
+class Front:
+    """Webhook qabul qiluvchi va workerlarni boshqaruvchi front jarayon"""
+
+    def __init__(self, workers, socket_dir, batch=100):
+        self.links = [
+            WorkerLink(i, workers, os.path.join(socket_dir, f"worker-{i}.sock"), batch)
+            for i in range(workers)
+        ]
+        self.dedup = UpdateDeduplicator(maxsize=DEDUP_SIZE, window=DEDUP_WINDOW, path=DEDUP_FILE or None)
+        self.recorder = UpdateRecorder(RECORD_UPDATES_FILE) if RECORD_UPDATES_FILE else None
+        self._supervisor = None
+
+    async def webhook_handler(self, request):
+        raw = await request.json()
+        if self.recorder:
+            self.recorder.record(raw)
+        update_id = raw.get("update_id")
+        if self.dedup.is_duplicate(update_id):
+            return web.Response(text="OK")
+        self.dedup.remember(update_id)
+
+        link = self.links[worker_for(raw, len(self.links))]
+        if not await link.submit(raw):
+            # Worker navbati to'la yoki ishlamayapti - Telegram keyinroq qayta yuboradi
+            self.dedup.forget(update_id)
+            return web.Response(status=503, text="Busy")
+        return web.Response(text="OK")
+
+    async def health_check(self, request):
+        workers = []
+        for link in self.links:
+            stats = link.stats()
+            try:
+                stats["health"] = await link.request("GET", "/health")
+            except Exception as e:
+                stats["health"] = {"status": "DOWN", "error": str(e)}
+            workers.append(stats)
+        ok = all(w["alive"] for w in workers)
+        return web.json_response(
+            {"status": "OK" if ok else "DEGRADED", "mode": "cluster", "dedup": self.dedup.stats(), "workers": workers},
+            status=200 if ok else 503,
+        )
+
+    async def metrics_handler(self, request):
+        texts = []
+        for link in self.links:
+            try:
+                texts.append(await link.request("GET", "/metrics"))
+            except Exception:
+                texts.append("")
+        return web.Response(text=merge_metrics(texts), content_type="text/plain", charset="utf-8")
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_get('/', self.health_check)
+        app.router.add_get('/health', self.health_check)
+        app.router.add_get('/metrics', self.metrics_handler)
+        app.router.add_post(f'/{BOT_TOKEN}', self.webhook_handler)
+        return app
+
+    async def start(self):
+        self.dedup.load()
+        if self.recorder:
+            self.recorder.start()
+        for link in self.links:
+            link.spawn()
+        await asyncio.gather(*(link.wait_ready() for link in self.links))
+        for link in self.links:
+            link.start()
+        self._supervisor = asyncio.create_task(self._supervise())
+        log.info("Klaster: %d worker tayyor", len(self.links))
+
+    async def _supervise(self):
+        """Yiqilgan workerni qayta ishga tushirish"""
+        while True:
+            await asyncio.sleep(1)
+            for link in self.links:
+                if not link.process.is_alive():
+                    log.error("Worker %d to'xtadi (kod %s), qayta ishga tushirilmoqda", link.index, link.process.exitcode)
+                    link.restarts += 1
+                    link.spawn()
+                    try:
+                        await link.wait_ready()
+                    except RuntimeError as e:
+                        log.error("%s", e)
+
+    async def stop(self):
+        if self._supervisor:
+            self._supervisor.cancel()
+            await asyncio.gather(self._supervisor, return_exceptions=True)
+        await asyncio.gather(*(link.stop() for link in self.links))
+        if self.recorder:
+            await self.recorder.close()
+        self.dedup.save()
+
+
+async def main():
+    setup_logging(LOG_LEVEL, LOG_FORMAT)
+    socket_dir = CLUSTER_SOCKET_DIR or tempfile.mkdtemp(prefix="tyutor_cluster_")
+    front = Front(CLUSTER_WORKERS, socket_dir, batch=CLUSTER_BATCH)
+    await front.start()
+
+    runner = web.AppRunner(front.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', PORT).start()
+    log.info("Front: 0.0.0.0:%d, %d worker, socketlar: %s", PORT, CLUSTER_WORKERS, socket_dir)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await front.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
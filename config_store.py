@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+def file_signature(path):
+    """Fayl o'zgarganini arzon aniqlash uchun (mtime, inode, hajm)"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+def content_digest(text):
+    return hashlib.sha1(text.encode("utf-8") if isinstance(text, str) else text).digest()
+
+
+def validate_faculties(data):
+    """config.json tuzilishini tekshirish: {fakultet: [{"name": str, "chat_id": int}, ...]}"""
+    if not isinstance(data, dict):
+        raise ValueError("config fakultetlar lug'ati bo'lishi kerak")
+    for faculty, tutors in data.items():
+        if not isinstance(faculty, str) or not isinstance(tutors, list):
+            raise ValueError(f"noto'g'ri fakultet: {faculty!r}")
+        for tutor in tutors:
+            if not isinstance(tutor, dict) or not isinstance(tutor.get("name"), str) \
+                    or not isinstance(tutor.get("chat_id"), int):
+                raise ValueError(f"noto'g'ri tyutor: {tutor!r} ({faculty})")
+    return data
+
+
+def atomic_write(path, text):
+    """Faylni tmp + fsync + rename orqali yozish: yarim yozilgan fayl qolmaydi (text: str yoki bytes)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = f"{path}.tmp"
+    binary = isinstance(text, bytes)
+    with open(tmp_path, 'wb' if binary else 'w', encoding=None if binary else 'utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class ConfigWriter:
+    """config.json ni fon rejimida, atomik va guruhlab saqlash.
+
+    Ketma-ket o'zgarishlar `delay` sekund ichida bitta yozuvga birlashtiriladi
+    (lekin `max_delay` dan ko'p kechiktirilmaydi). Har bir yozuv versiya
+    raqami bilan jurnalga ham qo'shiladi, shuning uchun oxirgi to'g'ri
+    konfiguratsiyani doim tiklash mumkin. Jurnalda oxirgi `keep` ta versiya
+    saqlanadi (2 * keep ga yetganda qisqartiriladi).
+    """
+
+    def __init__(self, path, journal_path=None, delay=0.5, max_delay=5.0, keep=20):
+        self.path = path
+        self.journal_path = journal_path or f"{path}.journal"
+        self.delay = delay
+        self.max_delay = max_delay
+        self.keep = keep
+        self._entries = 0
+        self.version = self._last_version()
+        self.writes = 0
+        # Oxirgi o'zimiz yozgan fayl - watcher uni tashqi o'zgarish deb hisoblamasligi uchun
+        self.last_signature = None
+        # O'zimiz yozgan (yoki yozilayotgan) matnlar izi - yozishdan oldin qo'shiladi
+        self._written = deque(maxlen=8)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="config")
+        self._config = None
+        self._changes = []
+        self._first_change_at = None
+        self._timer = None
+        self._task = None
+
+    # ===== JURNAL =====
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Yozish paytida uzilib qolgan oxirgi qator
+                    continue
+
+    def _last_version(self):
+        version = 0
+        for entry in self._read_journal():
+            version = max(version, entry.get("version", 0))
+            self._entries += 1
+        return version
+
+    def recover(self, version=None):
+        """Jurnaldagi oxirgi (yoki berilgan) versiyadagi konfiguratsiya"""
+        found = None
+        for entry in self._read_journal():
+            if version is None or entry.get("version") == version:
+                found = entry
+        return found["config"] if found else None
+
+    # ===== YOZISH =====
+
+    def schedule(self, config, change=None):
+        """Saqlashni rejalashtirish (darhol qaytadi)"""
+        loop = asyncio.get_running_loop()
+        self._config = config
+        if change:
+            self._changes.append(change)
+        if self._first_change_at is None:
+            self._first_change_at = loop.time()
+
+        if self._timer:
+            self._timer.cancel()
+        waited = loop.time() - self._first_change_at
+        delay = max(0.0, min(self.delay, self.max_delay - waited))
+        self._timer = loop.call_later(delay, self._start_flush)
+
+    def is_own(self, text):
+        """Fayl matni shu writer yozgani bilan bir xilmi"""
+        return content_digest(text) in self._written
+
+    def discard(self):
+        """Rejalashtirilgan (hali yozilmagan) saqlashni bekor qilish. Tashlangan o'zgarishlar soni qaytadi"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        dropped = (len(self._changes) or 1) if self._config is not None else 0
+        self._config = None
+        self._changes = []
+        self._first_change_at = None
+        return dropped
+
+    def _start_flush(self):
+        self._timer = None
+        # Yozuvlar bitta thread'da navbat bilan bajariladi, tartib saqlanadi
+        self._task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """Rejalashtirilgan o'zgarishlarni hozir yozish"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._config is None:
+            return True
+
+        text = json.dumps(self._config, ensure_ascii=False, indent=2)
+        changes = self._changes
+        self.version += 1
+        entry = json.dumps({
+            "version": self.version,
+            "time": time.time(),
+            "changes": changes,
+            "config": self._config,
+        }, ensure_ascii=False)
+        self._config = None
+        self._changes = []
+        self._first_change_at = None
+        # os.replace dan oldin: watcher faylni shu zahoti ko'rsa ham o'zimiznikini taniydi
+        self._written.append(content_digest(text))
+
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._write, text, entry)
+        except Exception as e:
+            log.error("Config saqlanmadi: %s", e)
+            return False
+        self.writes += 1
+        log.info("Config saqlandi: %s (versiya %d, %d o'zgarish)", self.path, self.version, len(changes))
+        return True
+
+    def _write(self, text, entry):
+        atomic_write(self.path, text)
+        self.last_signature = file_signature(self.path)
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(entry + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._entries += 1
+        if self.keep and self._entries >= 2 * self.keep:
+            self._truncate_journal()
+
+    def _truncate_journal(self):
+        """Jurnalda faqat oxirgi `keep` ta versiyani qoldirish (atomik)"""
+        entries = list(self._read_journal())[-self.keep:]
+        atomic_write(self.journal_path, "".join(
+            json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries
+        ))
+        self._entries = len(entries)
+
+    async def close(self):
+        await self.flush()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._executor.shutdown()
+
+
+class ConfigWatcher:
+    """config.json tashqaridan o'zgarganini kuzatish va qayta yuklash.
+
+    Har `interval` sekundda faylning (mtime, inode, hajm) belgisi
+    tekshiriladi. O'zgargan bo'lsa, fayl fon thread'ida o'qilib tekshiriladi
+    va faqat to'g'ri bo'lsa on_change(faculties) chaqiriladi. Botning o'zi
+    (writer) yozgan fayl matni bo'yicha tanib olinadi va qayta yuklanmaydi.
+    """
+
+    def __init__(self, path, on_change, interval=2.0, writer=None):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.writer = writer
+        self.signature = file_signature(path)
+        self.reloads = 0
+        self.errors = 0
+        self._task = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                log.exception("Config kuzatuvchi: %s", e)
+
+    def _read(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        if self.writer and self.writer.is_own(text):
+            return None
+        return validate_faculties(json.loads(text))
+
+    async def check(self):
+        """Fayl o'zgargan bo'lsa qayta yuklash. Yuklangan bo'lsa True"""
+        signature = file_signature(self.path)
+        if signature is None or signature == self.signature:
+            return False
+        self.signature = signature
+        if self.writer and signature == self.writer.last_signature:
+            return False
+
+        loop = asyncio.get_running_loop()
+        try:
+            faculties = await loop.run_in_executor(None, self._read)
+        except (ValueError, OSError) as e:
+            # json.JSONDecodeError ham ValueError - eski ro'yxat bilan ishlashda davom etamiz
+            self.errors += 1
+            log.warning("Yangi config.json qabul qilinmadi: %s", e)
+            return False
+        if faculties is None:
+            # O'zimiz yozgan fayl (belgi hali yangilanmagan bo'lishi mumkin)
+            return False
+
+        self.on_change(faculties)
+        self.reloads += 1
+        return True
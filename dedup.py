@@ -0,0 +1,78 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class UpdateDeduplicator:
+    """Yaqinda qayta ishlangan update_id lar keshi (LRU + vaqt oynasi).
+
+    Telegram javobni kutib qolsa, bitta update'ni qayta yuboradi. Bunday
+    takroriy update'lar dispatcherga ikkinchi marta berilmaydi.
+    """
+
+    def __init__(self, maxsize=10000, window=3600, path=None):
+        self.maxsize = maxsize
+        self.window = window
+        self.path = path
+        self._seen = OrderedDict()  # update_id -> qabul qilingan vaqt
+        self.checked = 0
+        self.duplicates = 0
+
+    def is_duplicate(self, update_id):
+        self.checked += 1
+        seen_at = self._seen.get(update_id)
+        if seen_at is not None and time.time() - seen_at < self.window:
+            self.duplicates += 1
+            return True
+        return False
+
+    def remember(self, update_id):
+        """Update qabul qilinganini belgilash"""
+        now = time.time()
+        self._seen[update_id] = now
+        self._seen.move_to_end(update_id)
+        while self._seen:
+            oldest_id, seen_at = next(iter(self._seen.items()))
+            if len(self._seen) <= self.maxsize and now - seen_at < self.window:
+                break
+            del self._seen[oldest_id]
+
+    def forget(self, update_id):
+        """Update qayta ishlanmagan bo'lsa, Telegram qayta yuborishi uchun"""
+        self._seen.pop(update_id, None)
+
+    def load(self):
+        """Saqlangan update_id larni fayldan o'qish"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+            now = time.time()
+            for update_id, seen_at in items:
+                if now - seen_at < self.window:
+                    self._seen[update_id] = seen_at
+            log.info("Dedup keshi yuklandi: %d ta update_id", len(self._seen))
+        except Exception as e:
+            log.warning("Dedup keshi o'qilmadi: %s", e)
+
+    def save(self):
+        """update_id larni faylga yozish (tmp + rename)"""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self._seen.items()), f)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        return {
+            "size": len(self._seen),
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "hit_rate": round(self.duplicates / self.checked, 4) if self.checked else 0.0,
+        }
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+
+log = logging.getLogger(__name__)
+
+
+# ===== KALIT-QIYMAT BACKENDLARI =====
+
+class KeyValueBackend:
+    """FSM yozuvlari uchun kalit-qiymat ombori interfeysi.
+
+    set_many elementlari: (key, value, ttl). value None bo'lsa, kalit o'chiriladi.
+    """
+
+    async def get(self, key):
+        raise NotImplementedError
+
+    async def set_many(self, items):
+        raise NotImplementedError
+
+    async def purge_expired(self):
+        return 0
+
+    async def close(self):
+        pass
+
+
+class SQLiteKV(KeyValueBackend):
+    """SQLite fayliga yozuvchi backend (WAL rejimi)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _get(self, key):
+        row = self._conn.execute(
+            "SELECT value FROM fsm WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_many(self, items):
+        now = time.time()
+        with self._conn:
+            for key, value, ttl in items:
+                if value is None:
+                    self._conn.execute("DELETE FROM fsm WHERE key = ?", (key,))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO fsm (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, value, now + ttl if ttl else None)
+                    )
+
+    def _purge_expired(self):
+        with self._conn:
+            return self._conn.execute("DELETE FROM fsm WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    async def get(self, key):
+        return await self._run(self._get, key)
+
+    async def set_many(self, items):
+        await self._run(self._set_many, items)
+
+    async def purge_expired(self):
+        return await self._run(self._purge_expired)
+
+    async def close(self):
+        await self._run(self._conn.close)
+        self._executor.shutdown()
+
+
+class RedisKV(KeyValueBackend):
+    """Redis (yoki unga mos) async klient uchun backend. TTL'ni Redis o'zi boshqaradi"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, key):
+        value = await self.client.get(key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    async def set_many(self, items):
+        for key, value, ttl in items:
+            if value is None:
+                await self.client.delete(key)
+            else:
+                await self.client.set(key, value, ex=int(ttl) if ttl else None)
+
+    async def close(self):
+        close = getattr(self.client, "aclose", None) or getattr(self.client, "close", None)
+        if close:
+            await close()
+
+
+class ShardedKV(KeyValueBackend):
+    """Kalitlarni crc32 bo'yicha bir nechta backendga taqsimlash"""
+
+    def __init__(self, backends):
+        self.backends = list(backends)
+
+    def shard(self, key):
+        return self.backends[zlib.crc32(key.encode("utf-8")) % len(self.backends)]
+
+    async def get(self, key):
+        return await self.shard(key).get(key)
+
+    async def set_many(self, items):
+        groups = {}
+        for item in items:
+            groups.setdefault(id(self.shard(item[0])), (self.shard(item[0]), []))[1].append(item)
+        await asyncio.gather(*(backend.set_many(batch) for backend, batch in groups.values()))
+
+    async def purge_expired(self):
+        results = await asyncio.gather(*(backend.purge_expired() for backend in self.backends))
+        return sum(results)
+
+    async def close(self):
+        await asyncio.gather(*(backend.close() for backend in self.backends))
+
+
+# ===== FSM STORAGE =====
+
+class _Record:
+    __slots__ = ("state", "data", "expires_at")
+
+    def __init__(self, state=None, data=None, expires_at=None):
+        self.state = state
+        self.data = data or {}
+        self.expires_at = expires_at
+
+
+class PersistentStorage(BaseStorage):
+    """Doimiy FSM storage: write-back kesh + kalit-qiymat backend.
+
+    Holatlar xotiradagi keshda o'zgartiriladi va fon rejimida
+    flush_interval sekundda bir marta backendga yoziladi. ttl sekund
+    davomida o'zgarmagan (tashlab ketilgan) holatlar o'chiriladi.
+    """
+
+    def __init__(self, backend, ttl=86400, flush_interval=1.0, cache_size=10000,
+                 purge_interval=3600, key_builder=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self.purge_interval = purge_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True)
+        self._cache = OrderedDict()
+        self._dirty = set()
+        self._flush_task = None
+        self.hits = 0
+        self.misses = 0
+
+    async def _load(self, key):
+        record = self._cache.get(key)
+        if record is None:
+            self.misses += 1
+            raw = await self.backend.get(key)
+            # Kutish paytida boshqa coroutine yuklab qo'ygan bo'lishi mumkin
+            record = self._cache.get(key)
+            if record is None:
+                record = _Record()
+                if raw:
+                    value = json.loads(raw)
+                    record = _Record(value.get("state"), value.get("data"), time.time() + self.ttl)
+                self._cache[key] = record
+                self._evict()
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+
+        if record.expires_at is not None and record.expires_at <= time.time():
+            record.state = None
+            record.data = {}
+            record.expires_at = None
+            self._dirty.add(key)
+        return record
+
+    def _touch(self, key, record):
+        record.expires_at = time.time() + self.ttl
+        self._dirty.add(key)
+
+    def _evict(self):
+        while len(self._cache) > self.cache_size:
+            key = next(iter(self._cache))
+            if key in self._dirty:
+                break
+            self._cache.popitem(last=False)
+
+    async def set_state(self, key, state=None):
+        storage_key = self.key_builder.build(key)
+        record = await self._load(storage_key)
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(storage_key, record)
+
+    async def get_state(self, key):
+        record = await self._load(self.key_builder.build(key))
+        return record.state
+
+    async def set_data(self, key, data):
+        storage_key = self.key_builder.build(key)
+        record = await self._load(storage_key)
+        record.data = data.copy()
+        self._touch(storage_key, record)
+
+    async def get_data(self, key):
+        record = await self._load(self.key_builder.build(key))
+        return record.data.copy()
+
+    # ===== FON REJIMIDA YOZISH =====
+
+    async def start(self):
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        last_purge = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - last_purge >= self.purge_interval:
+                    last_purge = time.monotonic()
+                    purged = await self.backend.purge_expired()
+                    if purged:
+                        log.info("FSM: %d ta eskirgan holat o'chirildi", purged)
+            except Exception as e:
+                log.error("FSM holatlari yozilmadi: %s", e)
+
+    async def flush(self):
+        """O'zgargan holatlarni backendga yozish"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        items = []
+        for key in dirty:
+            record = self._cache.get(key)
+            if record is None or (record.state is None and not record.data):
+                items.append((key, None, None))
+            else:
+                value = json.dumps({"state": record.state, "data": record.data}, ensure_ascii=False)
+                items.append((key, value, self.ttl))
+        try:
+            await self.backend.set_many(items)
+        except Exception:
+            self._dirty |= dirty
+            raise
+        self._evict()
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+        await self.backend.close()
+
+    def stats(self):
+        return {
+            "cached": len(self._cache),
+            "dirty": len(self._dirty),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,119 @@
+import asyncio
+from aiohttp import ClientError, ClientSession, ClientTimeout, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from aiogram import Bot
+from aiogram.__meta__ import __version__
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramNetworkError
+
+
+class BotAPISession(AiohttpSession):
+    """Bot API uchun sozlangan ulanishlar hovuzi (keep-alive, DNS kesh, timeoutlar).
+
+    limit - jami ochiq ulanishlar, limit_per_host - bitta hostga (0 - cheklanmaydi),
+    keepalive - bo'sh ulanish necha sekund saqlanadi, dns_ttl - DNS kesh muddati.
+    connect_timeout ulanish o'rnatishga, read_timeout javobning har bir bo'lagini
+    kutishga, timeout esa butun so'rovga beriladi. Ulanishlar soni TraceConfig
+    orqali sanaladi (stats()).
+
+    Bitta sessiya bir nechta bot tokeni bilan ishlatilishi mumkin: session.bot(token)
+    hammasi shu hovuzdan foydalanadi. Sessiya bir marta yopiladi.
+    """
+
+    def __init__(self, limit=100, limit_per_host=0, keepalive=30, dns_ttl=300,
+                 connect_timeout=5, read_timeout=30, timeout=60, **kwargs):
+        super().__init__(limit=limit, timeout=timeout, **kwargs)
+        self._connector_init.update(
+            limit_per_host=limit_per_host,
+            ttl_dns_cache=dns_ttl or None,
+            use_dns_cache=dns_ttl > 0,
+        )
+        if keepalive > 0:
+            self._connector_init["keepalive_timeout"] = keepalive
+        else:
+            self._connector_init["force_close"] = True
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.requests = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+
+    def _trace_config(self):
+        trace = TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.requests += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.connections_opened += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            self.dns_hits += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            self.dns_misses += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+    def _timeout(self, total):
+        # Long polling (getUpdates) o'z timeout'ini beradi - unda read_timeout qo'llanmaydi
+        if total is not None:
+            return ClientTimeout(total=total, connect=self.connect_timeout)
+        return ClientTimeout(total=self.timeout, connect=self.connect_timeout, sock_read=self.read_timeout)
+
+    async def create_session(self):
+        if self._should_reset_connector:
+            await self.close()
+
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{__version__}"},
+                trace_configs=[self._trace_config()],
+            )
+            self._should_reset_connector = False
+
+        return self._session
+
+    async def make_request(self, bot, method, timeout=None):
+        session = await self.create_session()
+
+        url = self.api.api_url(token=bot.token, method=method.__api_method__)
+        form = self.build_form_data(bot=bot, method=method)
+
+        try:
+            async with session.post(url, data=form, timeout=self._timeout(timeout)) as resp:
+                raw_result = await resp.text()
+        except asyncio.TimeoutError:
+            raise TelegramNetworkError(method=method, message="Request timeout error")
+        except ClientError as e:
+            raise TelegramNetworkError(method=method, message=f"{type(e).__name__}: {e}")
+        response = self.check_response(bot=bot, method=method, status_code=resp.status, content=raw_result)
+        return response.result
+
+    def bot(self, token, **kwargs):
+        """Shu hovuzdan foydalanadigan Bot (bir nechta token uchun)"""
+        return Bot(token=token, session=self, **kwargs)
+
+    def stats(self):
+        """Hovuz holati (/health uchun)"""
+        reused = self.connections_reused
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connections_reused": reused,
+            "reuse_ratio": round(reused / max(1, reused + self.connections_opened), 3),
+            "dns_hits": self.dns_hits,
+            "dns_misses": self.dns_misses,
+        }
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from snapshot import save_snapshot
+
+log = logging.getLogger(__name__)
+
+
+class EventJournal:
+    """Ombor o'zgarishlarining faqat qo'shiladigan jurnali (JSON Lines).
+
+    Har bir o'zgarish (murojaat yaratildi, qabul/rad/yakun/bekor qilindi,
+    xabar qo'shildi, ...) tartib raqami (seq) bilan bitta qatorda yoziladi va
+    darhol OS ga beriladi - jarayon qulasa ham yo'qolmaydi. Snapshot olinganda
+    joriy fayl `<path>.1` ga ko'chiriladi (rotate) va snapshot yozilgach
+    o'chiriladi (drop_rotated), shuning uchun tiklashda faqat oxirgi
+    snapshotdan keyingi "dum" qayta o'qiladi.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rotated_path = f"{path}.1"
+        self.seq = 0
+        self.appended = 0
+        self.snapshot_seq = 0
+        self._file = None
+
+    def read(self, after=0):
+        """seq > after bo'lgan hodisalar (avval rotate qilingan fayl, keyin joriy).
+
+        Oxirgi qator chala yozilgan bo'lishi mumkin (jarayon qulagan) - u tashlanadi.
+        """
+        events = []
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        # seq birinchi maydon: keraksiz qatorlar to'liq JSON sifatida o'qilmaydi
+                        if int(line[8:line.index(b",", 8)]) <= after:
+                            continue
+                        event = json.loads(line)
+                    except ValueError:
+                        log.warning("Jurnalda buzilgan qator tashlandi: %s", path)
+                        break
+                    events.append(event)
+        return events
+
+    def open(self, seq):
+        """Yozish uchun ochish. seq - oxirgi qo'llangan hodisa raqami"""
+        self.seq = self.snapshot_seq = seq
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, event, **fields):
+        self.seq += 1
+        self._file.write(json.dumps({"seq": self.seq, "e": event, **fields}, ensure_ascii=False) + "\n")
+        # Bufer emas, OS ga: jarayon qulasa ham hodisa faylda qoladi
+        self._file.flush()
+        self.appended += 1
+        return self.seq
+
+    def rotate(self):
+        """Snapshotdan oldin: joriy faylni .1 ga o'tkazib, yangisini boshlash"""
+        self._file.close()
+        if os.path.exists(self.rotated_path):
+            # Oldingi snapshot yozilmagan - uning hodisalari ham kerak, qo'shib qo'yamiz
+            with open(self.rotated_path, "ab") as dst, open(self.path, "rb") as src:
+                dst.write(src.read())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def drop_rotated(self, seq):
+        """Snapshot (seq gacha) yozildi - eski hodisalar endi kerak emas"""
+        self.snapshot_seq = seq
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def stats(self):
+        return {
+            "seq": self.seq,
+            "appended": self.appended,
+            "since_snapshot": self.seq - self.snapshot_seq,
+        }
+
+
+class SnapshotManager:
+    """Ombor holatini snapshot faylga yozish (jurnalni siqish).
+
+    Jurnal bo'lsa, fon rejimida har `interval` sekundda (yangi hodisa bo'lsa)
+    yoki `max_events` ta hodisa yig'ilganda snapshot olinadi - tiklashda qayta
+    o'qiladigan dum shu bilan chegaralanadi. Holat event loop ichida bir
+    lahzada olinadi, siqish va yozish esa alohida thread'da.
+    """
+
+    def __init__(self, store, path, journal=None, interval=600, max_events=50000, check_interval=5):
+        self.store = store
+        self.path = path
+        self.journal = journal
+        self.interval = interval
+        self.max_events = max_events
+        self.check_interval = check_interval
+        self.snapshots = 0
+        self.errors = 0
+        self.last_size = 0
+        self.last_duration = 0.0
+        self._last_at = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def start(self):
+        if self.journal and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def due(self):
+        pending = self.journal.seq - self.journal.snapshot_seq
+        if self.max_events and pending >= self.max_events:
+            return True
+        return pending > 0 and self.interval > 0 and time.monotonic() - self._last_at >= self.interval
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            if not self.due():
+                continue
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                log.exception("Snapshot: %s", e)
+
+    async def run_once(self, **extra):
+        """Snapshot olish. extra - qo'shimcha holat (masalan, yuborilmagan xabarlar)"""
+        async with self._lock:
+            start = time.perf_counter()
+            state = {"store": self.store.snapshot(), **extra}
+            if self.journal:
+                self.journal.rotate()
+            loop = asyncio.get_running_loop()
+            self.last_size = await loop.run_in_executor(None, save_snapshot, self.path, state)
+            if self.journal:
+                self.journal.drop_rotated(state["store"]["seq"])
+            self._last_at = time.monotonic()
+            self.last_duration = time.perf_counter() - start
+            self.snapshots += 1
+
+    def stats(self):
+        return {
+            "snapshots": self.snapshots,
+            "errors": self.errors,
+            "last_size": self.last_size,
+            "last_ms": round(self.last_duration * 1000),
+            **(self.journal.stats() if self.journal else {}),
+        }
@@ -0,0 +1,132 @@
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
+from callbacks import pack, FACULTY, TYUTOR, CANCEL, GO_BACK
+from roster import faculty_key
+
+BACK_TEXT = "🔙 Orqaga qaytish"
+
+# ===== O'ZGARMAS KLAVIATURALAR =====
+
+ADMIN_MENU_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[[
+        KeyboardButton(text="📊 Statistika"),
+        KeyboardButton(text="👥 Tyutorlarni ko'rish"),
+        KeyboardButton(text="➕ Tyutor qo'shish"),
+        KeyboardButton(text="✏️ Tyutor tahrirlash"),
+    ], [
+        KeyboardButton(text="📦 Arxiv eksport"),
+    ]],
+    resize_keyboard=True
+)
+
+CONTACT_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[[
+        KeyboardButton(text="📱 Telefon raqamni yuborish", request_contact=True)
+    ]],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
+
+EDIT_TYUTOR_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[[
+        KeyboardButton(text="👤 Ismni o'zgaritirish"),
+        KeyboardButton(text="🆔 ID sini o'zgaritirish"),
+        KeyboardButton(text="❌ Bekor qilish")
+    ]],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
+
+CANCEL_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[[KeyboardButton(text="❌ Bekor qilish")]],
+    resize_keyboard=True
+)
+
+
+class KeyboardCache:
+    """Fakultet va tyutor tanlash klaviaturalari keshi.
+
+    Klaviaturalar ro'yxat (roster) versiyasi uchun bir marta quriladi va
+    keyin qayta ishlatiladi. Ro'yxat o'zgarsa (versiya oshsa), kesh
+    tozalanadi. Qaytarilgan obyektlarni o'zgartirmaslik kerak.
+    """
+
+    def __init__(self, roster):
+        self.roster = roster
+        self._version = None
+        self._cache = {}
+        self.hits = 0
+        self.builds = 0
+
+    def _get(self, key, build):
+        if self._version != self.roster.version:
+            self._cache = {}
+            self._version = self.roster.version
+        keyboard = self._cache.get(key)
+        if keyboard is None:
+            keyboard = self._cache[key] = build()
+            self.builds += 1
+        else:
+            self.hits += 1
+        return keyboard
+
+    def faculty_picker(self):
+        """Talaba uchun fakultetlar (inline)"""
+        return self._get("faculty_picker", self._build_faculty_picker)
+
+    def tutor_picker(self, faculty):
+        """Talaba uchun fakultet tyutorlari (inline)"""
+        return self._get(("tutor_picker", faculty), lambda: self._build_tutor_picker(faculty))
+
+    def admin_faculty_picker(self):
+        """Admin uchun fakultetlar (reply)"""
+        return self._get("admin_faculty_picker", self._build_admin_faculty_picker)
+
+    def admin_tutor_picker(self, faculty):
+        """Admin uchun fakultet tyutorlari (reply)"""
+        return self._get(("admin_tutor_picker", faculty), lambda: self._build_admin_tutor_picker(faculty))
+
+    # ===== QURISH =====
+
+    def _build_faculty_picker(self):
+        keyboards = []
+        for faculty in self.roster.faculties.keys():
+            keyboards.append([InlineKeyboardButton(text=faculty, callback_data=pack(FACULTY, faculty_key(faculty)))])
+
+        keyboards.append([InlineKeyboardButton(text="❌ Bekor qilish", callback_data=pack(CANCEL))])
+        return InlineKeyboardMarkup(inline_keyboard=keyboards)
+
+    def _build_tutor_picker(self, faculty):
+        keyboards = []
+        for Tyutor in self.roster.faculties.get(faculty, []):
+            keyboards.append([
+                InlineKeyboardButton(
+                    text=f"👨‍🏫 {Tyutor['name']}",
+                    callback_data=pack(TYUTOR, Tyutor['chat_id'])
+                )
+            ])
+
+        keyboards.append([InlineKeyboardButton(text="🔙 Orqaga", callback_data=pack(GO_BACK))])
+        return InlineKeyboardMarkup(inline_keyboard=keyboards)
+
+    def _build_admin_faculty_picker(self):
+        keyboard_buttons = []
+        for faculty in self.roster.faculties.keys():
+            keyboard_buttons.append([KeyboardButton(text=faculty)])
+
+        keyboard_buttons.append([KeyboardButton(text=BACK_TEXT)])
+        return ReplyKeyboardMarkup(
+            keyboard=keyboard_buttons,
+            resize_keyboard=True,
+            one_time_keyboard=True
+        )
+
+    def _build_admin_tutor_picker(self, faculty):
+        keyboard_buttons = []
+        for Tyutor in self.roster.faculties.get(faculty, []):
+            keyboard_buttons.append([KeyboardButton(text=f"{Tyutor['name']} ({Tyutor['chat_id']})")])
+
+        keyboard_buttons.append([KeyboardButton(text=BACK_TEXT)])
+        return ReplyKeyboardMarkup(
+            keyboard=keyboard_buttons,
+            resize_keyboard=True
+        )
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class ArchiveManager:
+    """Yopilgan eski murojaatlarni fon rejimida arxivga ko'chirish.
+
+    Har `interval` sekundda `max_age` sekunddan beri o'zgarmagan
+    finished/rejected/cancelled murojaatlar store.archive_closed() orqali
+    xotiradan siqilgan arxiv jadvaliga o'tkaziladi. Shunda xotiradagi
+    ishchi to'plam faqat ochiq ishlarga mutanosib bo'lib qoladi.
+    """
+
+    def __init__(self, store, max_age, interval=3600, batch_size=1000):
+        self.store = store
+        self.max_age = max_age
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archived = 0
+        self.errors = 0
+        self._task = None
+
+    def start(self):
+        if self.interval > 0 and self.max_age > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                log.exception("Arxivlash: %s", e)
+
+    async def run_once(self):
+        """Barcha mos murojaatlarni batch_size bo'lib ko'chirish"""
+        total = 0
+        while True:
+            moved = await self.store.archive_closed(self.max_age, limit=self.batch_size)
+            total += moved
+            if moved < self.batch_size:
+                break
+            # Katta to'plamda handlerlarga navbat beramiz
+            await asyncio.sleep(0)
+        if total:
+            self.archived += total
+            log.info("%d ta yopilgan murojaat arxivga ko'chirildi (xotirada: %d)", total, len(self.store.requests))
+        return total
+
+    def stats(self):
+        return {
+            "hot": len(self.store.requests),
+            "archived": self.archived,
+            "errors": self.errors,
+        }
@@ -0,0 +1,142 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from contextvars import ContextVar
+from aiogram import BaseMiddleware
+
+# Joriy update haqida ma'lumot (update_id, user_id, handler, request_id)
+log_context = ContextVar("log_context", default={})
+
+# logging.LogRecord ning o'z atributlari - qolganlari extra={} dan kelgan
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def bind(**fields):
+    """Joriy kontekstga maydon qo'shish (faqat shu update/vazifa uchun amal qiladi)"""
+    log_context.set({**log_context.get(), **fields})
+
+
+def _extra(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class ContextFilter(logging.Filter):
+    """Kontekst maydonlarini yozuvga yozish paytida (handler ichida) nusxalash.
+
+    Yozuvlar navbat orqali boshqa thread'da formatlanadi, u yerda
+    ContextVar qiymati yo'q, shuning uchun bu filtr QueueHandler'da turadi.
+    """
+
+    def filter(self, record):
+        for key, value in log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """DEBUG yozuvlaridan har bir xabar shabloni uchun faqat har `rate`-chisini o'tkazish"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = max(1, rate)
+        self._counts = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate == 1:
+            return True
+        key = (record.name, record.msg)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % self.rate:
+            return False
+        record.sampled = self.rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Bir qatorli JSON yozuv"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """O'qish uchun qulay matn: vaqt, daraja, xabar va maydonlar"""
+
+    def format(self, record):
+        text = f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} {record.getMessage()}"
+        fields = _extra(record)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+def setup_logging(level="INFO", fmt="json", debug_sample=1, stream=None):
+    """Root logger'ni navbatli (bloklamaydigan) handler bilan sozlash.
+
+    Handlerlar faqat yozuvni navbatga qo'yadi, stdout'ga esa alohida
+    thread (QueueListener) yozadi. Listener qaytariladi.
+    """
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(debug_sample))
+    queue_handler.addFilter(ContextFilter())
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    # Kutubxonalarning shovqinli DEBUG yozuvlari
+    for name in ("aiogram.event", "aiohttp.access"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """Update (outer) va handler (inner) ma'lumotlarini log kontekstiga qo'yish.
+
+    dp.update.outer_middleware ga qo'yilganda update_id va user_id,
+    dp.message / dp.callback_query ga qo'yilganda handler nomi yoziladi.
+    """
+
+    def __init__(self, name_of=None):
+        self.name_of = name_of
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        if handler_object is not None:
+            if self.name_of:
+                name = self.name_of(handler_object, event)
+            else:
+                name = getattr(handler_object.callback, "__name__", "unknown")
+            bind(handler=name)
+        else:
+            user = data.get("event_from_user")
+            context = {"update_id": getattr(event, "update_id", None)}
+            if user is not None:
+                context["user_id"] = user.id
+            # Har bir update yangi kontekst bilan boshlanadi
+            log_context.set(context)
+        return await handler(event, data)
@@ -0,0 +1,182 @@
+import logging
+import time
+from bisect import bisect_left
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+log = logging.getLogger(__name__)
+
+# Sekundlarda, barcha gistogrammalar uchun bitta o'zgarmas to'plam
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """O'zgarmas bucket'li gistogramma.
+
+    Hammasi bitta event loop thread'ida o'zgaradi, shuning uchun lock kerak emas.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # oxirgisi: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Gistogrammalar, hisoblagichlar va gauge'lar ro'yxati (Prometheus formatida chiqaradi)"""
+
+    def __init__(self, prefix="tyutor_bot", buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._histograms = {}  # name -> {labels: Histogram}
+        self._counters = {}    # name -> {labels: int}
+        self._gauges = {}      # name -> (turi, callable)
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def observe(self, name, labels, value):
+        series = self._histograms.setdefault(name, {})
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def inc(self, name, labels=(), value=1):
+        series = self._counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + value
+
+    def gauge(self, name, func, text=None):
+        """Qiymati har so'rovda func() dan olinadigan gauge"""
+        self._gauges[name] = ("gauge", func)
+        if text:
+            self.describe(name, text)
+
+    def counter(self, name, func, text=None):
+        """Boshqa obyekt o'zi sanaydigan hisoblagich (qiymati func() dan)"""
+        self._gauges[name] = ("counter", func)
+        if text:
+            self.describe(name, text)
+
+    def render(self):
+        lines = []
+        for name, series in self._histograms.items():
+            full = f"{self.prefix}_{name}"
+            self._header(lines, name, full, "histogram")
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{full}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{full}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{full}_sum{_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{full}_count{_labels(labels)} {histogram.count}")
+        for name, series in self._counters.items():
+            full = f"{self.prefix}_{name}"
+            self._header(lines, name, full, "counter")
+            for labels, value in series.items():
+                lines.append(f"{full}{_labels(labels)} {value}")
+        for name, (kind, func) in self._gauges.items():
+            full = f"{self.prefix}_{name}"
+            self._header(lines, name, full, kind)
+            try:
+                lines.append(f"{full} {func()}")
+            except Exception as e:
+                log.warning("Gauge %s o'qilmadi: %s", name, e)
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, name, full, kind):
+        if name in self._help:
+            lines.append(f"# HELP {full} {self._help[name]}")
+        lines.append(f"# TYPE {full} {kind}")
+
+
+# ===== MIDDLEWARE'LAR =====
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer middleware (dp.update): update turi bo'yicha kechikish va xatolar"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        metrics.describe("update_seconds", "Update qayta ishlash vaqti (turi bo'yicha)")
+        metrics.describe("update_errors_total", "Xato bilan tugagan update'lar")
+
+    async def __call__(self, handler, event, data):
+        labels = (("type", event.event_type),)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.inc("update_errors_total", labels)
+            raise
+        finally:
+            self.metrics.observe("update_seconds", labels, time.perf_counter() - start)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware (dp.message, dp.callback_query, ...): handler bo'yicha kechikish va xatolar.
+
+    name_of(handler_object, event) berilsa, handler nomini o'zi aniqlaydi
+    (masalan, CallbackRouter ichidagi haqiqiy handler uchun).
+    """
+
+    def __init__(self, metrics, name_of=None):
+        self.metrics = metrics
+        self.name_of = name_of
+        metrics.describe("handler_seconds", "Handler bajarilish vaqti")
+        metrics.describe("handler_errors_total", "Xato bilan tugagan handler chaqiruvlari")
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        if self.name_of:
+            name = self.name_of(handler_object, event)
+        else:
+            name = getattr(handler_object.callback, "__name__", "unknown") if handler_object else "unknown"
+        labels = (("handler", name),)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.inc("handler_errors_total", labels)
+            raise
+        finally:
+            self.metrics.observe("handler_seconds", labels, time.perf_counter() - start)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Bot session middleware: Bot API chaqiruvlari kechikishi va xatolari"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        metrics.describe("api_seconds", "Bot API so'rovi vaqti (metod bo'yicha)")
+        metrics.describe("api_errors_total", "Xato bilan tugagan Bot API so'rovlari")
+
+    async def __call__(self, make_request, bot, method):
+        labels = (("method", method.__api_method__),)
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            self.metrics.inc("api_errors_total", labels + (("error", type(e).__name__),))
+            raise
+        finally:
+            self.metrics.observe("api_seconds", labels, time.perf_counter() - start)
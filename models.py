@@ -0,0 +1,131 @@
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from enum import IntEnum
+
+
+class Status(IntEnum):
+    """Murojaat holati. Bazada va statistikada nomi (pending, ...) bilan yoziladi"""
+    PENDING = 1
+    ACCEPTED = 2
+    FINISHED = 3
+    REJECTED = 4
+    CANCELLED = 5
+
+    @property
+    def closed(self):
+        return self in CLOSED_STATUSES
+
+    @property
+    def label(self):
+        return self.name.lower()
+
+    @classmethod
+    def parse(cls, value):
+        if isinstance(value, str):
+            return cls[value.upper()]
+        return cls(value)
+
+    def __str__(self):
+        return self.label
+
+    def __format__(self, spec):
+        return format(self.label, spec)
+
+
+CLOSED_STATUSES = frozenset((Status.FINISHED, Status.REJECTED, Status.CANCELLED))
+
+
+def to_epoch(value):
+    """ISO satr (eski yozuvlar) yoki son -> epoch sekund (int)"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        if value.isdigit():
+            return int(value)
+        try:
+            return int(datetime.fromisoformat(value).timestamp())
+        except ValueError:
+            return 0
+    return int(value)
+
+
+def intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(slots=True)
+class Request:
+    id: int
+    student_id: int
+    Tyutor_id: int
+    faculty: str
+    text: str
+    student_name: str = None
+    student_phone: str = None
+    status: Status = Status.PENDING
+    created_at: int = 0
+    updated_at: int = 0
+    message_count: int = 0
+
+    def __post_init__(self):
+        # Fakultet va ismlar ko'p takrorlanadi - bitta nusxada saqlaymiz
+        self.faculty = intern(self.faculty)
+        self.student_name = intern(self.student_name)
+        if not self.created_at:
+            self.created_at = int(time.time())
+        if not self.updated_at:
+            self.updated_at = self.created_at
+
+    def touch(self):
+        self.updated_at = int(time.time())
+
+    def to_dict(self):
+        """Bazadagi JSON (data ustuni) uchun"""
+        return {
+            "student_id": self.student_id,
+            "student_name": self.student_name,
+            "student_phone": self.student_phone,
+            "Tyutor_id": self.Tyutor_id,
+            "faculty": self.faculty,
+            "text": self.text,
+            "status": self.status.label,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "message_count": self.message_count,
+        }
+
+    @classmethod
+    def from_dict(cls, request_id, data):
+        return cls(
+            id=request_id,
+            student_id=data["student_id"],
+            Tyutor_id=data.get("Tyutor_id"),
+            faculty=data.get("faculty"),
+            text=data.get("text"),
+            student_name=data.get("student_name"),
+            student_phone=data.get("student_phone"),
+            status=Status.parse(data["status"]),
+            created_at=to_epoch(data.get("created_at")),
+            updated_at=to_epoch(data.get("updated_at")),
+            message_count=data.get("message_count", 0),
+        )
+
+
+@dataclass(slots=True)
+class Student:
+    name: str = None
+    phone: str = None
+
+
+@dataclass(slots=True)
+class Message:
+    sender: str
+    text: str
+    time: int = 0
+
+    def __post_init__(self):
+        self.sender = intern(self.sender)
+        if not self.time:
+            self.time = int(time.time())
@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from aiogram import methods
+from aiogram.client.default import Default
+from aiogram.methods import SendMessage
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+log = logging.getLogger(__name__)
+
+# Qayta urinib ko'rish mumkin bo'lgan (vaqtinchalik) xatolar
+TRANSIENT_ERRORS = (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError, OSError)
+
+
+class TokenBucket:
+    """Token bucket: sekundiga `rate` ta, bir martada ko'pi bilan `capacity` ta"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now=None):
+        """Keyingi token uchun necha sekund kutish kerak (0 - hozir bor)"""
+        now = now or time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now=None):
+        """Token olish. Token bo'lmasa False qaytaradi"""
+        now = now or time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class _Job:
+    __slots__ = ("method", "future", "attempts", "queued_at")
+
+    def __init__(self, method, future):
+        self.method = method
+        self.future = future
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+
+
+class Outbox:
+    """Chiquvchi xabarlar navbati.
+
+    Umumiy va har bir chat uchun alohida token bucket bilan Telegram
+    limitlariga rioya qiladi, RetryAfter (429) da kutadi, tarmoq xatolarida
+    eksponensial kechikish bilan qayta urinadi, qaytarib bo'lmaydigan
+    xatolarni esa dead-letter ro'yxatiga yozadi. Bir chatga xabarlar
+    yuborilish tartibida yetkaziladi.
+    """
+
+    def __init__(self, bot, global_rate=30, chat_rate=1, chat_burst=3,
+                 workers=8, max_retries=5, max_backoff=30, dead_letter_size=1000):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.dead_letters = deque(maxlen=dead_letter_size)
+
+        self._chats = {}          # chat_id -> deque[_Job]
+        self._buckets = {}        # chat_id -> TokenBucket
+        self._ready = asyncio.Queue()
+        self._paused_until = 0.0
+        self._tasks = []
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.retry_after = 0
+        self._latencies = deque(maxlen=1000)
+
+    # ===== NAVBATGA QO'YISH =====
+
+    def submit(self, chat_id, method):
+        """Bot API metodini navbatga qo'yish. Natija uchun Future qaytaradi"""
+        future = asyncio.get_running_loop().create_future()
+        # Hech kim kutmasa ham "exception was never retrieved" chiqmasligi uchun
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = deque()
+            queue.append(_Job(method, future))
+            self._ready.put_nowait(chat_id)
+        else:
+            # Chat allaqachon navbatda - tartib saqlanadi
+            queue.append(_Job(method, future))
+        return future
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self.submit(chat_id, SendMessage(chat_id=chat_id, text=text, **kwargs))
+
+    def notify_on_failure(self, delivery, chat_id, text):
+        """Xabar yetkazilmasa, boshqa chatga ogohlantirish yuborish"""
+        def callback(future):
+            if not future.cancelled() and future.exception() is not None:
+                self.send_message(chat_id, text)
+        delivery.add_done_callback(callback)
+
+    def pending(self):
+        """Yuborilmagan xabarlar (snapshot uchun): [(chat_id, metod nomi, parametrlar), ...]"""
+        # Default(...) qiymatlari bot sozlamasidan olinadi - ularni saqlamaymiz
+        return [
+            (chat_id, type(job.method).__name__,
+             {key: value for key, value in job.method if value is not None and not isinstance(value, Default)})
+            for chat_id, queue in self._chats.items()
+            for job in queue
+        ]
+
+    def restore(self, items):
+        """pending() natijasini qayta navbatga qo'yish (chat ichidagi tartib saqlanadi)"""
+        restored = 0
+        for chat_id, name, params in items:
+            try:
+                self.submit(chat_id, getattr(methods, name)(**params))
+                restored += 1
+            except Exception as e:
+                log.warning("%s (%s) tiklanmadi: %s", name, chat_id, e)
+        if restored:
+            log.info("%d ta yuborilmagan xabar qayta navbatga qo'yildi", restored)
+        return restored
+
+    # ===== WORKERLAR =====
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        log.info("Chiquvchi xabarlar navbati: %d worker", self.workers)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self, timeout=None):
+        """Navbat bo'shashini kutish (timeout bo'lsa, qolganlar soni qaytadi)"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        while self._chats:
+            if deadline is not None and loop.time() >= deadline:
+                break
+            await asyncio.sleep(0.05)
+        return self.depth()
+
+    def _requeue(self, chat_id, delay=0.0):
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._ready.put_nowait, chat_id)
+        else:
+            self._ready.put_nowait(chat_id)
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            try:
+                await self._process(chat_id)
+            except Exception as e:
+                log.exception("Outbox worker: %s", e)
+                self._requeue(chat_id, 1.0)
+
+    async def _process(self, chat_id):
+        queue = self._chats.get(chat_id)
+        if not queue:
+            self._chats.pop(chat_id, None)
+            return
+
+        # Telegram 429 qaytargan bo'lsa, hamma yuborish to'xtatiladi
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        chat_wait = bucket.wait_time()
+        if chat_wait > 0:
+            # Bu chat kutadi, worker esa boshqa chatlarga o'tadi
+            self._requeue(chat_id, chat_wait)
+            return
+
+        while not self.global_bucket.take():
+            await asyncio.sleep(self.global_bucket.wait_time())
+        bucket.take()
+
+        job = queue[0]
+        try:
+            result = await self.bot(job.method)
+        except TelegramRetryAfter as e:
+            self.retry_after += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            self._requeue(chat_id, e.retry_after)
+            return
+        except TRANSIENT_ERRORS as e:
+            job.attempts += 1
+            if job.attempts <= self.max_retries:
+                self.retries += 1
+                delay = min(self.max_backoff, 0.5 * 2 ** job.attempts) * random.uniform(0.8, 1.2)
+                self._requeue(chat_id, delay)
+                return
+            self._dead_letter(chat_id, job, e)
+        except TelegramAPIError as e:
+            # Bot bloklangan, chat topilmadi va h.k. - qayta urinishdan foyda yo'q
+            self._dead_letter(chat_id, job, e)
+        else:
+            self.sent += 1
+            self._latencies.append(time.monotonic() - job.queued_at)
+            if not job.future.done():
+                job.future.set_result(result)
+
+        queue.popleft()
+        if queue:
+            self._requeue(chat_id)
+        else:
+            del self._chats[chat_id]
+            if len(self._buckets) > 4096:
+                self._prune_buckets()
+
+    def _prune_buckets(self):
+        """To'lib qolgan (uzoq vaqt ishlatilmagan) chat bucketlarini o'chirish"""
+        now = time.monotonic()
+        for chat_id, bucket in list(self._buckets.items()):
+            if chat_id not in self._chats and bucket.wait_time(now) == 0 and bucket.tokens >= bucket.capacity:
+                del self._buckets[chat_id]
+
+    def _dead_letter(self, chat_id, job, error):
+        self.failed += 1
+        self.dead_letters.append({
+            "chat_id": chat_id,
+            "method": type(job.method).__name__,
+            "text": (getattr(job.method, "text", None) or "")[:100],
+            "error": str(error),
+            "attempts": job.attempts,
+            "time": time.time(),
+        })
+        log.error("%s ga xabar yetkazilmadi: %s", chat_id, error, extra={"chat_id": chat_id})
+        if not job.future.done():
+            job.future.set_exception(error)
+
+    # ===== METRIKALAR =====
+
+    def depth(self):
+        return sum(len(queue) for queue in self._chats.values())
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 4)
+
+        return {
+            "queue_depth": self.depth(),
+            "chats_waiting": len(self._chats),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "retry_after": self.retry_after,
+            "dead_letters": len(self.dead_letters),
+            "latency_p50": percentile(0.5),
+            "latency_p99": percentile(0.99),
+        }
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from aiogram.exceptions import TelegramConflictError, TelegramRetryAfter, TelegramUnauthorizedError
+from aiogram.methods import GetUpdates
+
+log = logging.getLogger(__name__)
+
+
+class Poller:
+    """getUpdates orqali update olish (webhook o'rniga).
+
+    Olingan update'lar tartib bilan handle(update) ga beriladi (u navbatga
+    qo'yadi). offset faqat keyingi getUpdates chaqiruvida Telegram'ga
+    tasdiqlanadi, shuning uchun jarayon to'satdan o'lsa, oxirgi to'plam
+    qayta keladi (takrorlarni dedup ushlaydi). stop() dan keyin confirm()
+    qayta ishlangan update'larni tasdiqlaydi.
+    """
+
+    def __init__(self, bot, handle, timeout=30, limit=100, allowed_updates=None, max_backoff=30):
+        self.bot = bot
+        self.handle = handle
+        self.timeout = timeout
+        self.limit = limit
+        self.allowed_updates = allowed_updates
+        self.max_backoff = max_backoff
+        self.offset = None
+        self.polls = 0
+        self.received = 0
+        self.errors = 0
+        self._stopping = False
+        self._fetch = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._loop())
+            log.info("Polling boshlandi (timeout %ds, limit %d)", self.timeout, self.limit)
+
+    async def _get_updates(self, timeout):
+        method = GetUpdates(offset=self.offset, limit=self.limit, timeout=timeout,
+                            allowed_updates=self.allowed_updates)
+        # Long polling: so'rov timeout'i kutish vaqtidan biroz uzunroq
+        return await self.bot(method, request_timeout=timeout + 10)
+
+    async def _loop(self):
+        backoff = 1
+        while not self._stopping:
+            self._fetch = asyncio.ensure_future(self._get_updates(self.timeout))
+            try:
+                updates = await self._fetch
+            except asyncio.CancelledError:
+                if self._stopping:
+                    break
+                raise
+            except TelegramRetryAfter as e:
+                log.warning("getUpdates: %ds kutish kerak", e.retry_after)
+                await asyncio.sleep(e.retry_after)
+                continue
+            except (TelegramUnauthorizedError, TelegramConflictError) as e:
+                # Token noto'g'ri yoki boshqa nusxa/webhook ishlayapti - sekin qayta urinamiz
+                self.errors += 1
+                log.error("getUpdates rad etildi: %s", e)
+                await asyncio.sleep(self.max_backoff)
+                continue
+            except Exception as e:
+                self.errors += 1
+                log.warning("getUpdates xatosi: %s, %ds dan keyin qayta", e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            finally:
+                self._fetch = None
+
+            backoff = 1
+            self.polls += 1
+            for update in updates:
+                self.offset = update.update_id + 1
+                self.received += 1
+                await self.handle(update)
+
+    async def stop(self):
+        """Yangi update olishni to'xtatish (navbatdagilar qayta ishlanishda davom etadi)"""
+        self._stopping = True
+        if self._fetch:
+            self._fetch.cancel()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def confirm(self):
+        """Qayta ishlangan update'larni Telegram'ga tasdiqlash (offset yuborish)"""
+        if self.offset is None:
+            return
+        try:
+            await self.bot(GetUpdates(offset=self.offset, limit=1, timeout=0), request_timeout=10)
+        except Exception as e:
+            log.warning("offset %d tasdiqlanmadi: %s", self.offset, e)
+
+    def stats(self):
+        """Polling holati (/health uchun)"""
+        return {
+            "offset": self.offset,
+            "polls": self.polls,
+            "received": self.received,
+            "errors": self.errors,
+        }
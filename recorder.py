@@ -0,0 +1,84 @@
+import asyncio
+import gzip
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class UpdateRecorder:
+    """Kelgan webhook update'larini vaqti bilan siqilgan JSONL faylga yozish.
+
+    Har qator: {"t": kelgan vaqt (epoch), "update": xom update JSON}.
+    record() faqat buferga qo'shadi, faylga esa fon thread'ida
+    flush_interval sekundda bir marta yoziladi. Har bir yozuv alohida gzip
+    a'zosi bo'lib qo'shiladi, shuning uchun fayl qayta ishga tushganda ham
+    davom ettiriladi. Faylda foydalanuvchilarning shaxsiy ma'lumotlari bor!
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self._buffer = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recorder")
+        self._task = None
+
+    def record(self, raw, arrived_at=None):
+        self._buffer.append(json.dumps(
+            {"t": arrived_at or time.time(), "update": raw}, ensure_ascii=False, separators=(",", ":")
+        ))
+        self.recorded += 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            log.info("Update'lar yozib olinmoqda: %s", self.path)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error("Update'lar yozilmadi: %s", e)
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._write, lines)
+        except Exception:
+            self._buffer[:0] = lines
+            raise
+
+    def _write(self, lines):
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        self._executor.shutdown()
+
+
+def read_records(path):
+    """Yozib olingan (vaqt, update) juftliklari, fayldagi tartibda"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # To'xtatilgan jarayondan qolgan yarim qator
+                    continue
+                yield entry["t"], entry["update"]
+        except (EOFError, gzip.BadGzipFile) as e:
+            log.warning("%s oxiri buzilgan, qolgani o'tkazib yuborildi: %s", path, e)
@@ -0,0 +1,82 @@
+import zlib
+
+
+def faculty_key(faculty):
+    """Fakultet nomidan qisqa va barqaror kalit (callback_data uchun)"""
+    return zlib.crc32(faculty.encode("utf-8"))
+
+
+class Roster:
+    """Fakultetlar va tyutorlar ro'yxati.
+
+    chat_id -> (tyutor, fakultet) indeksi saqlanadi, shuning uchun tyutorni
+    topish butun ro'yxatni aylanib chiqmasdan O(1) da bajariladi. Ro'yxat
+    faqat shu klass metodlari orqali o'zgartirilishi kerak.
+    """
+
+    def __init__(self, faculties=None):
+        self.faculties = {}
+        self.by_chat_id = {}
+        self.by_faculty_key = {}
+        self.version = 0
+        self.replace(faculties or {})
+
+    def replace(self, faculties):
+        """Butun ro'yxatni almashtirish va indeksni qayta qurish"""
+        index = {}
+        for faculty, tutors in faculties.items():
+            for tutor in tutors:
+                # Bir xil ID ikki marta bo'lsa, birinchisi hisobga olinadi
+                index.setdefault(tutor['chat_id'], (tutor, faculty))
+        self.faculties = faculties
+        self.by_chat_id = index
+        self.by_faculty_key = {faculty_key(faculty): faculty for faculty in faculties}
+        self.version += 1
+
+    def _reindex(self):
+        self.replace(self.faculties)
+
+    # ===== QIDIRISH =====
+
+    def find(self, chat_id):
+        """(tyutor, fakultet) yoki None"""
+        return self.by_chat_id.get(chat_id)
+
+    def faculty_by_key(self, key):
+        return self.by_faculty_key.get(key)
+
+    def is_tutor(self, chat_id):
+        return chat_id in self.by_chat_id
+
+    def tutor_name(self, chat_id, default=None):
+        found = self.by_chat_id.get(chat_id)
+        return found[0]['name'] if found else default
+
+    def total_tutors(self):
+        return sum(len(tutors) for tutors in self.faculties.values())
+
+    # ===== O'ZGARTIRISH =====
+
+    def add_tutor(self, faculty, name, chat_id):
+        tutor = {"name": name, "chat_id": chat_id}
+        self.faculties[faculty].append(tutor)
+        self.by_chat_id.setdefault(chat_id, (tutor, faculty))
+        self.version += 1
+        return tutor
+
+    def rename_tutor(self, chat_id, new_name):
+        found = self.by_chat_id.get(chat_id)
+        if found is None:
+            raise KeyError(chat_id)
+        found[0]['name'] = new_name
+        self.version += 1
+        return found[0]
+
+    def change_tutor_id(self, chat_id, new_id):
+        found = self.by_chat_id.get(chat_id)
+        if found is None:
+            raise KeyError(chat_id)
+        found[0]['chat_id'] = new_id
+        # Eski ID boshqa tyutorga ham tegishli bo'lishi mumkin, shuning uchun to'liq qayta quramiz
+        self._reindex()
+        return found[0]
@@ -0,0 +1,42 @@
+import logging
+import os
+import pickle
+import time
+import zlib
+from config_store import atomic_write
+
+log = logging.getLogger(__name__)
+
+# Format o'zgarsa oshiriladi - eski snapshot e'tiborsiz qoldiriladi
+SNAPSHOT_MAGIC = b"TYSNAP1\n"
+
+
+def save_snapshot(path, state):
+    """Holatni siqilgan pickle sifatida atomik yozish. Yozilgan baytlar soni qaytadi"""
+    start = time.perf_counter()
+    data = SNAPSHOT_MAGIC + zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+    atomic_write(path, data)
+    log.info("Snapshot yozildi: %s (%.1f KB, %.0f ms)", path, len(data) / 1024, (time.perf_counter() - start) * 1000)
+    return len(data)
+
+
+def load_snapshot(path, remove=True):
+    """Snapshotni o'qish (bo'lmasa yoki buzilgan bo'lsa None).
+
+    remove=True bo'lsa fayl o'qilgandan keyin o'chiriladi: undagi
+    yuborilmagan xabarlar ikkinchi marta tiklanmasligi uchun.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(SNAPSHOT_MAGIC):
+            raise ValueError("noma'lum format")
+        state = pickle.loads(zlib.decompress(data[len(SNAPSHOT_MAGIC):]))
+    except Exception as e:
+        log.warning("Snapshot o'qilmadi (%s): %s", path, e)
+        state = None
+    if remove:
+        os.remove(path)
+    return state
@@ -0,0 +1,843 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from models import Request, Student, Message, Status, to_epoch
+from config_store import file_signature
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER NOT NULL,
+    tutor_id INTEGER,
+    faculty TEXT,
+    status TEXT NOT NULL,
+    created_at INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_requests_tutor ON requests (tutor_id, status);
+CREATE INDEX IF NOT EXISTS idx_requests_student ON requests (student_id);
+CREATE INDEX IF NOT EXISTS idx_requests_faculty ON requests (faculty, status);
+CREATE INDEX IF NOT EXISTS idx_requests_status ON requests (status);
+
+-- Suxbat xabarlari: faqat qo'shiladi, o'zgartirilmaydi
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id INTEGER NOT NULL,
+    sender TEXT NOT NULL,
+    text TEXT,
+    time INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_messages_request ON messages (request_id, id);
+
+-- Yopilgan eski murojaatlar: data ustuni zlib bilan siqilgan JSON
+CREATE TABLE IF NOT EXISTS archive (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER NOT NULL,
+    tutor_id INTEGER,
+    faculty TEXT,
+    status TEXT NOT NULL,
+    created_at INTEGER,
+    archived_at INTEGER,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archive_student ON archive (student_id);
+CREATE INDEX IF NOT EXISTS idx_archive_tutor ON archive (tutor_id);
+
+-- Klaster rejimida: qaysi jarayon qaysi murojaatni o'zgartirgani (boshqalar sync() qiladi)
+CREATE TABLE IF NOT EXISTS changes (
+    rev INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id INTEGER NOT NULL,
+    writer INTEGER NOT NULL,
+    time INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS students (
+    user_id INTEGER PRIMARY KEY,
+    name TEXT,
+    phone TEXT
+);
+
+-- journal_seq: hodisalar jurnalining bazaga to'liq yozilgan oxirgi raqami
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+# Tyutor panelida statuslar tartibi (kutilayotganlar birinchi)
+PANEL_STATUS_ORDER = (Status.PENDING, Status.ACCEPTED, Status.FINISHED, Status.REJECTED, Status.CANCELLED)
+
+# So'rovlarda ruxsat etilgan filtrlar -> ustun nomlari
+REQUEST_FILTERS = {
+    "tutor_id": "tutor_id",
+    "student_id": "student_id",
+    "faculty": "faculty",
+    "status": "status",
+}
+
+
+def merge_delta(data, status, messages, updated_at):
+    """Bir jarayondagi o'zgarishni (status, qo'shilgan xabarlar soni) boshqa holat ustiga qo'llash"""
+    if status:
+        data["status"] = status
+    data["message_count"] = data.get("message_count", 0) + messages
+    data["updated_at"] = max(to_epoch(data.get("updated_at")), updated_at)
+    return data
+
+
+class RequestStore:
+    """Murojaatlar va talabalar ombori (SQLite, WAL rejimi).
+
+    Ishchi ma'lumotlar xotirada saqlanadi, o'zgarishlar esa "dirty" deb
+    belgilanib, alohida thread'da bitta tranzaksiya bilan guruhlab yoziladi.
+    Shuning uchun handlerlar diskni kutib qolmaydi.
+
+    Suxbat xabarlari alohida `messages` jadvaliga qo'shib boriladi. Xotirada
+    har bir murojaatning faqat oxirgi `tail_size` ta xabari turadi, eskilari
+    kerak bo'lganda diskdan sahifalab o'qiladi.
+
+    Yopilgan (finished, rejected, cancelled) eski murojaatlar archive_closed()
+    orqali siqilgan `archive` jadvaliga ko'chiriladi va xotiradan chiqadi.
+    Ular lookup() va export_archive() orqali o'qiladi, statistikada esa
+    hisobga olinishda davom etadi.
+
+    Bitta bazani bir nechta jarayon ishlatsa (nodes > 1), har biri o'z
+    yozuvlarini `changes` jadvaliga qayd qiladi, boshqalarning o'zgarishlarini
+    esa sync() bilan xotirasiga oladi. ID lar to'qnashmasligi uchun har bir
+    jarayon faqat id % nodes == node bo'lgan ID larni beradi.
+
+    journal (journal.EventJournal) berilsa, har bir o'zgarish darhol jurnalga
+    ham yoziladi. Jarayon qulasa, open() oxirgi snapshot (yoki baza) ustiga
+    jurnalning qolgan qismini qayta qo'llaydi - guruhlab yozishdan oldin
+    yo'qolgan o'zgarishlar ham tiklanadi.
+    """
+
+    def __init__(self, path, flush_interval=0.2, batch_size=200, tail_size=5, node=0, nodes=1, journal=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.tail_size = tail_size
+        self.node = node
+        self.nodes = max(1, nodes)
+        self.shared = self.nodes > 1
+        self.journal = None if self.shared else journal
+        self.replayed = 0
+        self._flushed_seq = 0
+        self._rev = 0
+        self._pruned_at = 0
+        self.synced = 0
+        self.requests = {}
+        self.students = {}
+        # request_id -> oxirgi xabarlar (deque, eng yangisi oxirida)
+        self.message_tails = {}
+        # tutor_id -> status -> {request_id: None} (qo'shilish tartibida)
+        self.by_tutor = {}
+        # Statistika: fakultet / tyutor / status bo'yicha hisoblagichlar
+        self.stats_by_faculty = {}
+        self.stats_by_tutor = {}
+        self.stats_by_status = {}
+        self._dirty_requests = set()
+        self._dirty_students = set()
+        self._pending_messages = []
+        # Klaster: request_id -> [yangi status yoki None, qo'shilgan xabarlar soni]
+        self._deltas = {}
+        self._created = set()
+        self._last_id = 0
+        self._conn = None
+        # SQLite ulanishi faqat shu bitta thread'dan ishlatiladi
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
+        self._wakeup = None
+        self._flush_task = None
+        self._flush_lock = None
+        self._closing = False
+
+    # ===== OCHISH / YUKLASH =====
+
+    def open(self, snapshot=None):
+        """Bazani ochish va ma'lumotlarni xotiraga yuklash.
+
+        snapshot (self.snapshot() natijasi) berilsa va baza undan keyin
+        o'zgarmagan bo'lsa, ma'lumotlar bazadan emas, snapshotdan olinadi.
+        Jurnal bo'lsa, snapshot (yoki baza) holatidan keyingi hodisalar
+        qayta qo'llanadi.
+        """
+        usable = self._snapshot_usable(snapshot)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        journal, self.journal = self.journal, None
+        events = []
+        if journal is not None:
+            self._flushed_seq = db_seq = self._conn.execute(
+                "SELECT COALESCE(MAX(value), 0) FROM meta WHERE key = 'journal_seq'"
+            ).fetchone()[0]
+            # Snapshotdan keyin bazaga yozilganlarning hammasi jurnalda bo'lishi kerak
+            if usable and snapshot.get("flushed", 0) <= db_seq:
+                events = journal.read(snapshot["seq"])
+                usable = max([snapshot["seq"]] + [event["seq"] for event in events[-1:]]) >= db_seq
+            else:
+                usable = False
+            if not usable:
+                events = journal.read(db_seq)
+            base = snapshot["seq"] if usable else db_seq
+            if events and events[0]["seq"] != base + 1:
+                log.warning("Jurnalda %d..%d hodisalar yo'q", base + 1, events[0]["seq"] - 1)
+
+        if usable:
+            self._restore(snapshot)
+            if journal is not None and db_seq >= snapshot["seq"]:
+                # Snapshotdan keyingi yozuv uning yozilmagan o'zgarishlarini ham olib ketgan
+                self._dirty_requests, self._dirty_students, self._pending_messages = set(), set(), []
+        else:
+            self._load()
+        if self.shared:
+            self._rev = self._conn.execute("SELECT COALESCE(MAX(rev), 0) FROM changes").fetchone()[0]
+        if journal is not None:
+            self._replay(events, db_seq)
+            journal.open(max([base, db_seq] + [event["seq"] for event in events[-1:]]))
+            self.journal = journal
+
+        log.info("Ombor yuklandi: %s (%d murojaat, %d talaba%s%s)", self.path, len(self.requests),
+                 len(self.students), ", snapshotdan" if usable else "",
+                 f", jurnaldan {len(events)} hodisa" if events else "")
+
+    def _load(self):
+        rows = [(request_id, json.loads(data)) for request_id, data in self._conn.execute("SELECT id, data FROM requests")]
+        legacy = [(request_id, data) for request_id, data in rows if "messages" in data]
+        if legacy:
+            self._migrate_messages(legacy)
+        # Eski (ISO satr) va yangi (epoch) vaqtlar aralash bo'lishi mumkin, shuning uchun Python'da saralaymiz
+        loaded = sorted((Request.from_dict(request_id, data) for request_id, data in rows), key=lambda req: req.created_at)
+        for req in loaded:
+            self.requests[req.id] = req
+            self._index(req.id, req)
+        for user_id, name, phone in self._conn.execute("SELECT user_id, name, phone FROM students"):
+            self.students[user_id] = Student(name, phone)
+        self._last_id = self._conn.execute(
+            "SELECT MAX(COALESCE((SELECT MAX(id) FROM requests WHERE typeof(id) = 'integer'), 0), "
+            "COALESCE((SELECT MAX(id) FROM archive), 0))"
+        ).fetchone()[0]
+        self.rebuild_stats()
+
+    # ===== SNAPSHOT =====
+
+    def snapshot(self):
+        """Xotiradagi holat (close() dan keyin chaqiriladi - baza imzosi shu paytdagi).
+
+        Obyektlar oddiy tuple'larga aylantiriladi: pickle ularni slotted
+        dataclass'lardan bir necha marta tezroq yozadi va o'qiydi. Oxirgi
+        xabarlar keshi saqlanmaydi - u history() da bazadan to'ldiriladi.
+        """
+        return {
+            "db": file_signature(self.path),
+            # Jurnalda shu raqamgacha bo'lgan hodisalar snapshot ichida
+            "seq": self.journal.seq if self.journal else 0,
+            "flushed": self._flushed_seq,
+            # Hali bazaga yozilmaganlar - tiklangandan keyin yoziladi
+            "dirty": (list(self._dirty_requests), list(self._dirty_students), list(self._pending_messages)),
+            "last_id": self._last_id,
+            "requests": [
+                (req.id, req.student_id, req.Tyutor_id, req.faculty, req.text, req.student_name,
+                 req.student_phone, int(req.status), req.created_at, req.updated_at, req.message_count)
+                for req in self.requests.values()
+            ],
+            "students": [(user_id, student.name, student.phone) for user_id, student in self.students.items()],
+            # Arxivdagilar ham hisobga kirgan - bazadan qayta hisoblamaslik uchun saqlanadi.
+            # Nusxa: pickle boshqa thread'da, handlerlar esa hisoblagichlarni o'zgartirishda davom etadi
+            "stats": (
+                {faculty: dict(counts) for faculty, counts in self.stats_by_faculty.items()},
+                {tutor_id: dict(counts) for tutor_id, counts in self.stats_by_tutor.items()},
+                dict(self.stats_by_status),
+            ),
+        }
+
+    def _snapshot_usable(self, snapshot):
+        if not snapshot or self.shared:
+            return False
+        if self.journal is not None:
+            # Bazaga mosligi open() da jurnal raqami bo'yicha tekshiriladi
+            return "seq" in snapshot
+        # To'g'ri yopilgan bazada -wal fayli qolmaydi; baza keyin o'zgargan bo'lsa imzo farq qiladi
+        wal = f"{self.path}-wal"
+        if os.path.exists(wal) and os.path.getsize(wal) > 0:
+            return False
+        return snapshot.get("db") is not None and snapshot.get("db") == file_signature(self.path)
+
+    def _restore(self, snapshot):
+        for row in snapshot["requests"]:
+            req = Request(*row[:7], Status(row[7]), *row[8:])
+            self.requests[req.id] = req
+            self._index(req.id, req)
+        self.students = {user_id: Student(name, phone) for user_id, name, phone in snapshot["students"]}
+        self.stats_by_faculty, self.stats_by_tutor, self.stats_by_status = snapshot["stats"]
+        self._last_id = snapshot["last_id"]
+        dirty_requests, dirty_students, pending_messages = snapshot.get("dirty", ((), (), ()))
+        self._dirty_requests = set(dirty_requests)
+        self._dirty_students = set(dirty_students)
+        self._pending_messages = list(pending_messages)
+
+    # ===== JURNAL =====
+
+    def _log(self, event, **fields):
+        if self.journal is not None:
+            self.journal.append(event, **fields)
+
+    def _replay(self, events, persisted_seq):
+        """Jurnal hodisalarini qayta qo'llash. persisted_seq gacha bo'lganlari bazada ham bor"""
+        for event in events:
+            kind = event["e"]
+            persisted = event["seq"] <= persisted_seq
+            if kind == "created":
+                if event["id"] not in self.requests:
+                    self.add_request(Request.from_dict(event["id"], event))
+                    self._last_id = max(self._last_id, event["id"])
+            elif kind == "message":
+                request = self.add_message(event["id"], Message(event["sender"], event["text"], event["time"]))
+                if request is not None:
+                    request.updated_at = event["time"]
+                    if persisted:
+                        # messages jadvaliga yozilgan - ikkinchi marta qo'shilmasin
+                        self._pending_messages.pop()
+            elif kind == "student":
+                self.update_student(event["user_id"], **{k: event[k] for k in ("name", "phone") if k in event})
+            elif kind == "archived":
+                rows = self._take_archived([self.requests[i] for i in event["ids"] if i in self.requests], event["at"])
+                if rows and not persisted:
+                    self._write_archive(rows)
+            else:
+                request = self.set_status(event["id"], Status.parse(kind))
+                if request is not None:
+                    request.updated_at = event["at"]
+        self.replayed += len(events)
+
+    def _migrate_messages(self, legacy):
+        """Eski formatdagi (murojaat ichidagi) xabarlarni messages jadvaliga ko'chirish"""
+        with self._conn:
+            for request_id, req in legacy:
+                messages = req.pop("messages") or []
+                req["message_count"] = len(messages)
+                self._conn.executemany(
+                    "INSERT INTO messages (request_id, sender, text, time) VALUES (?, ?, ?, ?)",
+                    [(request_id, m.get("sender"), m.get("text"), to_epoch(m.get("time"))) for m in messages]
+                )
+                self._conn.execute(
+                    "UPDATE requests SET data = ? WHERE id = ?",
+                    (json.dumps(req, ensure_ascii=False), request_id)
+                )
+        log.info("%d ta murojaat xabarlari messages jadvaliga ko'chirildi", len(legacy))
+
+    def rebuild_stats(self):
+        """Statistika hisoblagichlarini bazadan qayta hisoblash"""
+        self.stats_by_faculty = {}
+        self.stats_by_tutor = {}
+        self.stats_by_status = {}
+        rows = self._conn.execute(
+            "SELECT faculty, tutor_id, status, COUNT(*) FROM ("
+            "SELECT faculty, tutor_id, status FROM requests "
+            "UNION ALL SELECT faculty, tutor_id, status FROM archive"
+            ") GROUP BY faculty, tutor_id, status"
+        )
+        for faculty, tutor_id, status, count in rows:
+            self._count(faculty, tutor_id, Status.parse(status), count)
+
+    async def start(self):
+        """Fon rejimida yozuvchi vazifani ishga tushirish"""
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Qolgan o'zgarishlarni yozib, bazani yopish"""
+        if self._flush_task:
+            # cancel() emas: wait_for() uyg'onish bilan bir vaqtda kelgan bekor qilishni
+            # yutib yuborishi mumkin (Python 3.11) va close() abadiy kutib qoladi
+            self._closing = True
+            self._wakeup.set()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._conn.close)
+        self._executor.shutdown()
+
+    # ===== O'QISH =====
+
+    def get_request(self, request_id):
+        return self.requests.get(request_id)
+
+    async def lookup(self, request_id):
+        """Murojaatni xotiradan, topilmasa arxivdan olish"""
+        request = self.requests.get(request_id)
+        if request is not None:
+            return request
+        loop = asyncio.get_running_loop()
+        row = await loop.run_in_executor(self._executor, lambda: self._conn.execute(
+            "SELECT data FROM archive WHERE id = ?", (request_id,)
+        ).fetchone())
+        if row is None:
+            return None
+        return Request.from_dict(request_id, json.loads(zlib.decompress(row[0])))
+
+    def get_student(self, user_id):
+        return self.students.get(user_id)
+
+    def tutor_requests(self, tutor_id, status=None, offset=0, limit=10):
+        """Tyutorning murojaatlari sahifasi (yangilari birinchi).
+
+        status berilmasa, PANEL_STATUS_ORDER tartibida barcha statuslar.
+        """
+        buckets = self.by_tutor.get(tutor_id, {})
+        statuses = (status,) if status else PANEL_STATUS_ORDER
+        ids = (
+            request_id
+            for st in statuses
+            for request_id in reversed(buckets.get(st, {}))
+        )
+        return [self.requests[request_id] for request_id in islice(ids, offset, offset + limit)]
+
+    def count_tutor_requests(self, tutor_id, status=None):
+        buckets = self.by_tutor.get(tutor_id, {})
+        if status:
+            return len(buckets.get(status, ()))
+        return sum(len(bucket) for bucket in buckets.values())
+
+    def faculty_stats(self):
+        """{fakultet: {"total": n, status: n, ...}}"""
+        return {
+            faculty: {"total": sum(counts.values()), **{status.label: n for status, n in counts.items()}}
+            for faculty, counts in self.stats_by_faculty.items()
+            if any(counts.values())
+        }
+
+    def message_count(self, request_id):
+        request = self.requests.get(request_id)
+        return request.message_count if request else 0
+
+    async def history(self, request_id, offset=0, limit=10):
+        """Suxbat xabarlari sahifasi (yangilari birinchi).
+
+        Oxirgi xabarlar xotiradan, qolganlari bazadan o'qiladi.
+        """
+        tail = self.message_tails.get(request_id)
+        # Kesh to'liq bo'lsa (eng yangi xabarlarning hammasi unda bo'lsa) diskka tushmaymiz
+        if tail is not None and len(tail) == min(self.message_count(request_id), self.tail_size) \
+                and offset + limit <= len(tail):
+            return list(reversed(tail))[offset:offset + limit]
+
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(self._executor, lambda: self._conn.execute(
+            "SELECT sender, text, time FROM messages WHERE request_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (request_id, limit, offset)
+        ).fetchall())
+        messages = [Message(sender, text, to_epoch(time)) for sender, text, time in rows]
+        if offset == 0 and request_id in self.requests:
+            self.message_tails[request_id] = deque(reversed(messages[:self.tail_size]), maxlen=self.tail_size)
+        return messages
+
+    # ===== YOZISH =====
+
+    def new_request_id(self):
+        """Yangi murojaat uchun o'sib boruvchi, takrorlanmas butun son ID"""
+        self._last_id += 1
+        # Klasterda har bir jarayon o'z qoldiq sinfidan oladi
+        self._last_id += (self.node - self._last_id) % self.nodes
+        return self._last_id
+
+    def add_request(self, request):
+        self.requests[request.id] = request
+        self._index(request.id, request)
+        self._count(request.faculty, request.Tyutor_id, request.status, 1)
+        if self.shared:
+            self._created.add(request.id)
+        self._mark(self._dirty_requests, request.id)
+        self._log("created", id=request.id, **request.to_dict())
+        return request
+
+    def set_status(self, request_id, status, reason=None):
+        """Holatni o'zgartirish. reason (rad etish sababi) faqat jurnalga yoziladi"""
+        request = self.requests.get(request_id)
+        if request is None:
+            return None
+        self._unindex(request_id, request)
+        self._count(request.faculty, request.Tyutor_id, request.status, -1)
+        request.status = status
+        request.touch()
+        self._index(request_id, request)
+        self._count(request.faculty, request.Tyutor_id, status, 1)
+        if self.shared:
+            self._delta(request_id)[0] = status
+        self._mark(self._dirty_requests, request_id)
+        if reason:
+            self._log(status.label, id=request_id, at=request.updated_at, reason=reason)
+        else:
+            self._log(status.label, id=request_id, at=request.updated_at)
+        return request
+
+    def add_message(self, request_id, message):
+        """Xabarni suxbat jurnaliga qo'shish (xotirada faqat oxirgilari qoladi)"""
+        request = self.requests.get(request_id)
+        if request is None:
+            return None
+        tail = self.message_tails.get(request_id)
+        if tail is None:
+            tail = self.message_tails[request_id] = deque(maxlen=self.tail_size)
+        tail.append(message)
+        request.message_count += 1
+        request.touch()
+        self._pending_messages.append((request_id, message.sender, message.text, message.time))
+        if self.shared:
+            self._delta(request_id)[1] += 1
+        self._mark(self._dirty_requests, request_id)
+        self._log("message", id=request_id, sender=message.sender, text=message.text, time=message.time)
+        return request
+
+    def update_student(self, user_id, **fields):
+        student = self.students.get(user_id)
+        if student is None:
+            student = self.students[user_id] = Student()
+        for name, value in fields.items():
+            setattr(student, name, value)
+        self._mark(self._dirty_students, user_id)
+        self._log("student", user_id=user_id, **fields)
+        return student
+
+    def _index(self, request_id, request):
+        buckets = self.by_tutor.setdefault(request.Tyutor_id, {})
+        buckets.setdefault(request.status, {})[request_id] = None
+
+    def _unindex(self, request_id, request):
+        buckets = self.by_tutor.get(request.Tyutor_id, {})
+        buckets.get(request.status, {}).pop(request_id, None)
+
+    def _count(self, faculty, tutor_id, status, delta):
+        for counters in (
+            self.stats_by_faculty.setdefault(faculty, {}),
+            self.stats_by_tutor.setdefault(tutor_id, {}),
+            self.stats_by_status,
+        ):
+            counters[status] = counters.get(status, 0) + delta
+
+    def _delta(self, request_id):
+        delta = self._deltas.get(request_id)
+        if delta is None:
+            delta = self._deltas[request_id] = [None, 0]
+        return delta
+
+    def _mark(self, dirty, key):
+        dirty.add(key)
+        if self._wakeup and self.pending() >= self.batch_size:
+            self._wakeup.set()
+
+    def pending(self):
+        return len(self._dirty_requests) + len(self._dirty_students) + len(self._pending_messages)
+
+    # ===== KLASTER =====
+
+    async def sync(self):
+        """Boshqa jarayonlar yozgan o'zgarishlarni xotiraga olish. Qo'llanganlar soni qaytariladi"""
+        if not self.shared:
+            return 0
+        loop = asyncio.get_running_loop()
+        rev, changed = await loop.run_in_executor(self._executor, self._read_changes, self._rev)
+        self._rev = rev
+        for request_id, data in changed.items():
+            if request_id in self._created:
+                # O'zimiz yaratgan, hali bazaga yozilmagan - xotiradagisi to'g'ri
+                continue
+            delta = self._deltas.get(request_id)
+            local = self.requests.get(request_id)
+            if delta is not None and data is not None and local is not None:
+                # Yozilmagan o'zimizdagi o'zgarish yo'qolmasin - flush dagi kabi ustiga qo'yamiz
+                status, messages = delta
+                data = merge_delta(data, status and status.label, messages, local.updated_at)
+            self._apply(request_id, data)
+        self.synced += len(changed)
+        return len(changed)
+
+    def _read_changes(self, since):
+        rows = self._conn.execute(
+            "SELECT rev, request_id, writer FROM changes WHERE rev > ? ORDER BY rev", (since,)
+        ).fetchall()
+        rev = rows[-1][0] if rows else since
+        ids = list({request_id: None for _, request_id, writer in rows if writer != self.node})
+        changed = dict.fromkeys(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for request_id, data in self._conn.execute(
+                f"SELECT id, data FROM requests WHERE id IN ({placeholders})", chunk
+            ):
+                changed[request_id] = json.loads(data)
+
+        now = int(time.time())
+        if self.node == 0 and now - self._pruned_at > 600:
+            self._pruned_at = now
+            with self._conn:
+                self._conn.execute("DELETE FROM changes WHERE time < ?", (now - 3600,))
+        return rev, changed
+
+    def _apply(self, request_id, data):
+        """Boshqa jarayondagi holatni qo'llash (data None - arxivga ko'chirilgan)"""
+        old = self.requests.get(request_id)
+        if data is None:
+            if old is not None:
+                self.requests.pop(request_id)
+                self._unindex(request_id, old)
+                self.message_tails.pop(request_id, None)
+            return
+        new = Request.from_dict(request_id, data)
+        if old is None:
+            self.requests[request_id] = new
+            self._index(request_id, new)
+            self._count(new.faculty, new.Tyutor_id, new.status, 1)
+            self._last_id = max(self._last_id, request_id)
+            return
+        if new.message_count != old.message_count:
+            self.message_tails.pop(request_id, None)
+        self._unindex(request_id, old)
+        self._count(old.faculty, old.Tyutor_id, old.status, -1)
+        # Handlerlarda eski obyektga havola bo'lishi mumkin - joyida yangilaymiz
+        for name in Request.__slots__:
+            setattr(old, name, getattr(new, name))
+        self._index(request_id, old)
+        self._count(old.faculty, old.Tyutor_id, old.status, 1)
+
+    def _record_changes(self, request_ids):
+        if self.shared and request_ids:
+            now = int(time.time())
+            self._conn.executemany(
+                "INSERT INTO changes (request_id, writer, time) VALUES (?, ?, ?)",
+                [(request_id, self.node, now) for request_id in request_ids]
+            )
+
+    # ===== ARXIV =====
+
+    async def archive_closed(self, max_age, limit=1000):
+        """max_age sekunddan beri o'zgarmagan yopilgan murojaatlarni arxivga ko'chirish.
+
+        Ko'chirilganlar soni qaytariladi. Statistika hisoblagichlari o'zgarmaydi.
+        """
+        cutoff = int(time.time()) - max_age
+        candidates = [
+            request for request in self.requests.values()
+            if request.status.closed and request.updated_at < cutoff
+        ][:limit]
+        if not candidates:
+            return 0
+
+        # Avval oxirgi o'zgarishlar yoziladi, keyin ko'chirish shu lock ostida
+        await self.flush()
+        async with self._flush_lock or asyncio.Lock():
+            now = int(time.time())
+            rows = self._take_archived(candidates, now)
+
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self._executor, self._write_archive, rows)
+            except Exception:
+                for request in candidates:
+                    self.requests[request.id] = request
+                    self._index(request.id, request)
+                raise
+            self._log("archived", ids=[row[0] for row in rows], at=now)
+        return len(rows)
+
+    def _take_archived(self, candidates, now):
+        """Murojaatlarni xotiradan chiqarib, archive jadvali qatorlarini qaytarish"""
+        rows = []
+        for request in candidates:
+            rows.append((
+                request.id, request.student_id, request.Tyutor_id, request.faculty,
+                request.status.label, request.created_at, now,
+                zlib.compress(json.dumps(request.to_dict(), ensure_ascii=False).encode("utf-8"))
+            ))
+            self.requests.pop(request.id, None)
+            self._unindex(request.id, request)
+            self.message_tails.pop(request.id, None)
+            self._dirty_requests.discard(request.id)
+            self._deltas.pop(request.id, None)
+        return rows
+
+    def _write_archive(self, rows):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO archive "
+                "(id, student_id, tutor_id, faculty, status, created_at, archived_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.executemany("DELETE FROM requests WHERE id = ?", [(row[0],) for row in rows])
+            self._record_changes([row[0] for row in rows])
+
+    async def export_archive(self, directory, prefix="arxiv", part_size=45 * 1024 * 1024, max_parts=5, **filters):
+        """Arxivdagi murojaatlarni directory ga JSON Lines fayllar qilib yozish.
+
+        Har fayl part_size baytdan oshmaydi, max_parts dan ko'p fayl yozilmaydi.
+        Qaytadi: {"parts": [(yo'l, murojaatlar soni), ...], "exported": n, "total": jami}
+        """
+        clauses = []
+        params = []
+        for key, value in filters.items():
+            clauses.append(f"{REQUEST_FILTERS[key]} = ?")
+            params.append(value.label if isinstance(value, Status) else value)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+
+        def export():
+            # Alohida o'qish ulanishi (WAL): uzun eksport bazaga yozishni to'xtatmaydi
+            conn = sqlite3.connect(self.path)
+            parts = []
+            f = None
+            try:
+                total = conn.execute(f"SELECT COUNT(*) FROM archive{where}", params).fetchone()[0]
+                size = count = 0
+                for request_id, data in conn.execute(f"SELECT id, data FROM archive{where} ORDER BY id", params):
+                    record = json.loads(zlib.decompress(data))
+                    line = (json.dumps({"id": request_id, **record}, ensure_ascii=False) + "\n").encode("utf-8")
+                    if f is None or size + len(line) > part_size:
+                        if f is not None:
+                            f.close()
+                            parts.append((f.name, count))
+                            f = None
+                        if len(parts) >= max_parts:
+                            break
+                        f = open(os.path.join(directory, f"{prefix}_{len(parts) + 1}.jsonl"), "wb")
+                        size = count = 0
+                    f.write(line)
+                    size += len(line)
+                    count += 1
+                if f is not None:
+                    f.close()
+                    parts.append((f.name, count))
+            finally:
+                if f is not None and not f.closed:
+                    f.close()
+                conn.close()
+            return {"parts": parts, "exported": sum(n for _, n in parts), "total": total}
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, export)
+
+    # ===== GURUHLAB YOZISH =====
+
+    async def _flush_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error("Omborga yozilmadi: %s", e)
+
+    async def flush(self):
+        """Yig'ilgan o'zgarishlarni bitta tranzaksiyada yozish"""
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            if not self.pending():
+                return
+
+            dirty_requests, self._dirty_requests = self._dirty_requests, set()
+            dirty_students, self._dirty_students = self._dirty_students, set()
+            message_rows, self._pending_messages = self._pending_messages, []
+            deltas, self._deltas = self._deltas, {}
+            created, self._created = self._created, set()
+            # Shu raqamgacha bo'lgan hodisalarning hammasi shu tranzaksiyada
+            seq = self.journal.seq if self.journal else None
+
+            request_rows = []
+            merge_rows = []
+            for request_id in dirty_requests:
+                req = self.requests.get(request_id)
+                if req is None:
+                    continue
+                if request_id in deltas and request_id not in created:
+                    # Klaster: butun qator emas, faqat o'zimizdagi o'zgarish - bazadagi holat ustiga
+                    status, messages = deltas[request_id]
+                    merge_rows.append((request_id, status and status.label, messages, req.updated_at))
+                    continue
+                request_rows.append((
+                    request_id, req.student_id, req.Tyutor_id, req.faculty,
+                    req.status.label, req.created_at, json.dumps(req.to_dict(), ensure_ascii=False)
+                ))
+            student_rows = [
+                (user_id, self.students[user_id].name, self.students[user_id].phone)
+                for user_id in dirty_students if user_id in self.students
+            ]
+
+            loop = asyncio.get_running_loop()
+            try:
+                merged = await loop.run_in_executor(
+                    self._executor, self._write, request_rows, student_rows, message_rows, seq, merge_rows
+                )
+            except Exception:
+                # Keyingi urinishda qayta yozish uchun belgilarni qaytaramiz
+                self._dirty_requests |= dirty_requests
+                self._dirty_students |= dirty_students
+                self._pending_messages[:0] = message_rows
+                for request_id, (status, messages) in deltas.items():
+                    delta = self._delta(request_id)
+                    delta[0] = delta[0] or status
+                    delta[1] += messages
+                self._created |= created
+                raise
+            if seq is not None:
+                self._flushed_seq = seq
+            for request_id, data in merged.items():
+                # Kutish paytida yana o'zgargan bo'lsa, keyingi flush birlashtirib qo'llaydi
+                if request_id not in self._deltas:
+                    self._apply(request_id, data)
+
+    def _write(self, request_rows, student_rows, message_rows=(), seq=None, merge_rows=()):
+        with self._conn:
+            merged = {}
+            if merge_rows:
+                # O'qish va yozish orasida boshqa jarayon qatorni o'zgartira olmasin
+                self._conn.execute("BEGIN IMMEDIATE")
+                merged = self._merge(merge_rows)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO requests (id, student_id, tutor_id, faculty, status, created_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                request_rows
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO students (user_id, name, phone) VALUES (?, ?, ?)",
+                student_rows
+            )
+            self._conn.executemany(
+                "INSERT INTO messages (request_id, sender, text, time) VALUES (?, ?, ?, ?)",
+                message_rows
+            )
+            self._record_changes([row[0] for row in request_rows] + list(merged))
+            if seq is not None:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('journal_seq', ?)", (seq,))
+        return merged
+
+    def _merge(self, merge_rows):
+        """Status va xabarlar sonini bazadagi joriy qator ustiga qo'llash (tranzaksiya ichida)"""
+        merged = {}
+        for request_id, status, messages, updated_at in merge_rows:
+            row = self._conn.execute("SELECT data FROM requests WHERE id = ?", (request_id,)).fetchone()
+            if row is None:
+                # Arxivga ko'chirilgan
+                continue
+            data = merge_delta(json.loads(row[0]), status, messages, updated_at)
+            self._conn.execute(
+                "UPDATE requests SET status = ?, data = ? WHERE id = ?",
+                (data["status"], json.dumps(data, ensure_ascii=False), request_id)
+            )
+            merged[request_id] = data
+        return merged
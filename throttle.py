@@ -0,0 +1,112 @@
+import logging
+import time
+from collections import OrderedDict
+from aiogram import BaseMiddleware
+from outbound import TokenBucket
+
+log = logging.getLogger(__name__)
+
+
+class _Client:
+    __slots__ = ("bucket", "seen", "last", "last_at")
+
+    def __init__(self, rate, burst, now):
+        self.bucket = TokenBucket(rate, burst)
+        self.bucket.updated = now
+        self.seen = now
+        self.last = None
+        self.last_at = 0.0
+
+
+class ThrottleMiddleware(BaseMiddleware):
+    """Outer middleware (dp.update): flood qilayotgan foydalanuvchi/chat update'larini tashlash.
+
+    limits - update turi bo'yicha foydalanuvchi chegarasi: {"message": (rate, burst), ...},
+    chat_limit - turidan qat'i nazar bitta chat uchun (rate, burst). rate 0 bo'lsa
+    chegara yo'q. Ketma-ket bir xil matnli xabarlar coalesce_window sekund ichida
+    bittaga birlashtiriladi (ikki marta bosilgan yuborish). Har bir faol foydalanuvchi
+    uchun bitta kichik yozuv saqlanadi, idle_ttl sekund jim turganlari o'chiriladi.
+    """
+
+    def __init__(self, limits, chat_limit=(0, 0), coalesce_window=2.0, idle_ttl=600,
+                 exempt=(), metrics=None):
+        self.limits = {kind: limit for kind, limit in limits.items() if limit[0] > 0}
+        self.chat_limit = chat_limit if chat_limit[0] > 0 else None
+        self.coalesce_window = coalesce_window
+        self.idle_ttl = idle_ttl
+        self.exempt = set(exempt)
+        self.metrics = metrics
+        self._clients = OrderedDict()  # (tur, id) -> _Client, eng eskisi boshida
+        self.passed = 0
+        self.throttled = 0
+        self.coalesced = 0
+        self.evicted = 0
+        if metrics:
+            metrics.describe("throttled_total", "Flood sababli tashlangan update'lar")
+            metrics.gauge("throttle_tracked", lambda: len(self._clients), "Kuzatilayotgan foydalanuvchi/chatlar")
+
+    def _client(self, key, limit, now):
+        client = self._clients.get(key)
+        if client is None:
+            client = self._clients[key] = _Client(limit[0], limit[1], now)
+        else:
+            self._clients.move_to_end(key)
+            client.seen = now
+        return client
+
+    def _evict(self, now):
+        # Eng uzoq jim turganlar boshida - birinchi faolga yetganda to'xtaymiz
+        while self._clients:
+            key, client = next(iter(self._clients.items()))
+            if now - client.seen < self.idle_ttl:
+                break
+            del self._clients[key]
+            self.evicted += 1
+
+    def _drop(self, kind, reason, user_id):
+        if reason == "duplicate":
+            self.coalesced += 1
+        else:
+            self.throttled += 1
+        if self.metrics:
+            self.metrics.inc("throttled_total", (("type", kind), ("reason", reason)))
+        log.debug("Update tashlandi (%s): user %s, %s", reason, user_id, kind)
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user is None or user.id in self.exempt:
+            return await handler(event, data)
+
+        kind = event.event_type
+        now = time.monotonic()
+        self._evict(now)
+
+        limit = self.limits.get(kind)
+        if limit:
+            client = self._client((kind, user.id), limit, now)
+            if kind == "message" and self.coalesce_window:
+                text = event.message.text
+                if text is not None and text == client.last and now - client.last_at < self.coalesce_window:
+                    client.last_at = now
+                    return self._drop(kind, "duplicate", user.id)
+                client.last, client.last_at = text, now
+            if not client.bucket.take(now):
+                return self._drop(kind, "user", user.id)
+
+        chat = data.get("event_chat")
+        if self.chat_limit and chat is not None:
+            if not self._client(("chat", chat.id), self.chat_limit, now).bucket.take(now):
+                return self._drop(kind, "chat", user.id)
+
+        self.passed += 1
+        return await handler(event, data)
+
+    def stats(self):
+        """Cheklovchi holati (/health uchun)"""
+        return {
+            "tracked": len(self._clients),
+            "passed": self.passed,
+            "throttled": self.throttled,
+            "coalesced": self.coalesced,
+            "evicted": self.evicted,
+        }
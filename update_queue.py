@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from aiogram import types
+
+log = logging.getLogger(__name__)
+
+
+def update_chat_id(update: types.Update):
+    """Update qaysi chatga tegishli ekanini aniqlash"""
+    if update.message:
+        return update.message.chat.id
+    if update.edited_message:
+        return update.edited_message.chat.id
+    if update.callback_query:
+        query = update.callback_query
+        if query.message:
+            return query.message.chat.id
+        return query.from_user.id
+    if update.my_chat_member:
+        return update.my_chat_member.chat.id
+    return None
+
+
+class UpdateQueue:
+    """Update'larni navbatga qo'yib, workerlar orqali qayta ishlash.
+
+    Har bir chat doim bitta workerga tushadi (chat_id % workers), shuning uchun
+    bir chat ichidagi update'lar kelgan tartibida qayta ishlanadi.
+    """
+
+    def __init__(self, handler, workers=4, maxsize=1000):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.maxsize = max(self.workers, maxsize)
+        per_worker = self.maxsize // self.workers
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._tasks = []
+        self.busy = 0
+        self.processed = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def _shard(self, update: types.Update):
+        chat_id = update_chat_id(update)
+        key = chat_id if chat_id is not None else update.update_id
+        return key % self.workers
+
+    def put_nowait(self, update: types.Update):
+        """Update'ni navbatga qo'yish. Navbat to'la bo'lsa False qaytaradi"""
+        try:
+            self._queues[self._shard(update)].put_nowait(update)
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+
+    async def put(self, update: types.Update):
+        """Update'ni navbatga qo'yish, joy bo'shashini kutib"""
+        await self._queues[self._shard(update)].put(update)
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            update = await queue.get()
+            self.busy += 1
+            try:
+                await self.handler(update)
+                self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                log.exception("update %s qayta ishlanmadi: %s", update.update_id, e)
+            finally:
+                self.busy -= 1
+                queue.task_done()
+
+    def start(self):
+        """Workerlarni ishga tushirish"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(q)) for q in self._queues]
+        log.info("Update navbati: %d worker, sig'im %d", self.workers, self.maxsize)
+
+    async def join(self):
+        """Navbatdagi barcha update'lar qayta ishlanishini kutish"""
+        await asyncio.gather(*(q.join() for q in self._queues))
+
+    async def stop(self):
+        """Workerlarni to'xtatish"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def depth(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def stats(self):
+        """Navbat holati (/health uchun)"""
+        return {
+            "queue_depth": self.depth(),
+            "queue_size": self.maxsize,
+            "workers": self.workers,
+            "workers_busy": self.busy,
+            "saturation": round(self.busy / self.workers, 3),
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }